@@ -1,15 +1,16 @@
 import graphene
 from graphene import ObjectType
 from graphene_django import DjangoObjectType
+from django.db.models import Prefetch
 
 from main.models import Country, TwitterTrend, TwitterCountryTrend, GoogleTrend, GoogleCountryTrend, GoogleWordTrendPeriod, GoogleWordTrend, GoogleTopic, GoogleRelatedTopic, YouTubeTrend, YouTubeCountryTrend, TrendEmotion
 
-from utils.apis.twitter import load_country_trends as load_twitter_country_trends
-from utils.apis.google_trends import load_country_trends as load_google_country_trends
-from utils.apis.google_trends import load_google_word_trend, load_related_topics
-from utils.apis.youtube import load_country_trends as load_youtube_country_trends
-from utils.aux_functions import setup_countries, setup_words, remove_cache, load_countries
-from utils.ai.neuronal_network import load_trend_emotions
+from utils.aux_functions import setup_countries, setup_words
+from utils.refresh import refreshed_snapshot
+from utils.country_registry import country_registry
+
+# The API clients and the emotion models are imported by the resolvers that use them, so that
+# booting a worker does not pay for TensorFlow, tweepy, pytrends or googletrans
 
 class CountryType(DjangoObjectType):
     class Meta:
@@ -45,36 +46,29 @@ class Query(ObjectType):
 
     def resolve_all_countries(self, info, **kwargs):
 
-        load_countries()
-
         acronym = kwargs.get('acronym', None)
 
         if acronym:
-            return Country.objects.filter(acronym=acronym.upper())
+            country = country_registry.by_acronym(acronym.upper())
+            return [country] if country else []
 
-        return Country.objects.all()
+        return country_registry.all()
 
     country_twitter_trends = graphene.List(TwitterTrendType, country=graphene.String(), trends_number=graphene.Int())
 
     def resolve_country_twitter_trends(self, info, **kwargs):
 
-        name, trends_number, filtered_country = setup_countries(kwargs)
-
-        if filtered_country.exists() and Country.objects.get(name=name).woeid != None:
-
-            if TwitterCountryTrend.objects.filter(country__name=name).exists():
-            
-                twitter_country_trends = TwitterCountryTrend.objects.get(country__name=name)
+        from utils.apis.twitter import load_country_trends as load_twitter_country_trends
 
-                cond_1 = remove_cache(twitter_country_trends)
+        name, trends_number, country = setup_countries(kwargs)
 
-                if cond_1:
-                    load_twitter_country_trends(name)
+        if country is not None and country.woeid != None:
 
-            else:
-                load_twitter_country_trends(name)
+            # Snapshot header and its trends in two queries
+            snapshots = TwitterCountryTrend.objects.filter(country=country, is_current=True).prefetch_related('twittertrend_set')
+            twitter_country_trends = refreshed_snapshot(snapshots, 'twitter', None, load_twitter_country_trends, name)
 
-            return TwitterTrend.objects.filter(country_trend__country__name=name)[:trends_number]      
+            return twitter_country_trends.twittertrend_set.all()[:trends_number] if twitter_country_trends else []
 
         return []
 
@@ -82,23 +76,16 @@ class Query(ObjectType):
 
     def resolve_country_google_trends(self, info, **kwargs):
 
-        name, trends_number, filtered_country = setup_countries(kwargs)
+        from utils.apis.google_trends import load_country_trends as load_google_country_trends
 
-        if filtered_country.exists() and Country.objects.get(name=name).pn != None:
+        name, trends_number, country = setup_countries(kwargs)
 
-            if GoogleCountryTrend.objects.filter(country__name=name).exists():
-            
-                google_country_trends = GoogleCountryTrend.objects.get(country__name=name)
+        if country is not None and country.pn != None:
 
-                cond_1 = remove_cache(google_country_trends)
+            snapshots = GoogleCountryTrend.objects.filter(country=country, is_current=True).prefetch_related('googletrend_set')
+            google_country_trends = refreshed_snapshot(snapshots, 'google_trends', None, load_google_country_trends, name)
 
-                if cond_1:
-                    load_google_country_trends(name)
-
-            else:
-                load_google_country_trends(name)
-
-            return GoogleTrend.objects.filter(country_trend__country__name=name)[:trends_number]         
+            return google_country_trends.googletrend_set.all()[:trends_number] if google_country_trends else []
 
         return []
 
@@ -106,25 +93,17 @@ class Query(ObjectType):
 
     def resolve_word_google_trends(self, info, **kwargs):
 
-        word, period_type, country_name, filtered_country = setup_words(kwargs)
-
-        if filtered_country.exists():
-
-            if GoogleWordTrend.objects.filter(country__name=country_name, word=word, period_type=period_type).exists():
+        from utils.apis.google_trends import load_google_word_trend
 
-                google_word_trends = GoogleWordTrend.objects.get(country__name=country_name, word=word, period_type=period_type)
+        word, period_type, country_name, country = setup_words(kwargs)
 
-                cond_1 = remove_cache(google_word_trends)
+        if country is not None:
 
-                if cond_1:
-                    load_google_word_trend(word, country_name, period_type)
+            periods = Prefetch('googlewordtrendperiod_set', queryset=GoogleWordTrendPeriod.objects.order_by('id'))
+            snapshots = GoogleWordTrend.objects.filter(country=country, word=word, period_type=period_type, is_current=True).prefetch_related(periods)
+            google_word_trends = refreshed_snapshot(snapshots, 'google_word_trends', period_type, load_google_word_trend, word, country_name, period_type)
 
-            else:
-                load_google_word_trend(word, country_name, period_type)
-
-            aux = GoogleWordTrendPeriod.objects.filter(word_trend__country__name=country_name, word_trend__word=word, word_trend__period_type=period_type)         
-
-            return sorted(aux, key=lambda x: x.id)
+            return google_word_trends.googlewordtrendperiod_set.all() if google_word_trends else []
 
         return []
 
@@ -132,24 +111,17 @@ class Query(ObjectType):
 
     def resolve_word_related_topics(self, info, **kwargs):
 
-        word, period_type, country_name, filtered_country = setup_words(kwargs)
-        topics_number = kwargs.get('topics_number', 10)
-
-        if filtered_country.exists():
+        from utils.apis.google_trends import load_related_topics
 
-            if GoogleRelatedTopic.objects.filter(country__name=country_name, word=word, period_type=period_type).exists():
-
-                google_related_topics = GoogleRelatedTopic.objects.get(country__name=country_name, word=word, period_type=period_type)
-
-                cond_1 = remove_cache(google_related_topics)
+        word, period_type, country_name, country = setup_words(kwargs)
+        topics_number = kwargs.get('topics_number', 10)
 
-                if cond_1:
-                    load_related_topics(word, country_name, period_type)
+        if country is not None:
 
-            else:
-                load_related_topics(word, country_name, period_type)
+            snapshots = GoogleRelatedTopic.objects.filter(country=country, word=word, period_type=period_type, is_current=True).prefetch_related('googletopic_set')
+            google_related_topics = refreshed_snapshot(snapshots, 'google_related_topics', period_type, load_related_topics, word, country_name, period_type)
 
-            return GoogleTopic.objects.filter(main_topic__word=word, main_topic__period_type=period_type, main_topic__country__name=country_name)[:topics_number]
+            return google_related_topics.googletopic_set.all()[:topics_number] if google_related_topics else []
 
         return []
 
@@ -159,34 +131,23 @@ class Query(ObjectType):
 
         video_id = kwargs.get('video_id')
 
-        if YouTubeTrend.objects.filter(video_id=video_id).exists():
-
-            return YouTubeTrend.objects.get(video_id=video_id)
-
-        return None
+        return YouTubeTrend.objects.filter(video_id=video_id, country_trend__is_current=True).first()
 
     country_you_tube_trends = graphene.List(YouTubeTrendType, country=graphene.String(), trend_type=graphene.String(), trends_number=graphene.Int())
 
     def resolve_country_you_tube_trends(self, info, **kwargs):
 
-        name, trends_number, filtered_country = setup_countries(kwargs)
-        trend_type = kwargs.get('trend_type')
-
-        if filtered_country.exists():
-
-            if YouTubeCountryTrend.objects.filter(country__name=name, trend_type__name=trend_type).exists():
+        from utils.apis.youtube import load_country_trends as load_youtube_country_trends
 
-                youtube_country_trends = YouTubeCountryTrend.objects.get(country__name=name, trend_type__name=trend_type)
-
-                cond_1 = remove_cache(youtube_country_trends)
+        name, trends_number, country = setup_countries(kwargs)
+        trend_type = kwargs.get('trend_type')
 
-                if cond_1:
-                    load_youtube_country_trends(name, trend_type)
+        if country is not None:
 
-            else:
-                load_youtube_country_trends(name, trend_type)
+            snapshots = YouTubeCountryTrend.objects.filter(country=country, trend_type__name=trend_type, is_current=True).prefetch_related('youtubetrend_set')
+            youtube_country_trends = refreshed_snapshot(snapshots, 'youtube', trend_type, load_youtube_country_trends, name, trend_type)
 
-            return YouTubeTrend.objects.filter(country_trend__country__name=name, country_trend__trend_type__name=trend_type)[:trends_number]
+            return youtube_country_trends.youtubetrend_set.all()[:trends_number] if youtube_country_trends else []
 
         return []
 
@@ -194,39 +155,20 @@ class Query(ObjectType):
 
     def resolve_trend_emotions(self, info, **kwargs):
 
+        from utils.ai.neuronal_network import load_trend_emotions
+
         word = kwargs.get('word')
         video_id = kwargs.get('video_id')
 
         if word != None and video_id == None:
-
-            if TrendEmotion.objects.filter(word=word).exists():
-
-                trend_emotions = TrendEmotion.objects.get(word=word)
-                cond_1 = remove_cache(trend_emotions)
-
-                if cond_1:
-                    load_trend_emotions(word, None)
-
-            else:
-                load_trend_emotions(word, None)
-
-            return TrendEmotion.objects.filter(word=word)
-
+            emotions = TrendEmotion.objects.filter(word=word)
         elif word == None and video_id != None:
-            
-            if TrendEmotion.objects.filter(video_id=video_id).exists():
-                
-                trend_emotions = TrendEmotion.objects.get(video_id=video_id)
-                cond_1 = remove_cache(trend_emotions)
-
-                if cond_1:
-                    load_trend_emotions(None, video_id)
+            emotions = TrendEmotion.objects.filter(video_id=video_id)
+        else:
+            return []
 
-            else:
-                load_trend_emotions(None, video_id)
+        trend_emotions = refreshed_snapshot(emotions, 'emotions', None, load_trend_emotions, word, video_id)
 
-            return TrendEmotion.objects.filter(video_id=video_id)
-
-        return []
+        return [trend_emotions] if trend_emotions else []
 
 schema = graphene.Schema(query=Query)
\ No newline at end of file
@@ -157,3 +157,146 @@ CORS_ORIGIN_ALLOW_ALL = True
 GRAPHENE = {
     'SCHEMA': 'TopTrends.schema.schema'
 }
+
+# Freshness of the stored snapshots per data source, in seconds: 'ttl' is how long a snapshot is fresh,
+# 'stale' how long after that it can still be served while it is refreshed. 'source.variant' entries
+# (period type, YouTube category) override the source ones
+
+TREND_FRESHNESS = {
+    'default': {'ttl': 3600, 'stale': 3600},
+    'twitter': {'ttl': 3600, 'stale': 3600},
+    'google_trends': {'ttl': 3600, 'stale': 3600},
+    'google_word_trends': {'ttl': 3600, 'stale': 3600},
+    'google_word_trends.weekly': {'ttl': 6 * 3600, 'stale': 6 * 3600},
+    'google_word_trends.monthly': {'ttl': 24 * 3600, 'stale': 24 * 3600},
+    'google_related_topics': {'ttl': 6 * 3600, 'stale': 6 * 3600},
+    'youtube': {'ttl': 3600, 'stale': 3600},
+    'emotions': {'ttl': 3600, 'stale': 3600},
+}
+
+# Stale snapshots are served while they are refreshed by this many background threads per worker
+
+TREND_BACKGROUND_REFRESH = config('TREND_BACKGROUND_REFRESH', default=True, cast=bool)
+TREND_REFRESH_WORKERS = config('TREND_REFRESH_WORKERS', default=4, cast=int)
+
+# Concurrent calls to the same loader are collapsed into one, across worker processes too (MySQL GET_LOCK)
+
+SINGLE_FLIGHT_DB_LOCK = config('SINGLE_FLIGHT_DB_LOCK', default=True, cast=bool)
+SINGLE_FLIGHT_DB_LOCK_TIMEOUT = config('SINGLE_FLIGHT_DB_LOCK_TIMEOUT', default=60, cast=int)
+
+# Replaced snapshot versions are deleted in the background once they are SNAPSHOT_GC_GRACE seconds old
+
+SNAPSHOT_GC_ASYNC = config('SNAPSHOT_GC_ASYNC', default=True, cast=bool)
+SNAPSHOT_GC_GRACE = config('SNAPSHOT_GC_GRACE', default=60, cast=int)
+
+# Pre-warming of the country snapshots (manage.py prewarm_trends): the first round is spread over
+# PREWARM_SPREAD seconds, snapshots are refreshed PREWARM_LEAD seconds before they go stale and each
+# source is limited to 'calls' upstream refreshes per 'period' seconds. A YouTube chart refresh costs
+# one unit of the daily API quota per page (one page up to 50 videos); the prewarm gets
+# PREWARM_YOUTUBE_QUOTA_SHARE of the quota, the rest is left for the comments of the visitors
+
+PREWARM_WORKERS = config('PREWARM_WORKERS', default=4, cast=int)
+PREWARM_SPREAD = config('PREWARM_SPREAD', default=900, cast=int)
+PREWARM_LEAD = config('PREWARM_LEAD', default=300, cast=int)
+PREWARM_JITTER = config('PREWARM_JITTER', default=60, cast=int)
+PREWARM_MAX_BACKOFF = config('PREWARM_MAX_BACKOFF', default=3600, cast=int)
+
+YOUTUBE_API_DAILY_QUOTA = config('YOUTUBE_API_DAILY_QUOTA', default=10000, cast=int)
+PREWARM_YOUTUBE_QUOTA_SHARE = config('PREWARM_YOUTUBE_QUOTA_SHARE', default=0.5, cast=float)
+
+PREWARM_RATE_LIMITS = {
+    'twitter': {'calls': 75, 'period': 900},
+    'google_trends': {'calls': 10, 'period': 60},
+    'youtube': {'calls': int(YOUTUBE_API_DAILY_QUOTA * PREWARM_YOUTUBE_QUOTA_SHARE / 24), 'period': 3600},
+}
+
+# Shared HTTP client of the upstream APIs: keep-alive connections per host, timeouts in seconds and
+# retries with exponential backoff and jitter on 429/5xx and connection errors
+
+HTTP_POOL_SIZE = config('HTTP_POOL_SIZE', default=10, cast=int)
+HTTP_CONNECT_TIMEOUT = config('HTTP_CONNECT_TIMEOUT', default=3.05, cast=float)
+HTTP_READ_TIMEOUT = config('HTTP_READ_TIMEOUT', default=10, cast=float)
+HTTP_RETRIES = config('HTTP_RETRIES', default=3, cast=int)
+HTTP_BACKOFF = config('HTTP_BACKOFF', default=0.5, cast=float)
+HTTP_MAX_BACKOFF = config('HTTP_MAX_BACKOFF', default=10, cast=float)
+HTTP_HOST_CONCURRENCY = config('HTTP_HOST_CONCURRENCY', default=8, cast=int)
+
+# tweepy shares the pooled session but retries on its own, HTTP_RETRIES times after a fixed delay in seconds
+
+TWITTER_RETRY_DELAY = config('TWITTER_RETRY_DELAY', default=2, cast=float)
+
+# Requests in flight at once when many countries and categories are fetched together (utils/apis/async_fetch.py)
+
+ASYNC_FETCH_CONCURRENCY = config('ASYNC_FETCH_CONCURRENCY', default=16, cast=int)
+
+# Google Trends (pytrends): clients in use at once, which is also the number of requests sent to Google
+# at once, and retries with exponential backoff and jitter when it answers 429
+
+GOOGLE_TRENDS_CONCURRENCY = config('GOOGLE_TRENDS_CONCURRENCY', default=2, cast=int)
+GOOGLE_TRENDS_RETRIES = config('GOOGLE_TRENDS_RETRIES', default=3, cast=int)
+GOOGLE_TRENDS_BACKOFF = config('GOOGLE_TRENDS_BACKOFF', default=2, cast=float)
+GOOGLE_TRENDS_MAX_BACKOFF = config('GOOGLE_TRENDS_MAX_BACKOFF', default=60, cast=float)
+
+# Tweets of a trend used for its emotions, the most liked and retweeted of the popular search results
+
+TWITTER_RELEVANT_TWEETS = config('TWITTER_RELEVANT_TWEETS', default=20, cast=int)
+
+# Translation of the tweets to English: texts per request up to TRANSLATION_BATCH_CHARS characters,
+# requests in parallel and translations kept in memory (LRU by text hash)
+
+TRANSLATION_BATCH_CHARS = config('TRANSLATION_BATCH_CHARS', default=4500, cast=int)
+TRANSLATION_WORKERS = config('TRANSLATION_WORKERS', default=4, cast=int)
+TRANSLATION_CACHE_SIZE = config('TRANSLATION_CACHE_SIZE', default=10000, cast=int)
+
+# YouTube Data API: trending videos kept per country and category, walking at most YOUTUBE_TRENDS_MAX_PAGES pages,
+# and pages of 100 comments read at most to find the relevant comments of a video
+
+YOUTUBE_API_URL = config('YOUTUBE_API_URL', default='https://www.googleapis.com/youtube/v3')
+YOUTUBE_TRENDS_LIMIT = config('YOUTUBE_TRENDS_LIMIT', default=10, cast=int)
+YOUTUBE_TRENDS_MAX_PAGES = config('YOUTUBE_TRENDS_MAX_PAGES', default=5, cast=int)
+YOUTUBE_COMMENTS_MAX_PAGES = config('YOUTUBE_COMMENTS_MAX_PAGES', default=5, cast=int)
+
+# Countries are kept in memory by every worker and reloaded at least this often (seconds)
+
+COUNTRY_REGISTRY_TTL = config('COUNTRY_REGISTRY_TTL', default=3600, cast=int)
+
+# Emotion models (loaded once per process, optionally at startup)
+
+EMOTION_MODELS = {
+    'sentiment': BASE_DIR / 'trained_model_1.h5',
+    'emotion': BASE_DIR / 'trained_model_2.h5',
+}
+
+# Same models exported for the NumPy runtime (python manage.py export_numpy_models), which serves them without TensorFlow
+
+EMOTION_NUMPY_MODELS = {
+    'sentiment': BASE_DIR / 'trained_model_1.npz',
+    'emotion': BASE_DIR / 'trained_model_2.npz',
+}
+
+EMOTION_MODEL_RUNTIME = config('EMOTION_MODEL_RUNTIME', default='keras')
+
+# float32, or float16/int8 variants of the NumPy models built by python manage.py quantize_models
+
+EMOTION_MODEL_PRECISION = config('EMOTION_MODEL_PRECISION', default='float32')
+
+# Vocabularies of the tokenizers used to train the models (python manage.py build_vocabularies)
+
+EMOTION_VOCABULARIES = {
+    'sentiment': BASE_DIR / 'vocabulary_1.json',
+    'emotion': BASE_DIR / 'vocabulary_2.json',
+}
+
+EMOTION_MODELS_WARMUP = config('EMOTION_MODELS_WARMUP', default=False, cast=bool)
+
+EMOTION_MAX_BATCH_SIZE = config('EMOTION_MAX_BATCH_SIZE', default=64, cast=int)
+
+# Per-text emotion predictions kept in memory (LRU)
+
+EMOTION_PREDICTION_CACHE_SIZE = config('EMOTION_PREDICTION_CACHE_SIZE', default=20000, cast=int)
+
+# Micro-batching of the emotion inference across concurrent requests
+
+EMOTION_MICRO_BATCHING = config('EMOTION_MICRO_BATCHING', default=True, cast=bool)
+EMOTION_SCHEDULER_MAX_BATCH_SIZE = config('EMOTION_SCHEDULER_MAX_BATCH_SIZE', default=256, cast=int)
+EMOTION_SCHEDULER_MAX_WAIT_MS = config('EMOTION_SCHEDULER_MAX_WAIT_MS', default=10, cast=int)
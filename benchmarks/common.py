@@ -0,0 +1,34 @@
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+### Shared helpers for the benchmark scripts (run them from the repository root) ###
+
+ROOT = Path(__file__).resolve().parent.parent
+
+def setup_django():
+
+    if str(ROOT) not in sys.path:
+        sys.path.insert(0, str(ROOT))
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'TopTrends.settings')
+
+    import django
+    django.setup()
+
+def timed(fn, *args, **kwargs):
+
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+def repeat(fn, times, *args, **kwargs):
+    return [timed(fn, *args, **kwargs)[0] for _ in range(times)]
+
+def report(label, samples):
+
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    print('%-40s n=%-4d mean=%8.2f ms  median=%8.2f ms  p95=%8.2f ms' % (label, len(samples), statistics.mean(samples) * 1000, statistics.median(samples) * 1000, p95 * 1000))
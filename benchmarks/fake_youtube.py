@@ -0,0 +1,104 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+### Local stand-in for the YouTube Data API, with a fixed latency per request, used by the benchmarks ###
+
+def fake_video(i):
+    return {
+        'id': 'video%d' % i,
+        'snippet': {
+            'title': 'Video %d' % i,
+            'publishedAt': '2023-01-01T00:00:00Z',
+            'channelTitle': 'Channel %d' % i,
+            'thumbnails': {'high': {'url': 'https://i.ytimg.com/vi/video%d/hqdefault.jpg' % i}},
+        },
+        'statistics': {'viewCount': str(1000 * i), 'likeCount': str(10 * i), 'commentCount': str(i)},
+    }
+
+def fake_comment(i):
+    text = 'Comment %d &amp; some more words about this video<br>with a second line' % i
+    return {'snippet': {'topLevelComment': {'snippet': {'textDisplay': text, 'likeCount': (i * 7919) % 1000}}}}
+
+class Server(ThreadingHTTPServer):
+
+    # Many clients connect at once, the default listen backlog of 5 would make some of them wait for a SYN retry
+    request_queue_size = 128
+
+class FakeYouTubeServer:
+
+    def __init__(self, latency=0.02, videos=200, comments=1000):
+        self.latency = latency
+        self.videos = [fake_video(i) for i in range(videos)]
+        self.comments = [fake_comment(i) for i in range(comments)]
+        self.requests = 0
+        self._lock = threading.Lock()
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                with server._lock:
+                    server.requests += 1
+                time.sleep(server.latency)
+
+                url = urlparse(self.path)
+                body = server.handle(url.path, {k: v[0] for k, v in parse_qs(url.query).items()})
+
+                data = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = Server(('127.0.0.1', 0), Handler)
+        self.url = 'http://127.0.0.1:%d' % self.httpd.server_address[1]
+
+    def project(self, video, part):
+        return {key: value for key, value in video.items() if key == 'id' or key in part.split(',')}
+
+    def handle(self, path, params):
+
+        part = params.get('part', 'snippet')
+
+        if path.endswith('/videos') and 'id' in params:
+            ids = params['id'].split(',')
+            return {'items': [self.project(v, part) for v in self.videos if v['id'] in ids]}
+
+        if path.endswith('/videos'):
+            page_size = int(params.get('maxResults', 5))
+            start = int(params.get('pageToken', 0))
+            items = [self.project(v, part) for v in self.videos[start:start + page_size]]
+            body = {'items': items}
+            if start + page_size < len(self.videos):
+                body['nextPageToken'] = str(start + page_size)
+            return body
+
+        if path.endswith('/commentThreads'):
+            page_size = int(params.get('maxResults', 20))
+            start = int(params.get('pageToken', 0))
+            body = {'items': self.comments[start:start + page_size]}
+            if start + page_size < len(self.comments):
+                body['nextPageToken'] = str(start + page_size)
+            return body
+
+        return {'items': []}
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+
+    def __enter__(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,73 @@
+import argparse
+import threading
+import time
+
+from benchmarks.common import setup_django
+
+### Throughput of the emotion inference with N concurrent callers (python -m benchmarks.inference_scheduler) ###
+
+TEXTS = [
+    'I love this song so much, it makes me happy',
+    'This is the worst game I have ever seen',
+    'Not sure what to think about the news today',
+    'The final was amazing, what a goal!',
+    'I am scared of what could happen next',
+] * 4
+
+device_lock = threading.Lock()
+
+def synthetic_predict(texts):
+
+    # Fixed dispatch overhead plus a small per-text cost on a single shared device, similar in shape to Keras predict()
+    import numpy as np
+
+    with device_lock:
+        time.sleep(0.02 + 0.0002 * len(texts))
+    return np.full((len(texts), 3), 1 / 3, dtype='float32'), np.full((len(texts), 6), 1 / 6, dtype='float32')
+
+def load(call, callers, duration):
+
+    done = [0] * callers
+    stop = time.monotonic() + duration
+
+    def worker(i):
+        while time.monotonic() < stop:
+            call(TEXTS)
+            done[i] += 1
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(callers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    return sum(done) / duration
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--callers', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--synthetic', action='store_true', help='use a synthetic model instead of the Keras models')
+    args = parser.parse_args()
+
+    setup_django()
+
+    from django.conf import settings
+    from utils.ai.inference_scheduler import InferenceScheduler
+    from utils.ai.neuronal_network import predict_texts
+
+    predict = synthetic_predict if args.synthetic else predict_texts
+    predict(TEXTS)
+
+    print('%-8s %18s %18s %12s %10s' % ('callers', 'direct req/s', 'scheduled req/s', 'batch fill', 'max queue'))
+
+    for callers in args.callers:
+        scheduler = InferenceScheduler(predict, settings.EMOTION_SCHEDULER_MAX_BATCH_SIZE, settings.EMOTION_SCHEDULER_MAX_WAIT_MS / 1000)
+        direct = load(predict, callers, args.duration)
+        scheduled = load(scheduler.submit, callers, args.duration)
+        metrics = scheduler.metrics()
+        print('%-8d %18.1f %18.1f %11.0f%% %10d' % (callers, direct, scheduled, metrics['mean_batch_fill'] * 100, metrics['max_queue_depth']))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,32 @@
+from benchmarks.common import setup_django, timed, repeat, report
+
+### Cold vs warm latency of the emotion inference (python -m benchmarks.model_loading) ###
+
+TEXTS = [
+    'I love this song so much, it makes me happy',
+    'This is the worst game I have ever seen',
+    'Not sure what to think about the news today',
+    'The final was amazing, what a goal!',
+    'I am scared of what could happen next',
+] * 4
+
+def main():
+
+    setup_django()
+
+    from utils.ai.model_registry import model_registry
+    from utils.ai.neuronal_network import get_encoders, predict_emotions
+
+    # Vocabularies are loaded beforehand so only the model loading is measured
+    get_encoders()
+
+    model_registry.clear()
+    cold, _ = timed(predict_emotions, TEXTS)
+    report('cold request (models loaded)', [cold])
+    report('warm request (registry hit)', repeat(predict_emotions, 10, TEXTS))
+
+    for name, stats in model_registry.stats().items():
+        print('%s: load %.2f s, +%.1f MB RSS' % (name, stats['load_seconds'], stats['rss_delta_bytes'] / 2**20))
+
+if __name__ == '__main__':
+    main()
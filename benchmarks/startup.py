@@ -0,0 +1,66 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks.common import ROOT
+
+### Worker boot time and the slowest imports (python -m benchmarks.startup) ###
+
+HEAVY_MODULES = ['tensorflow', 'keras', 'datasets', 'tweepy', 'googletrans', 'emoji', 'pytrends', 'pandas']
+
+BOOT_CODE = (
+    "import json, sys, time\n"
+    "start = time.perf_counter()\n"
+    "import django\n"
+    "django.setup()\n"
+    "import TopTrends.urls, TopTrends.schema\n"
+    "elapsed = time.perf_counter() - start\n"
+    "print(json.dumps({'seconds': elapsed, 'heavy_modules': sorted(m for m in %r if m in sys.modules)}))\n"
+) % HEAVY_MODULES
+
+def boot(importtime=False):
+
+    # Boots Django in a fresh interpreter, as a worker would, and returns the measurements
+    env = dict(os.environ)
+    env.setdefault('DJANGO_SETTINGS_MODULE', 'TopTrends.settings')
+    args = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', BOOT_CODE]
+
+    result = subprocess.run(args, cwd=ROOT, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr)
+
+    return json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+
+def parse_importtime(stderr):
+
+    # Lines look like "import time:      self [us] |  cumulative | imported package"
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, self_us, cumulative_us, name = [x.strip() for x in line.replace('import time:', '|', 1).split('|')]
+        imports.append((int(cumulative_us), int(self_us), name))
+    return sorted(imports, reverse=True)
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=20)
+    args = parser.parse_args()
+
+    runs = [boot()[0]['seconds'] for _ in range(args.runs)]
+    result, stderr = boot(importtime=True)
+
+    print('boot time: best %.3f s, worst %.3f s over %d runs' % (min(runs), max(runs), len(runs)))
+    print('heavy modules loaded at boot: %s' % (', '.join(result['heavy_modules']) or 'none'))
+    print()
+    print('%12s %12s  %s' % ('cumul. [ms]', 'self [ms]', 'module'))
+
+    for cumulative, self_us, name in parse_importtime(stderr)[:args.top]:
+        print('%12.1f %12.1f  %s' % (cumulative / 1000, self_us / 1000, name))
+
+if __name__ == '__main__':
+    main()
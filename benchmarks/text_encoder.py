@@ -0,0 +1,34 @@
+import argparse
+
+from benchmarks.common import setup_django, repeat, report
+
+### Keras Tokenizer + pad_sequences vs SequenceEncoder (python -m benchmarks.text_encoder) ###
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--batch', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from tensorflow.keras.preprocessing.text import Tokenizer
+    from tensorflow.keras.preprocessing.sequence import pad_sequences
+    from main.tests_ai import synthetic_corpus
+    from utils.ai.text_encoder import SequenceEncoder
+    from utils.ai.vocabulary import vocabulary_from_tokenizer
+
+    tokenizer = Tokenizer(num_words=1000, oov_token='<UNK>')
+    tokenizer.fit_on_texts(synthetic_corpus(5000))
+    encoder = SequenceEncoder(vocabulary_from_tokenizer(tokenizer, 'synthetic'), 50)
+    texts = synthetic_corpus(args.batch, seed=1)
+
+    def keras_encode():
+        return pad_sequences(tokenizer.texts_to_sequences(texts), truncating='post', padding='post', maxlen=50)
+
+    report('keras texts_to_sequences + pad (%d)' % args.batch, repeat(keras_encode, args.repeat))
+    report('SequenceEncoder.encode (%d)' % args.batch, repeat(encoder.encode, args.repeat, texts))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+import argparse
+import random
+import tracemalloc
+
+from benchmarks.common import ROOT, repeat, report
+
+### Top-K selection over pages of scored items, by K and number of pages (python -m benchmarks.top_k) ###
+
+def make_pages(pages, page_size, seed=0):
+
+    # Like counts are heavily skewed, as in the YouTube comments
+    rng = random.Random(seed)
+    return [[(int(rng.paretovariate(1.2)), 'comment %d' % (p * page_size + i)) for i in range(page_size)] for p in range(pages)]
+
+def sort_per_page(pages, k):
+
+    # Previous behaviour: every item kept, whole list sorted after every page
+    kept = []
+    for page in pages:
+        kept.extend(page)
+        kept.sort(key=lambda x: x[0], reverse=True)
+    return [item for score, item in kept[:k]]
+
+def sort_once(pages, k):
+
+    kept = [entry for page in pages for entry in page]
+    kept.sort(key=lambda x: x[0], reverse=True)
+    return [item for score, item in kept[:k]]
+
+def top_k_selector(pages, k):
+
+    from utils.top_k import TopKSelector
+
+    selector = TopKSelector(k)
+    for page in pages:
+        selector.extend(page)
+    return selector.items()
+
+def peak_memory(select, data, k):
+
+    tracemalloc.start()
+    select(data, k)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    import sys
+    sys.path.insert(0, str(ROOT))
+
+    for pages in [1, 5, 20, 100]:
+        data = make_pages(pages, args.page_size)
+
+        for k in [10, 50, 200]:
+            assert sort_per_page(data, k) == sort_once(data, k) == top_k_selector(data, k)
+
+            for label, select in [('sort per page', sort_per_page), ('sort once', sort_once), ('TopKSelector', top_k_selector)]:
+                report('%3d pages K=%-3d %s' % (pages, k, label), repeat(select, args.repeat, data, k))
+                print('%57s peak %8.1f KB' % ('', peak_memory(select, data, k) / 1024))
+        print()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+import argparse
+import random
+import time
+
+from benchmarks.common import setup_django, repeat, report
+
+### Translation of the tweets of one request, per tweet vs batched (python -m benchmarks.translation) ###
+
+WORDS = ['hola', 'que', 'partido', 'increible', 'gol', 'bonjour', 'match', 'incroyable', 'ciao', 'partita', 'fantastica', 'oggi']
+
+class StubTranslator:
+
+    # Stands in for googletrans: a fixed round trip per request, plus a handshake for a new client
+    def __init__(self, latency, handshake):
+        self.latency = latency
+        time.sleep(handshake)
+
+    def translate(self, text, dest='en'):
+        time.sleep(self.latency)
+        return type('Translated', (), {'text': text.upper()})()
+
+def synthetic_tweets(n, english_share, seed=0):
+
+    rng = random.Random(seed)
+    tweets = []
+    for i in range(n):
+        lang = 'en' if rng.random() < english_share else 'es'
+        tweets.append((' '.join(rng.choice(WORDS) for _ in range(rng.randint(8, 25))) + ' #%d' % i, lang))
+    return tweets
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tweets', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=150, help='Milliseconds per translation request')
+    parser.add_argument('--handshake', type=float, default=50, help='Milliseconds to set up a new client')
+    parser.add_argument('--english', type=float, default=0.3, help='Share of tweets already in English')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from utils.apis import translation
+
+    latency, handshake = args.latency / 1000, args.handshake / 1000
+    tweets = synthetic_tweets(args.tweets, args.english)
+    texts, langs = [t for t, _ in tweets], [l for _, l in tweets]
+
+    def per_tweet():
+        return [StubTranslator(latency, handshake).translate(text, dest='en').text for text in texts]
+
+    translation.translator = StubTranslator(latency, handshake)
+
+    def batched_cold():
+        translation.translation_cache.clear()
+        return translation.translate_texts(texts, langs)
+
+    def batched_warm():
+        return translation.translate_texts(texts, langs)
+
+    report('per tweet, new client (%d tweets)' % args.tweets, repeat(per_tweet, args.repeat))
+    report('batched, shared client, cold cache', repeat(batched_cold, args.repeat))
+    report('batched, shared client, warm cache', repeat(batched_warm, args.repeat))
+
+if __name__ == '__main__':
+    main()
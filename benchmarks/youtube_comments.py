@@ -0,0 +1,64 @@
+import argparse
+import os
+import tracemalloc
+
+from benchmarks.common import setup_django, timed
+from benchmarks.fake_youtube import FakeYouTubeServer
+
+### Pages, time and memory to get the relevant comments of a video (python -m benchmarks.youtube_comments) ###
+
+def legacy_relevant_comments(base_url, video_id, number_of_comments):
+
+    # Previous behaviour: default pages of 20, whole list sorted after every page, up to 500 comments
+    import requests
+
+    comments_ls = []
+    next_page_token = None
+
+    while True:
+        url = base_url + '/commentThreads?part=snippet&videoId=' + video_id + '&key=x'
+        if next_page_token is not None:
+            url += '&pageToken=' + next_page_token
+        data = requests.get(url).json()
+
+        if len(comments_ls) >= 500 or (len(comments_ls) > 0 and next_page_token is None):
+            return [c for c, l in comments_ls[:number_of_comments]]
+
+        for comment in data['items']:
+            snippet = comment['snippet']['topLevelComment']['snippet']
+            comments_ls.append((snippet['textDisplay'], snippet['likeCount']))
+        comments_ls.sort(key=lambda x: x[1], reverse=True)
+        next_page_token = data.get('nextPageToken')
+
+def measure(server, fetch):
+
+    server.reset()
+    tracemalloc.start()
+    elapsed, comments = timed(fetch)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return elapsed, server.requests, peak, comments
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--comments', type=int, default=50, help='Comments kept per video')
+    parser.add_argument('--latency', type=float, default=50, help='Milliseconds per request of the fake API')
+    args = parser.parse_args()
+
+    os.environ.setdefault('YOUTUBE_API_KEY', 'x')
+    setup_django()
+
+    from django.test.utils import override_settings
+    from utils.apis.youtube import get_relevant_comments
+
+    with FakeYouTubeServer(latency=args.latency / 1000) as server, override_settings(YOUTUBE_API_URL=server.url):
+
+        for label, fetch in [('legacy (pages of 20, sort per page)', lambda: legacy_relevant_comments(server.url, 'video', args.comments)),
+                             ('iterative (pages of 100, heap)', lambda: get_relevant_comments('video', args.comments))]:
+            elapsed, pages, peak, comments = measure(server, fetch)
+            print('%-38s %3d pages  %7.0f ms  peak %7.1f KB  %d comments' % (label, pages, elapsed * 1000, peak / 1024, len(comments)))
+
+if __name__ == '__main__':
+    main()
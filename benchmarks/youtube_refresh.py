@@ -0,0 +1,41 @@
+import argparse
+import os
+
+from benchmarks.common import setup_django, timed
+from benchmarks.fake_youtube import FakeYouTubeServer
+
+### Sequential vs concurrent fetch of the 8 YouTube categories for N countries (python -m benchmarks.youtube_refresh) ###
+
+CATEGORIES = [0, 1, 10, 17, 20, 24, 25, 28]
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--countries', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=50, help='Milliseconds per request of the fake API')
+    parser.add_argument('--concurrency', type=int, default=None, help='ASYNC_FETCH_CONCURRENCY by default')
+    args = parser.parse_args()
+
+    os.environ.setdefault('YOUTUBE_API_KEY', 'x')
+    setup_django()
+
+    from django.conf import settings
+    from utils.apis.async_fetch import run, youtube_trending_videos_many
+    from utils.apis.youtube import get_trending_videos
+
+    with FakeYouTubeServer(latency=args.latency / 1000) as server:
+
+        urls = ['%s/videos?part=snippet,statistics&chart=mostPopular&regionCode=C%d&maxResults=10&videoCategoryId=%d&key=x' % (server.url, country, category)
+                for country in range(args.countries) for category in CATEGORIES]
+
+        sequential, expected = timed(lambda: [get_trending_videos(url, 10, 5) for url in urls])
+        concurrent, results = timed(run, youtube_trending_videos_many(urls, 10, 5, args.concurrency))
+
+        assert results == expected
+
+        print('%d charts (%d countries x %d categories), %.0f ms per request' % (len(urls), args.countries, len(CATEGORIES), args.latency))
+        print('sequential: %8.0f ms' % (sequential * 1000))
+        print('concurrent: %8.0f ms (%d in flight, %.1fx)' % (concurrent * 1000, args.concurrency or settings.ASYNC_FETCH_CONCURRENCY, sequential / concurrent))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+import argparse
+import os
+
+from benchmarks.common import setup_django, timed, report
+from benchmarks.fake_youtube import FakeYouTubeServer
+
+### Round trips of the trending videos fetch against a local fake API (python -m benchmarks.youtube_trends) ###
+
+def legacy_trending_videos(base_url, limit):
+
+    # Previous behaviour: snippet pages of 5 videos walked by recursion and one statistics call per video
+    import requests
+
+    res = []
+    url = base_url + '/videos?part=snippet&chart=mostPopular&regionCode=ES&key=x'
+
+    while len(res) < limit:
+        data = requests.get(url).json()
+        for video in data['items']:
+            statistics = requests.get(base_url + '/videos?part=statistics&id=' + video['id'] + '&key=x').json()
+            res.append((video['id'], statistics['items'][0]['statistics']))
+        if 'nextPageToken' not in data:
+            break
+        url = url.split('&pageToken=')[0] + '&pageToken=' + data['nextPageToken']
+
+    return res
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--latency', type=float, default=20, help='Milliseconds per request of the fake API')
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    os.environ.setdefault('YOUTUBE_API_KEY', 'x')
+    setup_django()
+
+    from utils.apis.http_client import http_client
+    from utils.apis.youtube import get_trending_videos
+
+    with FakeYouTubeServer(latency=args.latency / 1000) as server:
+
+        url = server.url + '/videos?part=snippet,statistics&chart=mostPopular&regionCode=ES&maxResults=%d&key=x' % min(args.limit, 50)
+
+        for label, fetch in [('legacy (per-video statistics)', lambda: legacy_trending_videos(server.url, args.limit)),
+                             ('snippet,statistics in the chart call', lambda: get_trending_videos(url, args.limit, 5))]:
+            server.reset()
+            samples = [timed(fetch)[0] for _ in range(args.repeat)]
+            report('%s (%d videos)' % (label, args.limit), samples)
+            print('%-40s round trips per fetch: %d' % ('', server.requests // args.repeat))
+
+        for host, metrics in http_client.metrics()['hosts'].items():
+            print('%s: %d requests over %d connections (%.0f%% reused)' % (host, metrics['requests'], metrics['connections'], metrics['reuse'] * 100))
+
+if __name__ == '__main__':
+    main()
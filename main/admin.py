@@ -1,5 +1,5 @@
 from django.contrib import admin
-from main.models import Country, TwitterTrend, TwitterCountryTrend, GoogleTrend, GoogleCountryTrend, GoogleWordTrendPeriod, GoogleWordTrend, GoogleTopic, GoogleRelatedTopic, YouTubeTrend, YouTubeCountryTrend, TrendEmotion
+from main.models import Country, TwitterTrend, TwitterCountryTrend, GoogleTrend, GoogleCountryTrend, GoogleWordTrendPeriod, GoogleWordTrend, GoogleTopic, GoogleRelatedTopic, YouTubeTrend, YouTubeCountryTrend, TrendEmotion, PrewarmTask
 
 # Register your models here.
 
@@ -14,4 +14,5 @@ admin.site.register(GoogleTopic)
 admin.site.register(GoogleRelatedTopic)
 admin.site.register(YouTubeTrend)
 admin.site.register(YouTubeCountryTrend)
-admin.site.register(TrendEmotion)
\ No newline at end of file
+admin.site.register(TrendEmotion)
+admin.site.register(PrewarmTask)
\ No newline at end of file
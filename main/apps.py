@@ -1,6 +1,16 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class MainConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'main'
+
+    def ready(self):
+
+        import main.signals
+
+        # Load the emotion models at startup instead of on the first trendEmotions query
+        if settings.EMOTION_MODELS_WARMUP:
+            from utils.ai.model_registry import model_registry
+            model_registry.warm_up()
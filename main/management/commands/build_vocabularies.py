@@ -0,0 +1,31 @@
+import pickle
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from utils.ai.vocabulary import VOCABULARY_SOURCES, build_vocabulary, load_vocabulary, save_vocabulary, vocabulary_from_tokenizer
+
+
+class Command(BaseCommand):
+    help = 'Fit the tokenizers of the emotion models and store them as compact vocabulary artifacts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from-pickle', nargs=2, metavar=('SENTIMENT_PKL', 'EMOTION_PKL'), help='convert previously pickled Keras tokenizers instead of downloading the datasets')
+
+    def handle(self, *args, **options):
+
+        pickles = options['from_pickle']
+
+        for i, (name, source) in enumerate(VOCABULARY_SOURCES.items()):
+
+            if pickles:
+                with open(pickles[i], 'rb') as f:
+                    vocabulary = vocabulary_from_tokenizer(pickle.load(f), source)
+            else:
+                vocabulary = build_vocabulary(source)
+
+            path = settings.EMOTION_VOCABULARIES[name]
+            save_vocabulary(vocabulary, path)
+            load_vocabulary(path)
+
+            self.stdout.write('%s: %d words from %s written to %s' % (name, len(vocabulary['word_index']), source, path))
@@ -0,0 +1,31 @@
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from utils.ai.model_registry import _keras_loader
+from utils.ai.numpy_runtime import export_keras_model, load_numpy_model
+
+
+class Command(BaseCommand):
+    help = 'Export the Keras emotion models to the NumPy runtime format and check that both give the same outputs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tolerance', type=float, default=1e-5, help='maximum absolute difference allowed between Keras and NumPy outputs')
+
+    def handle(self, *args, **options):
+
+        rng = np.random.default_rng(0)
+
+        for name, path in settings.EMOTION_MODELS.items():
+
+            keras_model = _keras_loader(path)
+            numpy_path = settings.EMOTION_NUMPY_MODELS[name]
+            export_keras_model(keras_model, numpy_path)
+
+            sequences = rng.integers(0, 1000, size=(64, keras_model.input_shape[1])).astype('int32')
+            diff = np.abs(keras_model.predict(sequences, verbose=0) - load_numpy_model(numpy_path).predict(sequences)).max()
+
+            if diff > options['tolerance']:
+                raise CommandError('%s: NumPy outputs differ from Keras by %g' % (name, diff))
+
+            self.stdout.write('%s: exported to %s (max abs diff %.2e)' % (name, numpy_path, diff))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from utils.prewarm import prewarm, sync_tasks
+
+
+class Command(BaseCommand):
+    help = 'Refresh the Twitter, Google Trends and YouTube snapshots of every country before they go stale'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help='Concurrent refreshes (PREWARM_WORKERS by default)')
+        parser.add_argument('--once', action='store_true', help='Run the tasks that are due now and exit, e.g. from cron')
+        parser.add_argument('--poll', type=int, default=10, help='Seconds to sleep when no task is due')
+        parser.add_argument('--sync-only', action='store_true', help='Only create the tasks of new countries and categories')
+
+    def handle(self, *args, **options):
+
+        if options['sync_only']:
+            created, deleted = sync_tasks()
+            self.stdout.write('%d tasks created, %d deleted' % (created, deleted))
+            return
+
+        statuses = prewarm(workers=options['workers'], once=options['once'], poll=options['poll'])
+
+        if options['once']:
+            self.stdout.write(', '.join('%s: %d' % (status, count) for status, count in sorted(statuses.items())) or 'No task was due')
@@ -0,0 +1,51 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from utils.ai.quantization import HELDOUT_TEXTS, build_quantized_model, evaluate, quantized_path
+from utils.ai.text_encoder import EncoderStore
+from utils.ai.vocabulary import VocabularyError
+
+SEQUENCE_LENGTHS = {'sentiment': 35, 'emotion': 50}
+
+
+class Command(BaseCommand):
+    help = 'Build float16/int8 variants of the NumPy emotion models and report their size, speed and drift from float32'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--precision', nargs='+', choices=['float16', 'int8'], default=['float16', 'int8'])
+        parser.add_argument('--tolerance', type=float, default=0.02, help='maximum absolute drift allowed on any output probability of the held-out texts')
+
+    def handle(self, *args, **options):
+
+        encoders = EncoderStore(settings.EMOTION_VOCABULARIES, SEQUENCE_LENGTHS)
+
+        self.stdout.write('%-10s %-8s %10s %10s %12s %10s %10s' % ('model', 'precision', 'size [KB]', 'load [ms]', 'batch [ms]', 'max drift', 'mean drift'))
+
+        for name, source in settings.EMOTION_NUMPY_MODELS.items():
+
+            try:
+                sequences = encoders.get(name).encode(HELDOUT_TEXTS)
+            except VocabularyError as e:
+                raise CommandError(str(e))
+
+            reference = evaluate(source, source, sequences)
+            self.report(name, 'float32', reference)
+
+            for precision in options['precision']:
+
+                destination = quantized_path(source, precision)
+                candidate = destination.with_suffix('.tmp.npz')
+                build_quantized_model(source, candidate, precision)
+                result = evaluate(source, candidate, sequences)
+                self.report(name, precision, result)
+
+                if result['max_drift'] > options['tolerance']:
+                    os.remove(candidate)
+                    raise CommandError('%s %s drifts by %.4f, over the tolerance of %.4f' % (name, precision, result['max_drift'], options['tolerance']))
+
+                os.replace(candidate, destination)
+
+    def report(self, name, precision, result):
+        self.stdout.write('%-10s %-8s %10.1f %10.1f %12.2f %10.5f %10.5f' % (name, precision, result['size_bytes'] / 1024, result['load_seconds'] * 1000, result['batch_seconds'] * 1000, result['max_drift'], result['mean_drift']))
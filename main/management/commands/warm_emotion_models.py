@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from utils.ai.model_registry import model_registry
+
+
+class Command(BaseCommand):
+    help = 'Load the emotion models into the process-wide registry and report load time and memory'
+
+    def handle(self, *args, **options):
+
+        model_registry.warm_up()
+
+        for name, stats in model_registry.stats().items():
+            self.stdout.write('%s: loaded in %.2f s, +%.1f MB RSS' % (name, stats['load_seconds'], stats['rss_delta_bytes'] / 2**20))
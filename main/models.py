@@ -43,6 +43,8 @@ class TwitterCountryTrend(models.Model):
     id = models.AutoField(primary_key=True)
     insertion_datetime = models.DateTimeField(auto_now_add=True)
     country = models.ForeignKey(Country, on_delete=models.CASCADE)
+    is_current = models.BooleanField(default=True)
+    replaced_at = models.DateTimeField(null=True)
 
     def __str__(self):
         return self.country.name
@@ -68,6 +70,8 @@ class GoogleCountryTrend(models.Model):
     id = models.AutoField(primary_key=True)
     insertion_datetime = models.DateTimeField(auto_now_add=True)
     country = models.ForeignKey(Country, on_delete=models.CASCADE)
+    is_current = models.BooleanField(default=True)
+    replaced_at = models.DateTimeField(null=True)
 
     def __str__(self):
         return self.country.name
@@ -95,6 +99,8 @@ class GoogleWordTrend(models.Model):
     word = models.CharField(max_length=100)
     country = models.ForeignKey(Country, on_delete=models.CASCADE)
     period_type = models.CharField(max_length=10)
+    is_current = models.BooleanField(default=True)
+    replaced_at = models.DateTimeField(null=True)
 
     def __str__(self):
         return self.country.name + ' - ' + self.word
@@ -123,6 +129,8 @@ class GoogleRelatedTopic(models.Model):
     word = models.CharField(max_length=100)
     country = models.ForeignKey(Country, on_delete=models.CASCADE)
     period_type = models.CharField(max_length=10)
+    is_current = models.BooleanField(default=True)
+    replaced_at = models.DateTimeField(null=True)
 
     def __str__(self):
         return self.word
@@ -167,6 +175,8 @@ class YouTubeCountryTrend(models.Model):
     insertion_datetime = models.DateTimeField(auto_now_add=True)
     country = models.ForeignKey(Country, on_delete=models.CASCADE)
     trend_type = models.ForeignKey(YouTubeTrendType, on_delete=models.CASCADE, null=True)
+    is_current = models.BooleanField(default=True)
+    replaced_at = models.DateTimeField(null=True)
 
     def __str__(self):
         return self.country.name
@@ -196,4 +206,22 @@ class TrendEmotion(models.Model):
         return self.word + '-' + str(self.insertion_datetime)
 
     class Meta:
-        ordering = ['word', 'insertion_datetime', 'id']
\ No newline at end of file
+        ordering = ['word', 'insertion_datetime', 'id']
+
+class PrewarmTask(models.Model):
+
+    id = models.AutoField(primary_key=True)
+    source = models.CharField(max_length=20)
+    country = models.ForeignKey(Country, on_delete=models.CASCADE)
+    trend_type = models.ForeignKey(YouTubeTrendType, on_delete=models.CASCADE, null=True)
+    next_run = models.DateTimeField()
+    last_run = models.DateTimeField(null=True)
+    last_status = models.CharField(max_length=10, null=True)
+    last_error = models.CharField(max_length=200, null=True)
+    failures = models.SmallIntegerField(default=0)
+
+    def __str__(self):
+        return self.source + ' - ' + self.country.name + (' - ' + self.trend_type.name if self.trend_type else '')
+
+    class Meta:
+        ordering = ['next_run', 'id']
@@ -0,0 +1,10 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from main.models import Country
+from utils.country_registry import country_registry
+
+@receiver(post_save, sender=Country)
+@receiver(post_delete, sender=Country)
+def invalidate_country_registry(sender, **kwargs):
+    country_registry.invalidate()
@@ -0,0 +1,530 @@
+from django.test import TestCase
+from utils.ai.model_registry import ModelRegistry
+from utils.ai.neuronal_network import aggregate_emotions, get_model_version, predict_sequences, predict_emotions, prediction_cache, prediction_key
+from utils.ai import neuronal_network
+from utils.lru_cache import LRUCache
+from unittest import mock
+from utils.ai.inference_scheduler import InferenceScheduler
+from utils.ai.vocabulary import VocabularyError, load_vocabulary, save_vocabulary, tokenizer_from_vocabulary, vocabulary_from_tokenizer
+from utils.ai.text_encoder import EncoderStore, SequenceEncoder
+from utils.ai.numpy_runtime import export_keras_model, load_numpy_model, read_numpy_model
+from utils.ai.quantization import build_quantized_model, evaluate, quantize_arrays, quantized_path
+from pathlib import Path
+from utils.ai.model_registry import _keras_loader, _numpy_loader, get_runtime
+from django.core.exceptions import ImproperlyConfigured
+from django.conf import settings
+from tensorflow.keras.preprocessing.text import Tokenizer
+from tensorflow.keras.preprocessing.sequence import pad_sequences
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import numpy as np
+import threading
+import time
+
+# Tests of the emotion models registry
+
+class ModelRegistryTestCase(TestCase):
+
+    def setUp(self):
+        self.loaded = []
+
+        def loader(path):
+            time.sleep(0.05)
+            self.loaded.append(path)
+            return 'model-' + path
+
+        self.registry = ModelRegistry({'sentiment': 'a.h5', 'emotion': 'b.h5'}, loader=loader)
+
+    def test_correct_lazy_load(self):
+
+        self.assertFalse(self.registry.is_loaded('sentiment'))
+        self.assertEqual(self.registry.get('sentiment'), 'model-a.h5')
+        self.assertTrue(self.registry.is_loaded('sentiment'))
+        self.assertFalse(self.registry.is_loaded('emotion'))
+
+    def test_correct_load_once(self):
+
+        for _ in range(5):
+            self.registry.get('sentiment')
+
+        self.assertEqual(self.loaded, ['a.h5'])
+
+    def test_correct_load_once_concurrent(self):
+
+        threads = [threading.Thread(target=self.registry.get, args=('emotion',)) for _ in range(10)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(self.loaded, ['b.h5'])
+
+    def test_correct_warm_up_stats(self):
+
+        self.registry.warm_up()
+        stats = self.registry.stats()
+
+        self.assertEqual(sorted(self.loaded), ['a.h5', 'b.h5'])
+        self.assertEqual(set(stats.keys()), {'sentiment', 'emotion'})
+        self.assertGreater(stats['sentiment']['load_seconds'], 0)
+        self.assertGreaterEqual(stats['emotion']['rss_delta_bytes'], 0)
+
+    def test_correct_clear(self):
+
+        self.registry.get('sentiment')
+        self.registry.clear()
+        self.registry.get('sentiment')
+
+        self.assertEqual(self.loaded, ['a.h5', 'a.h5'])
+        self.assertEqual(self.registry.stats().keys(), {'sentiment'})
+
+    def test_incorrect_unknown_model(self):
+
+        with self.assertRaises(KeyError):
+            self.registry.get('unknown')
+
+
+# Tests of the batched inference
+
+class BatchedInferenceTestCase(TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.sequences_1 = rng.integers(0, 1000, size=(23, 35)).astype('int32')
+        self.sequences_2 = rng.integers(0, 1000, size=(23, 50)).astype('int32')
+        self.sequences_1[:, 20:] = 0
+        self.sequences_2[:, 30:] = 0
+
+    def test_correct_aggregation_matches_per_text_sums(self):
+
+        rng = np.random.default_rng(1)
+        results_1 = rng.dirichlet(np.ones(3), size=40).astype('float32')
+        results_2 = rng.dirichlet(np.ones(6), size=40).astype('float32')
+
+        sums_1, sums_2 = [0] * 3, [0] * 6
+        for r1, r2 in zip(results_1, results_2):
+            sums_1 = [a + b for a, b in zip(sums_1, r1)]
+            sums_2 = [a + b for a, b in zip(sums_2, r2)]
+        expected = [x / sum(sums_1) for x in sums_1] + [x / sum(sums_2) for x in sums_2]
+
+        np.testing.assert_allclose(aggregate_emotions(results_1, results_2), expected, rtol=1e-5)
+        self.assertAlmostEqual(sum(aggregate_emotions(results_1, results_2)[:3]), 1)
+        self.assertAlmostEqual(sum(aggregate_emotions(results_1, results_2)[3:]), 1)
+
+    def test_correct_batched_matches_per_text(self):
+
+        batched_1, batched_2 = predict_sequences(self.sequences_1, self.sequences_2, batch_size=8)
+
+        per_text_1, per_text_2 = [], []
+        for seq_1, seq_2 in zip(self.sequences_1, self.sequences_2):
+            r1, r2 = predict_sequences(seq_1[np.newaxis], seq_2[np.newaxis], batch_size=1)
+            per_text_1.append(r1[0])
+            per_text_2.append(r2[0])
+
+        self.assertEqual(batched_1.shape, (23, 3))
+        self.assertEqual(batched_2.shape, (23, 6))
+        np.testing.assert_allclose(batched_1, per_text_1, rtol=1e-4, atol=1e-6)
+        np.testing.assert_allclose(batched_2, per_text_2, rtol=1e-4, atol=1e-6)
+        np.testing.assert_allclose(aggregate_emotions(batched_1, batched_2), aggregate_emotions(np.array(per_text_1), np.array(per_text_2)), rtol=1e-5)
+
+
+# Tests of the micro-batching inference scheduler
+
+def fake_predict(texts):
+
+    # Each "probability" encodes the text so that the slices can be checked
+    values = np.array([float(t.split('-')[1]) for t in texts], dtype='float32')
+    time.sleep(0.02)
+    return np.repeat(values[:, np.newaxis], 3, axis=1), np.repeat(values[:, np.newaxis], 6, axis=1)
+
+class InferenceSchedulerTestCase(TestCase):
+
+    def test_correct_single_request(self):
+
+        scheduler = InferenceScheduler(fake_predict, max_batch_size=16, max_wait=0.001)
+        results_1, results_2 = scheduler.submit(['t-1', 't-2', 't-3'])
+
+        self.assertEqual(results_1.shape, (3, 3))
+        self.assertEqual(results_2.shape, (3, 6))
+        self.assertEqual(list(results_1[:, 0]), [1, 2, 3])
+        self.assertEqual(scheduler.metrics()['batches'], 1)
+
+    def test_correct_empty_request(self):
+
+        scheduler = InferenceScheduler(fake_predict)
+        results_1, results_2 = scheduler.submit([])
+
+        self.assertEqual(results_1.shape, (0, 3))
+        self.assertEqual(results_2.shape, (0, 6))
+        self.assertEqual(scheduler.metrics()['requests'], 0)
+
+    def test_correct_concurrent_requests_are_batched(self):
+
+        scheduler = InferenceScheduler(fake_predict, max_batch_size=1000, max_wait=0.05)
+        results = {}
+
+        def caller(i):
+            texts = ['t-%d' % (i * 100 + j) for j in range(5)]
+            results[i] = scheduler.submit(texts)
+
+        threads = [threading.Thread(target=caller, args=(i,)) for i in range(20)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        for i in range(20):
+            self.assertEqual(list(results[i][0][:, 0]), [i * 100 + j for j in range(5)])
+            self.assertEqual(list(results[i][1][:, 5]), [i * 100 + j for j in range(5)])
+
+        metrics = scheduler.metrics()
+        self.assertEqual(metrics['requests'], 20)
+        self.assertEqual(metrics['batched_texts'], 100)
+        self.assertLess(metrics['batches'], 20)
+        self.assertGreater(metrics['mean_batch_fill'], 0)
+        self.assertEqual(metrics['queue_depth'], 0)
+
+    def test_correct_batch_size_limit(self):
+
+        scheduler = InferenceScheduler(fake_predict, max_batch_size=5, max_wait=0.05)
+
+        threads = [threading.Thread(target=scheduler.submit, args=(['t-%d' % j for j in range(5)],)) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(scheduler.metrics()['batches'], 4)
+
+    def test_incorrect_predict_error_is_propagated(self):
+
+        def failing_predict(texts):
+            raise ValueError('model error')
+
+        scheduler = InferenceScheduler(failing_predict, max_wait=0.001)
+
+        with self.assertRaises(ValueError):
+            scheduler.submit(['t-1'])
+
+        # The worker keeps serving requests after an error
+        scheduler.predict_fn = fake_predict
+        self.assertEqual(list(scheduler.submit(['t-7'])[0][:, 0]), [7])
+
+
+# Tests of the tokenizer vocabularies
+
+CORPUS = [
+    'I love this song so much, it makes me happy!',
+    'This is the worst game I have ever seen...',
+    'Not sure what to think about the news today',
+    'The final was AMAZING, what a goal! #final',
+    "I'm scared of what could happen next @someone",
+    'so so so happy happy today',
+]
+
+class VocabularyTestCase(TestCase):
+
+    def setUp(self):
+        self.tokenizer = Tokenizer(num_words=10, oov_token='<UNK>')
+        self.tokenizer.fit_on_texts(CORPUS)
+        self.vocabulary = vocabulary_from_tokenizer(self.tokenizer, 'test/corpus')
+        self.path = os.path.join(tempfile.mkdtemp(), 'vocabulary.json')
+
+    def test_correct_only_top_words_are_kept(self):
+
+        self.assertEqual(len(self.vocabulary['word_index']), 9)
+        self.assertEqual(self.vocabulary['word_index']['<UNK>'], 1)
+        self.assertTrue(all(i < 10 for i in self.vocabulary['word_index'].values()))
+
+    def test_correct_save_and_load(self):
+
+        save_vocabulary(self.vocabulary, self.path)
+        self.assertEqual(load_vocabulary(self.path), self.vocabulary)
+
+    def test_correct_tokenizer_from_vocabulary(self):
+
+        save_vocabulary(self.vocabulary, self.path)
+        tokenizer = tokenizer_from_vocabulary(load_vocabulary(self.path))
+        texts = CORPUS + ['unknown words only', '', 'HAPPY song, the end']
+
+        self.assertEqual(tokenizer.texts_to_sequences(texts), self.tokenizer.texts_to_sequences(texts))
+
+    def test_incorrect_missing_vocabulary(self):
+
+        with self.assertRaises(VocabularyError):
+            load_vocabulary(self.path)
+
+    def test_incorrect_corrupted_vocabulary(self):
+
+        save_vocabulary(self.vocabulary, self.path)
+        with open(self.path) as f:
+            data = json.load(f)
+        data['word_index']['love'] = 2
+        with open(self.path, 'w') as f:
+            json.dump(data, f)
+
+        with self.assertRaises(VocabularyError):
+            load_vocabulary(self.path)
+
+    def test_incorrect_format_version(self):
+
+        vocabulary = dict(self.vocabulary, format_version=0)
+        save_vocabulary(vocabulary, self.path)
+
+        with self.assertRaises(VocabularyError):
+            load_vocabulary(self.path)
+
+
+# Tests of the inference-only text encoder
+
+def synthetic_corpus(n, seed=0):
+
+    rng = np.random.default_rng(seed)
+    words = ['love', 'HATE', 'happy', 'sad', 'goal!', 'news,', "don't", 'what?', '#final', '@user', 'http://t.co/x', 'café', 'ñandú', 'x\ry', 'a-b', '...', 'the', 'a', 'of', 'to']
+    words += ['word%d' % i for i in range(2000)]
+
+    corpus = []
+    for _ in range(n):
+        length = int(rng.integers(0, 80))
+        separators = rng.choice([' ', '  ', '\t', '\n', ', '], size=length)
+        corpus.append(''.join(words[int(rng.integers(0, len(words)))] + sep for sep in separators))
+    return corpus
+
+class SequenceEncoderTestCase(TestCase):
+
+    def setUp(self):
+        self.corpus = synthetic_corpus(1500)
+        self.tokenizer = Tokenizer(num_words=1000, oov_token='<UNK>')
+        self.tokenizer.fit_on_texts(self.corpus)
+        self.vocabulary = vocabulary_from_tokenizer(self.tokenizer, 'test/corpus')
+        self.texts = synthetic_corpus(500, seed=1) + ['', '   ', 'UNSEEN words ONLY', 'word1999 word5 Love']
+
+    def test_correct_matches_keras(self):
+
+        for maxlen in [35, 50]:
+            encoder = SequenceEncoder(self.vocabulary, maxlen)
+            expected = pad_sequences(self.tokenizer.texts_to_sequences(self.texts), truncating='post', padding='post', maxlen=maxlen)
+            encoded = encoder.encode(self.texts)
+
+            self.assertEqual(encoded.dtype, np.int32)
+            self.assertEqual(encoded.shape, (len(self.texts), maxlen))
+            np.testing.assert_array_equal(encoded, expected)
+
+    def test_correct_num_words_cut_off(self):
+
+        encoded = SequenceEncoder(self.vocabulary, 50).encode(self.texts)
+
+        self.assertLess(encoded.max(), 1000)
+        self.assertIn(1, encoded)
+
+    def test_correct_preallocated_output(self):
+
+        encoder = SequenceEncoder(self.vocabulary, 35)
+        out = np.full((len(self.texts), 35), -1, dtype=np.int32)
+
+        self.assertIs(encoder.encode(self.texts, out=out), out)
+        np.testing.assert_array_equal(out, encoder.encode(self.texts))
+
+    def test_correct_empty_batch(self):
+
+        self.assertEqual(SequenceEncoder(self.vocabulary, 35).encode([]).shape, (0, 35))
+
+
+# Tests of the NumPy runtime
+
+class NumpyRuntimeTestCase(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def test_correct_parity_with_keras(self):
+
+        rng = np.random.default_rng(0)
+
+        for name, path in settings.EMOTION_MODELS.items():
+            keras_model = _keras_loader(path)
+            numpy_path = os.path.join(self.directory, name + '.npz')
+            export_keras_model(keras_model, numpy_path)
+            numpy_model = load_numpy_model(numpy_path)
+
+            sequences = rng.integers(0, 1000, size=(40, keras_model.input_shape[1])).astype('int32')
+            sequences[:20, 10:] = 0
+
+            expected = keras_model.predict(sequences, verbose=0)
+            np.testing.assert_allclose(numpy_model.predict(sequences), expected, atol=1e-5)
+            np.testing.assert_allclose(numpy_model.predict(sequences, batch_size=7), expected, atol=1e-5)
+
+    def test_correct_shipped_models_match_keras(self):
+
+        sequences = np.random.default_rng(1).integers(0, 1000, size=(16, 50)).astype('int32')
+
+        for name, path in settings.EMOTION_MODELS.items():
+            keras_model = _keras_loader(path)
+            batch = sequences[:, :keras_model.input_shape[1]]
+            np.testing.assert_allclose(load_numpy_model(settings.EMOTION_NUMPY_MODELS[name]).predict(batch), keras_model.predict(batch, verbose=0), atol=1e-5)
+
+    def test_correct_numpy_runtime_does_not_import_tensorflow(self):
+
+        code = (
+            "import django, sys; django.setup();"
+            "from utils.ai.neuronal_network import predict_sequences;"
+            "import numpy as np;"
+            "r1, r2 = predict_sequences(np.zeros((2, 35), 'int32'), np.zeros((2, 50), 'int32'));"
+            "assert r1.shape == (2, 3) and r2.shape == (2, 6);"
+            "print('tensorflow' in sys.modules)"
+        )
+        env = dict(os.environ, EMOTION_MODEL_RUNTIME='numpy')
+        result = subprocess.run([sys.executable, '-c', code], env=env, cwd=settings.BASE_DIR, capture_output=True, text=True)
+
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), 'False')
+
+
+# Tests of the reduced-precision models
+
+class QuantizationTestCase(TestCase):
+
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.source = settings.EMOTION_NUMPY_MODELS['emotion']
+        self.sequences = np.random.default_rng(2).integers(0, 1000, size=(60, 50)).astype('int32')
+
+    def test_correct_quantized_path(self):
+
+        self.assertEqual(quantized_path('/m/trained_model_1.npz', 'int8'), Path('/m/trained_model_1.int8.npz'))
+        self.assertEqual(quantized_path('/m/trained_model_1.npz', 'float16'), Path('/m/trained_model_1.float16.npz'))
+        self.assertEqual(quantized_path('/m/trained_model_1.npz', 'float32'), Path('/m/trained_model_1.npz'))
+
+    def test_correct_int8_arrays(self):
+
+        config, arrays = read_numpy_model(self.source)
+        quantized_config, quantized = quantize_arrays(config, arrays, 'int8')
+
+        self.assertEqual(quantized_config['precision'], 'int8')
+        self.assertEqual(quantized['0/0'].dtype, np.int8)
+        self.assertEqual(quantized['0/0/scale'].shape, (1000, 1))
+        self.assertEqual(quantized['1/0/scale'].shape, (1, 60))
+        self.assertEqual(quantized['1/2'].dtype, np.float32)
+
+    def test_correct_variants_within_tolerance(self):
+
+        for precision, tolerance in [('float16', 0.005), ('int8', 0.05)]:
+            destination = self.directory / ('model.%s.npz' % precision)
+            build_quantized_model(self.source, destination, precision)
+            result = evaluate(self.source, destination, self.sequences)
+
+            self.assertLess(result['size_bytes'], os.path.getsize(self.source))
+            self.assertLess(result['max_drift'], tolerance)
+            self.assertGreater(result['batch_seconds'], 0)
+
+            outputs = load_numpy_model(destination).predict(self.sequences)
+            np.testing.assert_allclose(outputs.sum(axis=1), 1, rtol=1e-5)
+
+    def test_incorrect_unknown_precision(self):
+
+        config, arrays = read_numpy_model(self.source)
+
+        with self.assertRaises(ValueError):
+            quantize_arrays(config, arrays, 'int4')
+
+    def test_incorrect_precision_with_keras_runtime(self):
+
+        self.assertEqual(get_runtime('keras', 'float32')[1], _keras_loader)
+        self.assertEqual(get_runtime('numpy', 'int8')[1], _numpy_loader)
+
+        with self.assertRaises(ImproperlyConfigured):
+            get_runtime('keras', 'int8')
+
+
+# Tests of the prediction cache
+
+class LRUCacheTestCase(TestCase):
+
+    def test_correct_eviction(self):
+
+        cache = LRUCache(2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        self.assertIn('a', cache)
+        self.assertNotIn('b', cache)
+        self.assertEqual(len(cache), 2)
+
+    def test_correct_stats(self):
+
+        cache = LRUCache(10)
+        cache.set('a', 1)
+        cache.get('a')
+        cache.get('a')
+        cache.get('b')
+
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['size']), (2, 1, 1))
+        self.assertAlmostEqual(stats['hit_rate'], 2 / 3)
+
+class PredictionCacheTestCase(TestCase):
+
+    def setUp(self):
+        self.calls = []
+        prediction_cache.clear()
+
+        def fake_predict(texts, batch_size=None):
+            self.calls.append(list(texts))
+            values = np.array([len(t) for t in texts], dtype='float32')[:, np.newaxis]
+            return np.hstack([values, values + 1, values + 2]), np.hstack([values + k for k in range(6)])
+
+        patches = [
+            mock.patch('utils.ai.neuronal_network.predict_uncached', side_effect=fake_predict),
+            mock.patch('utils.ai.neuronal_network.get_model_version', return_value='v1'),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        self.addCleanup(prediction_cache.clear)
+
+    def test_correct_only_misses_are_predicted(self):
+
+        first = predict_emotions(['good day', 'bad day'])
+        second = predict_emotions(['good day', 'bad day', 'new text here'])
+
+        self.assertEqual(self.calls, [['good day', 'bad day'], ['new text here']])
+        self.assertEqual(prediction_cache.stats()['hits'], 2)
+        self.assertEqual(first, predict_emotions(['good day', 'bad day']))
+        self.assertEqual(len(second), 9)
+
+    def test_correct_cached_results_match_uncached(self):
+
+        texts = ['one', 'two two', 'three three three']
+        uncached = predict_emotions(texts)
+        cached = predict_emotions(texts)
+
+        self.assertEqual(len(self.calls), 1)
+        np.testing.assert_allclose(cached, uncached)
+
+    def test_correct_duplicates_predicted_once(self):
+
+        predict_emotions(['same', 'same', 'SAME', 'other'])
+
+        self.assertEqual(self.calls, [['same', 'other']])
+
+    def test_correct_key_normalisation(self):
+
+        self.assertEqual(prediction_key('Hello  World '), prediction_key('hello world'))
+        self.assertNotEqual(prediction_key('hello world'), prediction_key('hello\rworld'))
+
+        key = prediction_key('hello world')
+        with mock.patch('utils.ai.neuronal_network.get_model_version', return_value='v2'):
+            self.assertNotEqual(prediction_key('hello world'), key)
+
+    def test_incorrect_model_version_missing_vocabulary(self):
+
+        store = EncoderStore({'sentiment': '/nonexistent/sentiment_vocabulary.json'}, {'sentiment': 35})
+
+        with mock.patch.object(neuronal_network, 'encoder_store', store), mock.patch.object(neuronal_network, 'model_version', None):
+            with self.assertRaisesRegex(VocabularyError, 'build_vocabularies'):
+                get_model_version()
@@ -1,9 +1,29 @@
 from TopTrends.schema import Query
+from utils.country_registry import country_registry
 from django.test.testcases import TestCase
+from django.test import override_settings
+from main.models import Country, TwitterTrend, TwitterCountryTrend, GoogleTrend, GoogleCountryTrend, GoogleWordTrendPeriod, GoogleWordTrend, GoogleTopic, GoogleRelatedTopic, YouTubeTrend, YouTubeTrendType, YouTubeCountryTrend, TrendEmotion
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from utils.apis import twitter, google_trends, youtube
+from utils.apis.pytrends_pool import PyTrendsPool
+from utils.single_flight import flight_key
+from utils.snapshots import new_snapshot, collect_snapshots
+from django.utils import timezone
+from datetime import timedelta
+from datetime import datetime
+from unittest import mock
 import graphene
+import pandas as pd
+import pytz
 
 class CountriesTestCase(TestCase):
 
+    def setUp(self):
+
+        # Countries cached by a previous test may have been rolled back
+        country_registry.invalidate()
+
     def test_correct_all_countries(self):
 
         query = """
@@ -75,6 +95,11 @@ class CountriesTestCase(TestCase):
 
 class TwitterTrendsTestCase(TestCase):
 
+    def setUp(self):
+
+        # Countries cached by a previous test may have been rolled back
+        country_registry.invalidate()
+
     def test_correct_country_defined_trends_number(self):
 
         query = """
@@ -155,6 +180,11 @@ class TwitterTrendsTestCase(TestCase):
 
 class GoogleTrendsTestCase(TestCase):
 
+    def setUp(self):
+
+        # Countries cached by a previous test may have been rolled back
+        country_registry.invalidate()
+
     def test_correct_country_defined_trends_number(self):
 
         query = """
@@ -227,6 +257,11 @@ class GoogleTrendsTestCase(TestCase):
 
 class WordGoogleTrendsTestCase(TestCase):
 
+    def setUp(self):
+
+        # Countries cached by a previous test may have been rolled back
+        country_registry.invalidate()
+
     def test_correct_country_daily_period(self):
 
         query = """
@@ -317,6 +352,11 @@ class WordGoogleTrendsTestCase(TestCase):
 
 class WordRelatedTopicsTestCase(TestCase):
 
+    def setUp(self):
+
+        # Countries cached by a previous test may have been rolled back
+        country_registry.invalidate()
+
     def test_correct_country_daily_period(self):
 
         query = """
@@ -434,6 +474,11 @@ class WordRelatedTopicsTestCase(TestCase):
 
 class YouTubeTrendsTestCase(TestCase):
 
+    def setUp(self):
+
+        # Countries cached by a previous test may have been rolled back
+        country_registry.invalidate()
+
     def test_correct_specific_you_tube_video(self):
 
         query = """
@@ -785,6 +830,11 @@ class YouTubeTrendsTestCase(TestCase):
 
 class EmotionsTestCase(TestCase):
 
+    def setUp(self):
+
+        # Countries cached by a previous test may have been rolled back
+        country_registry.invalidate()
+
     def test_correct_word_trend_emotions(self):
 
         query = """
@@ -935,4 +985,431 @@ class EmotionsTestCase(TestCase):
         result = schema.execute(query)
         self.assertIsNone(result.errors)
         self.assertEqual(len(result.data['trendEmotions']), 0)
-        self.assertEqual(result.data['trendEmotions'], [])
\ No newline at end of file
+        self.assertEqual(result.data['trendEmotions'], [])
+
+class QueryBudgetTestCase(TestCase):
+
+    def setUp(self):
+
+        country_registry.invalidate()
+        self.country = Country.objects.create(name='Spain', native_name='España', acronym='ES', flag='https://flagcdn.com/es.svg', woeid=23424950, pn='spain', lat=40, lng=-4)
+
+        tct = TwitterCountryTrend.objects.create(country=self.country)
+        for i in range(10):
+            TwitterTrend.objects.create(name='Trend %d' % i, url='https://twitter.com/', tweet_volume=i, country_trend=tct)
+
+        gct = GoogleCountryTrend.objects.create(country=self.country)
+        for i in range(10):
+            GoogleTrend.objects.create(name='Trend %d' % i, country_trend=gct)
+
+        gwt = GoogleWordTrend.objects.create(word='Messi', country=self.country, period_type='daily')
+        for i in range(24):
+            GoogleWordTrendPeriod.objects.create(trend_datetime=datetime(2023, 1, 1, i, tzinfo=pytz.UTC), value=(i * 7) % 100, word_trend=gwt)
+
+        grt = GoogleRelatedTopic.objects.create(word='Messi', country=self.country, period_type='daily')
+        for i in range(15):
+            GoogleTopic.objects.create(topic_title='Topic %d' % i, topic_type='Topic', value=i, main_topic=grt)
+
+        yt_type = YouTubeTrendType.objects.create(name='Music', category_id=10)
+        yct = YouTubeCountryTrend.objects.create(country=self.country, trend_type=yt_type)
+        for i in range(10):
+            YouTubeTrend.objects.create(video_id='video%d' % i, title='Video %d' % i, published_at=datetime(2023, 1, 1, tzinfo=pytz.UTC), thumbnail='https://i.ytimg.com/', channel_title='Channel', country_trend=yct)
+
+        TrendEmotion.objects.create(word='Messi', negative_emotion=0.2, neutral_emotion=0.3, positive_emotion=0.5, sadness_emotion=0.1, fear_emotion=0.1, love_emotion=0.2, surprise_emotion=0.2, anger_emotion=0.1, joy_emotion=0.3)
+
+        self.schema = graphene.Schema(query=Query)
+
+        # The countries are already in memory when a request arrives
+        country_registry.all()
+
+    def execute(self, query, queries):
+
+        with self.assertNumQueries(queries):
+            result = self.schema.execute(query)
+
+        self.assertIsNone(result.errors)
+        return result.data
+
+    def test_correct_country_twitter_trends_queries(self):
+
+        data = self.execute('query{ countryTwitterTrends(country: "Spain", trendsNumber: 7){ name } }', 2)
+        self.assertEqual([t['name'] for t in data['countryTwitterTrends']], ['Trend %d' % i for i in range(7)])
+
+    def test_correct_country_google_trends_queries(self):
+
+        data = self.execute('query{ countryGoogleTrends(country: "Spain"){ name } }', 2)
+        self.assertEqual(len(data['countryGoogleTrends']), 5)
+
+    def test_correct_word_google_trends_queries(self):
+
+        data = self.execute('query{ wordGoogleTrends(word: "Messi", country: "Spain", periodType: "daily"){ id, value } }', 2)
+        self.assertEqual(len(data['wordGoogleTrends']), 24)
+        self.assertEqual([int(p['id']) for p in data['wordGoogleTrends']], sorted(int(p['id']) for p in data['wordGoogleTrends']))
+
+    def test_correct_word_related_topics_queries(self):
+
+        data = self.execute('query{ wordRelatedTopics(word: "Messi", country: "Spain", periodType: "daily", topicsNumber: 3){ topicTitle, value } }', 2)
+        self.assertEqual([t['value'] for t in data['wordRelatedTopics']], [14, 13, 12])
+
+    def test_correct_country_you_tube_trends_queries(self):
+
+        data = self.execute('query{ countryYouTubeTrends(country: "Spain", trendType: "Music", trendsNumber: 3){ videoId } }', 2)
+        self.assertEqual([v['videoId'] for v in data['countryYouTubeTrends']], ['video0', 'video1', 'video2'])
+
+    def test_correct_you_tube_video_queries(self):
+
+        data = self.execute('query{ youTubeVideo(videoId: "video3"){ title } }', 1)
+        self.assertEqual(data['youTubeVideo']['title'], 'Video 3')
+
+    def test_correct_trend_emotions_queries(self):
+
+        data = self.execute('query{ trendEmotions(word: "Messi"){ word, joyEmotion } }', 1)
+        self.assertEqual(data['trendEmotions'], [{'word': 'Messi', 'joyEmotion': 0.3}])
+
+    def test_correct_unknown_country_queries(self):
+
+        data = self.execute('query{ countryTwitterTrends(country: "Not country"){ name } }', 0)
+        self.assertEqual(data['countryTwitterTrends'], [])
+
+class LoaderWritesTestCase(TestCase):
+
+    def setUp(self):
+
+        country_registry.invalidate()
+        self.country = Country.objects.create(name='Spain', native_name='España', acronym='ES', flag='https://flagcdn.com/es.svg', woeid=23424950, pn='spain', lat=40, lng=-4)
+        YouTubeTrendType.objects.create(name='Music', category_id=10)
+        country_registry.all()
+
+    def inserts(self, queries, table):
+
+        # Table names are quoted as the database does it ("table" on sqlite, `table` on MySQL)
+        prefix = 'INSERT INTO %s' % connection.ops.quote_name(table)
+        return len([q for q in queries if q['sql'].startswith(prefix)])
+
+    def load(self, load, *args):
+
+        with CaptureQueriesContext(connection) as queries:
+            load(*args)
+
+        return queries.captured_queries
+
+    def test_correct_twitter_trends_one_insert(self):
+
+        trends = [('Trend %d' % i, 'https://twitter.com/', i) for i in range(50)]
+
+        with mock.patch('utils.apis.twitter.get_country_trends', return_value=trends):
+            queries = self.load(twitter.load_country_trends, 'Spain')
+
+        self.assertEqual(self.inserts(queries, 'main_twittertrend'), 1)
+        self.assertEqual(list(TwitterTrend.objects.values_list('name', flat=True)), [t[0] for t in trends])
+
+    def test_correct_google_trends_one_insert(self):
+
+        trends = ['Trend %d' % i for i in range(20)]
+
+        with mock.patch('utils.apis.google_trends.get_country_trends', return_value=trends):
+            queries = self.load(google_trends.load_country_trends, 'Spain')
+
+        self.assertEqual(self.inserts(queries, 'main_googletrend'), 1)
+        self.assertEqual(list(GoogleTrend.objects.values_list('name', flat=True)), trends)
+
+    def test_correct_word_google_trends_one_insert(self):
+
+        client = mock.Mock()
+        client.interest_over_time.return_value = pd.DataFrame({'Messi': range(24)}, index=pd.date_range('2023-01-01', periods=24, freq='H'))
+
+        with mock.patch.object(google_trends, 'pytrends_pool', PyTrendsPool(factory=lambda: client)):
+            queries = self.load(google_trends.load_google_word_trend, 'Messi', 'Spain', 'daily')
+
+        self.assertEqual(self.inserts(queries, 'main_googlewordtrendperiod'), 1)
+        self.assertEqual(GoogleWordTrendPeriod.objects.count(), 24)
+
+    def test_correct_related_topics_one_insert(self):
+
+        topics = pd.DataFrame({'topic_title': ['Topic %d' % i for i in range(15)], 'topic_type': 'Topic', 'value': range(15)})
+        client = mock.Mock()
+        client.related_topics.return_value = {'Messi': {'top': topics}}
+
+        with mock.patch.object(google_trends, 'pytrends_pool', PyTrendsPool(factory=lambda: client)):
+            queries = self.load(google_trends.load_related_topics, 'Messi', 'Spain', 'daily')
+
+        self.assertEqual(self.inserts(queries, 'main_googletopic'), 1)
+        self.assertEqual(GoogleTopic.objects.count(), 15)
+
+    def test_correct_youtube_trends_one_insert(self):
+
+        trends = [('video%d' % i, 'Video %d' % i, '2023-01-01T00:00:00Z', 'https://i.ytimg.com/', 'Channel', (i, i, i)) for i in range(30)]
+
+        with mock.patch('utils.apis.youtube.get_country_trends', return_value=trends):
+            queries = self.load(youtube.load_country_trends, 'Spain', 'Music')
+
+        self.assertEqual(self.inserts(queries, 'main_youtubetrend'), 1)
+        self.assertEqual(YouTubeTrend.objects.count(), 30)
+
+    def test_correct_snapshot_replaced_atomically(self):
+
+        old = TwitterCountryTrend.objects.create(country=self.country)
+        TwitterTrend.objects.create(name='Old trend', url='https://twitter.com/', tweet_volume=1, country_trend=old)
+
+        with mock.patch('utils.apis.twitter.get_country_trends', return_value=[('Trend', 'https://twitter.com/', 1)]):
+            with mock.patch('main.models.TwitterTrend.objects.bulk_create', side_effect=Exception('Write failed')):
+                with self.assertRaises(Exception):
+                    twitter.load_country_trends('Spain')
+
+        self.assertEqual(list(TwitterCountryTrend.objects.filter(is_current=True)), [old])
+        self.assertEqual(list(TwitterTrend.objects.values_list('name', flat=True)), ['Old trend'])
+
+class SnapshotVersionsTestCase(TestCase):
+
+    def setUp(self):
+
+        country_registry.invalidate()
+        self.country = Country.objects.create(name='Spain', native_name='España', acronym='ES', flag='https://flagcdn.com/es.svg', woeid=23424950, pn='spain', lat=40, lng=-4)
+        self.schema = graphene.Schema(query=Query)
+        self.query = 'query{ countryTwitterTrends(country: "Spain", trendsNumber: 10){ name } }'
+
+        self.old = TwitterCountryTrend.objects.create(country=self.country)
+        TwitterTrend.objects.create(name='Old trend', url='https://twitter.com/', tweet_volume=1, country_trend=self.old)
+
+    def served(self):
+        return [t['name'] for t in self.schema.execute(self.query).data['countryTwitterTrends']]
+
+    def load(self, names):
+        with mock.patch('utils.apis.twitter.get_country_trends', return_value=[(name, 'https://twitter.com/', 1) for name in names]):
+            twitter.load_country_trends('Spain')
+
+    def test_correct_new_version_becomes_current(self):
+
+        self.load(['New trend 1', 'New trend 2'])
+
+        self.old.refresh_from_db()
+        self.assertFalse(self.old.is_current)
+        self.assertIsNotNone(self.old.replaced_at)
+        self.assertEqual(TwitterCountryTrend.objects.filter(is_current=True).count(), 1)
+        self.assertEqual(self.served(), ['New trend 1', 'New trend 2'])
+
+    def test_correct_readers_see_old_version_while_writing(self):
+
+        with new_snapshot(TwitterCountryTrend(country=self.country), country=self.country) as tct:
+            TwitterTrend.objects.create(name='New trend', url='https://twitter.com/', tweet_volume=1, country_trend=tct)
+            self.assertEqual(self.served(), ['Old trend'])
+
+        self.assertEqual(self.served(), ['New trend'])
+
+    def test_correct_failed_write_keeps_current_version(self):
+
+        with self.assertRaises(ValueError):
+            with new_snapshot(TwitterCountryTrend(country=self.country), country=self.country):
+                raise ValueError('Upstream error')
+
+        self.assertEqual(list(TwitterCountryTrend.objects.all()), [self.old])
+        self.assertEqual(self.served(), ['Old trend'])
+
+    def test_correct_versions_per_key(self):
+
+        other = Country.objects.create(name='Portugal', native_name='Portugal', acronym='PT', flag='https://flagcdn.com/pt.svg', woeid=23424925, lat=39.5, lng=-8)
+        TwitterCountryTrend.objects.create(country=other)
+
+        self.load(['New trend'])
+
+        self.assertTrue(TwitterCountryTrend.objects.get(country=other).is_current)
+
+    def test_correct_collect_after_grace_period(self):
+
+        self.load(['New trend'])
+
+        self.assertEqual(collect_snapshots(TwitterCountryTrend, country=self.country), 0)
+
+        deleted = collect_snapshots(TwitterCountryTrend, now=timezone.now() + timedelta(hours=1), country=self.country)
+
+        self.assertEqual(deleted, 2)
+        self.assertEqual(TwitterCountryTrend.objects.count(), 1)
+        self.assertEqual(list(TwitterTrend.objects.values_list('name', flat=True)), ['New trend'])
+
+    def test_correct_collect_scheduled_after_commit(self):
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.load(['New trend'])
+
+        self.assertEqual(len(callbacks), 1)
+
+    def test_correct_you_tube_video_current_version(self):
+
+        yt_type = YouTubeTrendType.objects.create(name='Music', category_id=10)
+
+        for title in ['Old title', 'New title']:
+            with new_snapshot(YouTubeCountryTrend(country=self.country, trend_type=yt_type), country=self.country, trend_type=yt_type) as yct:
+                YouTubeTrend.objects.create(video_id='video', title=title, published_at=datetime(2023, 1, 1, tzinfo=pytz.UTC), thumbnail='https://i.ytimg.com/', channel_title='Channel', country_trend=yct)
+
+        result = self.schema.execute('query{ youTubeVideo(videoId: "video"){ title } }')
+
+        self.assertEqual(result.data['youTubeVideo']['title'], 'New title')
+
+def youtube_page(start, size, total):
+
+    items = [{'id': 'video%d' % i, 'snippet': {'title': 'Video %d' % i, 'publishedAt': '2023-01-01T00:00:00Z', 'channelTitle': 'Channel'}, 'statistics': {'viewCount': str(i * 100), 'likeCount': str(i)}} for i in range(start, min(start + size, total))]
+    data = {'items': items}
+    if start + size < total:
+        data['nextPageToken'] = str(start + size)
+
+    return mock.Mock(status_code=200, json=mock.Mock(return_value=data))
+
+class YouTubeFetchTestCase(TestCase):
+
+    def setUp(self):
+
+        country_registry.invalidate()
+        Country.objects.create(name='Spain', native_name='España', acronym='ES', flag='https://flagcdn.com/es.svg', woeid=23424950, pn='spain', lat=40, lng=-4)
+        YouTubeTrendType.objects.create(name='Music', category_id=10)
+        YouTubeTrendType.objects.create(name='Default', category_id=0)
+
+    def fake_get(self, size, total):
+
+        def get(url):
+            start = int(url.split('&pageToken=')[1]) if '&pageToken=' in url else 0
+            return youtube_page(start, size, total)
+
+        return mock.patch('utils.apis.youtube.http_client.get', side_effect=get)
+
+    @override_settings(YOUTUBE_TRENDS_LIMIT=10)
+    def test_correct_one_request_with_statistics(self):
+
+        with mock.patch.dict('os.environ', {'YOUTUBE_API_KEY': 'key'}), self.fake_get(10, 100) as get:
+            trends = youtube.get_country_trends('Spain', 'Music')
+
+        url = get.call_args_list[0][0][0]
+        self.assertEqual(get.call_count, 1)
+        self.assertIn('part=snippet,statistics', url)
+        self.assertIn('maxResults=10', url)
+        self.assertIn('videoCategoryId=10', url)
+        self.assertEqual(len(trends), 10)
+        self.assertEqual(trends[3][5], (300, 3, None))
+
+    @override_settings(YOUTUBE_TRENDS_LIMIT=12, YOUTUBE_TRENDS_MAX_PAGES=5)
+    def test_correct_pages_walked_until_limit(self):
+
+        with mock.patch.dict('os.environ', {'YOUTUBE_API_KEY': 'key'}), self.fake_get(5, 100) as get:
+            trends = youtube.get_country_trends('Spain', 'Default')
+
+        self.assertEqual(get.call_count, 3)
+        self.assertEqual([t[0] for t in trends], ['video%d' % i for i in range(12)])
+        self.assertNotIn('videoCategoryId', get.call_args_list[0][0][0])
+
+    @override_settings(YOUTUBE_TRENDS_LIMIT=100, YOUTUBE_TRENDS_MAX_PAGES=2)
+    def test_correct_max_pages(self):
+
+        with mock.patch.dict('os.environ', {'YOUTUBE_API_KEY': 'key'}), self.fake_get(5, 100) as get:
+            trends = youtube.get_country_trends('Spain', 'Music')
+
+        self.assertEqual(get.call_count, 2)
+        self.assertEqual(len(trends), 10)
+
+    @override_settings(YOUTUBE_TRENDS_LIMIT=50)
+    def test_correct_last_page(self):
+
+        with mock.patch.dict('os.environ', {'YOUTUBE_API_KEY': 'key'}), self.fake_get(5, 7) as get:
+            trends = youtube.get_country_trends('Spain', 'Music')
+
+        self.assertEqual(get.call_count, 2)
+        self.assertEqual(len(trends), 7)
+
+    def test_incorrect_error_response(self):
+
+        with mock.patch.dict('os.environ', {'YOUTUBE_API_KEY': 'key'}), mock.patch('utils.apis.youtube.http_client.get', return_value=mock.Mock(status_code=403)):
+            self.assertEqual(youtube.get_country_trends('Spain', 'Music'), [])
+
+    @override_settings(YOUTUBE_TRENDS_LIMIT=5)
+    def test_correct_countries_trends_at_once(self):
+
+        Country.objects.create(name='Portugal', native_name='Portugal', acronym='PT', flag='https://flagcdn.com/pt.svg', woeid=23424925, lat=39.5, lng=-8)
+        country_registry.invalidate()
+
+        with mock.patch.dict('os.environ', {'YOUTUBE_API_KEY': 'key'}), mock.patch('utils.apis.async_fetch.http_client.get', return_value=youtube_page(0, 5, 5)) as get:
+            errors = youtube.load_countries_trends([(country, trend_type) for country in ['Spain', 'Portugal', 'Not country'] for trend_type in ['Default', 'Music']])
+
+        self.assertEqual(errors, [None] * 6)
+        self.assertEqual(get.call_count, 4)
+        self.assertEqual(YouTubeCountryTrend.objects.filter(is_current=True).count(), 4)
+        self.assertEqual(YouTubeTrend.objects.count(), 20)
+
+    def test_correct_countries_trends_single_flight(self):
+
+        # Each chart is written under the key of load_country_trends, and its errors are returned in place
+        keys = []
+
+        def do(key, fn, *args, **kwargs):
+            if key[1] != 'load_country_trends':
+                return fn(*args)
+            keys.append(key)
+            if key[3] == 'Music':
+                raise ValueError('Lock timeout')
+
+        with mock.patch.dict('os.environ', {'YOUTUBE_API_KEY': 'key'}), \
+             mock.patch('utils.apis.async_fetch.http_client.get', return_value=youtube_page(0, 5, 5)), \
+             mock.patch('utils.apis.youtube.flights.do', side_effect=do):
+            errors = youtube.load_countries_trends([('Spain', 'Default'), ('Spain', 'Music')])
+
+        self.assertEqual(keys, [flight_key(youtube.load_country_trends, 'Spain', trend_type) for trend_type in ['Default', 'Music']])
+        self.assertIsNone(errors[0])
+        self.assertEqual(str(errors[1]), 'Lock timeout')
+
+def comment_page(likes, token=None):
+
+    items = [{'snippet': {'topLevelComment': {'snippet': {'textDisplay': 'Comment %d' % l if isinstance(l, int) else l[1], 'likeCount': l if isinstance(l, int) else l[0]}}}} for l in likes]
+    data = {'items': items}
+    if token:
+        data['nextPageToken'] = token
+
+    return mock.Mock(status_code=200, json=mock.Mock(return_value=data))
+
+class YouTubeCommentsTestCase(TestCase):
+
+    def setUp(self):
+        patch = mock.patch.dict('os.environ', {'YOUTUBE_API_KEY': 'key'})
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_correct_stops_once_enough_comments(self):
+
+        with mock.patch('utils.apis.youtube.http_client.get', side_effect=[comment_page(range(100), 'next'), comment_page(range(100, 200))]) as get:
+            comments = youtube.get_relevant_comments('video', 3)
+
+        url = get.call_args_list[0][0][0]
+        self.assertEqual(get.call_count, 1)
+        self.assertIn('maxResults=100', url)
+        self.assertIn('order=relevance', url)
+        self.assertEqual(comments, ['Comment 99', 'Comment 98', 'Comment 97'])
+
+    def test_correct_top_comments_across_pages(self):
+
+        pages = [comment_page([5, 1], 'p2'), comment_page([(9, 'Top'), (5, 'Later tie')], 'p3'), comment_page([7])]
+
+        with mock.patch('utils.apis.youtube.http_client.get', side_effect=pages) as get:
+            comments = youtube.get_relevant_comments('video', 10)
+
+        self.assertEqual(get.call_count, 3)
+        self.assertTrue(get.call_args_list[1][0][0].endswith('&pageToken=p2'))
+        self.assertEqual(comments, ['Top', 'Comment 7', 'Comment 5', 'Later tie', 'Comment 1'])
+
+    @override_settings(YOUTUBE_COMMENTS_MAX_PAGES=2)
+    def test_correct_max_pages(self):
+
+        with mock.patch('utils.apis.youtube.http_client.get', return_value=comment_page([1], 'next')) as get:
+            comments = youtube.get_relevant_comments('video', 50)
+
+        self.assertEqual(get.call_count, 2)
+        self.assertEqual(len(comments), 2)
+
+    def test_correct_no_state_between_calls(self):
+
+        with mock.patch('utils.apis.youtube.http_client.get', return_value=comment_page([1, 2])):
+            first = youtube.get_relevant_comments('video', 50)
+            second = youtube.get_relevant_comments('video', 50)
+
+        self.assertEqual(first, ['Comment 2', 'Comment 1'])
+        self.assertEqual(second, first)
+
+    def test_incorrect_error_response(self):
+
+        with mock.patch('utils.apis.youtube.http_client.get', side_effect=[comment_page([1, 2], 'next'), mock.Mock(status_code=403)]):
+            self.assertEqual(youtube.get_relevant_comments('video', 50), ['Comment 2', 'Comment 1'])
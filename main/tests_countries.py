@@ -1,5 +1,10 @@
 from django.test import TestCase
 from main.models import Country
+from utils.country_registry import CountryRegistry, country_registry
+from utils.aux_functions import setup_countries, setup_words
+from TopTrends.schema import Query
+import graphene
+from unittest import mock
 
 # Tests of the Country model
 
@@ -540,4 +545,88 @@ class CountryModelTestCase(TestCase):
                 
         self.assertEqual(Country.objects.count(), 1)
         self.country.delete()
-        self.assertEqual(Country.objects.count(), 0)
\ No newline at end of file
+        self.assertEqual(Country.objects.count(), 0)
+
+# Tests of the in-memory country registry
+
+class CountryRegistryTestCase(TestCase):
+
+    def setUp(self):
+
+        country_registry.invalidate()
+        self.brazil = Country.objects.create(name='Brazil', native_name='Brasil', acronym='BR', flag=FLAG_URL, woeid=455189, pn='brazil', lat=-10, lng=-55)
+        self.spain = Country.objects.create(name='Spain', native_name='España', acronym='ES', flag=FLAG_URL, woeid=23424950, pn='spain', lat=40, lng=-4)
+        self.andorra = Country.objects.create(name='Andorra', native_name='Andorra', acronym='AD', flag=FLAG_URL, woeid=None, pn=None, lat=42.5, lng=1.5)
+
+    def test_correct_lookups(self):
+
+        self.assertEqual(country_registry.by_name('Brazil'), self.brazil)
+        self.assertEqual(country_registry.by_acronym('ES'), self.spain)
+        self.assertEqual(country_registry.by_woeid(23424950), self.spain)
+        self.assertEqual(country_registry.by_pn('brazil'), self.brazil)
+        self.assertEqual(country_registry.all(), [self.andorra, self.brazil, self.spain])
+        self.assertIsNone(country_registry.by_name('Not country'))
+        self.assertIsNone(country_registry.by_woeid(None))
+
+    def test_correct_no_queries_once_loaded(self):
+
+        country_registry.all()
+
+        with self.assertNumQueries(0):
+            country_registry.by_name('Spain')
+            country_registry.by_acronym('BR')
+            country_registry.by_woeid(455189)
+            country_registry.by_pn('spain')
+            setup_countries({'country': 'Spain'})
+            setup_words({'country': 'Brazil', 'word': 'Messi', 'period_type': 'daily'})
+
+    def test_correct_invalidated_on_save(self):
+
+        country_registry.all()
+        self.brazil.woeid = 1
+        self.brazil.save()
+
+        self.assertEqual(country_registry.by_name('Brazil').woeid, 1)
+        self.assertEqual(country_registry.by_woeid(1), self.brazil)
+
+    def test_correct_invalidated_on_delete(self):
+
+        country_registry.all()
+        self.spain.delete()
+
+        self.assertIsNone(country_registry.by_name('Spain'))
+        self.assertEqual(len(country_registry.all()), 2)
+
+    def test_correct_all_countries_resolver_queries(self):
+
+        schema = graphene.Schema(query=Query)
+        schema.execute('query{ allCountries{ name } }')
+
+        with self.assertNumQueries(0):
+            result = schema.execute('query{ allCountries{ name, acronym } }')
+            self.assertEqual([c['name'] for c in result.data['allCountries']], ['Andorra', 'Brazil', 'Spain'])
+
+            result = schema.execute('query{ allCountries(acronym: "es"){ name } }')
+            self.assertEqual(result.data['allCountries'], [{'name': 'Spain'}])
+
+            result = schema.execute('query{ allCountries(acronym: "AA"){ name } }')
+            self.assertEqual(result.data['allCountries'], [])
+
+    def test_correct_ttl_reload(self):
+
+        registry = CountryRegistry(ttl=0)
+        registry.all()
+
+        with self.assertNumQueries(2):
+            registry.by_name('Spain')
+
+    def test_correct_reload_without_lock(self):
+
+        # The advisory lock (MySQL) would add GET_LOCK/RELEASE_LOCK queries to every reload
+        registry = CountryRegistry(ttl=0)
+
+        with mock.patch('utils.single_flight.advisory_lock') as advisory_lock:
+            registry.all()
+            registry.by_name('Spain')
+
+        advisory_lock.assert_not_called()
@@ -0,0 +1,189 @@
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from main.models import Country, TwitterCountryTrend
+from TopTrends.schema import Query
+from utils.country_registry import country_registry
+from utils.freshness import FreshnessPolicy, get_policy, freshness, is_fresh, FRESH, STALE, EXPIRED
+from utils.refresh import refreshed_snapshot, schedule_refresh, wait_for_refreshes
+from datetime import datetime, timedelta
+from unittest import mock
+import graphene
+import pytz
+import threading
+
+# Tests of the snapshot freshness policies
+
+FRESHNESS = {
+    'default': {'ttl': 100},
+    'twitter': {'ttl': 3600, 'stale': 1800},
+    'youtube': {'ttl': 600, 'stale': 600},
+    'youtube.Music': {'ttl': 60},
+}
+
+class FreshnessPolicyTestCase(TestCase):
+
+    def setUp(self):
+        self.policy = FreshnessPolicy(3600, 1800)
+        self.now = datetime(2023, 5, 1, 12, 0, 0, tzinfo=pytz.UTC)
+
+    def test_correct_states(self):
+
+        self.assertEqual(self.policy.state(self.now - timedelta(minutes=59), self.now), FRESH)
+        self.assertEqual(self.policy.state(self.now - timedelta(minutes=61), self.now), STALE)
+        self.assertEqual(self.policy.state(self.now - timedelta(minutes=91), self.now), EXPIRED)
+
+    def test_correct_zero_microseconds(self):
+
+        inserted_at = datetime(2023, 5, 1, 11, 30, 0, 0, tzinfo=pytz.UTC)
+        self.assertEqual(self.policy.state(inserted_at, self.now), FRESH)
+
+    def test_correct_time_zones(self):
+
+        # 13:30 in Madrid (CEST) is 11:30 UTC
+        inserted_at = pytz.timezone('Europe/Madrid').localize(datetime(2023, 5, 1, 13, 30))
+        self.assertEqual(self.policy.state(inserted_at, self.now), FRESH)
+
+        inserted_at = pytz.timezone('America/New_York').localize(datetime(2023, 5, 1, 6, 50))
+        self.assertEqual(self.policy.state(inserted_at, self.now), STALE)
+
+    def test_correct_naive_datetime_is_utc(self):
+
+        self.assertEqual(self.policy.state(datetime(2023, 5, 1, 11, 30), self.now), FRESH)
+
+    def test_correct_without_stale_window(self):
+
+        policy = FreshnessPolicy(60)
+        self.assertEqual(policy.state(self.now - timedelta(seconds=61), self.now), EXPIRED)
+
+    @override_settings(TREND_FRESHNESS=FRESHNESS)
+    def test_correct_policy_lookup(self):
+
+        self.assertEqual(get_policy('twitter').ttl, timedelta(hours=1))
+        self.assertEqual(get_policy('twitter').stale, timedelta(minutes=30))
+        self.assertEqual(get_policy('youtube', 'Music').ttl, timedelta(minutes=1))
+        self.assertEqual(get_policy('youtube', 'Gaming').ttl, timedelta(minutes=10))
+        self.assertEqual(get_policy('emotions').ttl, timedelta(seconds=100))
+
+class SnapshotFreshnessTestCase(TestCase):
+
+    def setUp(self):
+
+        country_registry.invalidate()
+        self.country = Country.objects.create(name='Spain', native_name='España', acronym='ES', flag='https://flagcdn.com/es.svg', woeid=23424950, pn='spain', lat=40, lng=-4)
+        self.snapshot = TwitterCountryTrend.objects.create(country=self.country)
+        self.schema = graphene.Schema(query=Query)
+
+    def age(self, seconds):
+        TwitterCountryTrend.objects.filter(id=self.snapshot.id).update(insertion_datetime=timezone.now() - timedelta(seconds=seconds))
+        self.snapshot.refresh_from_db()
+
+    @override_settings(TREND_FRESHNESS=FRESHNESS)
+    def test_correct_snapshot_freshness(self):
+
+        self.assertTrue(is_fresh(self.snapshot, 'twitter'))
+        self.age(4000)
+        self.assertFalse(is_fresh(self.snapshot, 'twitter'))
+        self.assertEqual(freshness(self.snapshot, 'twitter'), STALE)
+        self.assertFalse(is_fresh(None, 'twitter'))
+
+    @override_settings(TREND_FRESHNESS=FRESHNESS)
+    def test_correct_resolver_uses_policy(self):
+
+        with mock.patch('utils.apis.twitter.load_country_trends') as load:
+            self.schema.execute('query{ countryTwitterTrends(country: "Spain"){ name } }')
+            load.assert_not_called()
+
+            self.age(3700)
+            self.schema.execute('query{ countryTwitterTrends(country: "Spain"){ name } }')
+            wait_for_refreshes()
+            load.assert_called_once_with('Spain')
+
+
+# Tests of the stale-while-revalidate refresh
+
+class StaleWhileRevalidateTestCase(TestCase):
+
+    def setUp(self):
+
+        country_registry.invalidate()
+        self.country = Country.objects.create(name='Spain', native_name='España', acronym='ES', flag='https://flagcdn.com/es.svg', woeid=23424950, pn='spain', lat=40, lng=-4)
+        self.snapshot = TwitterCountryTrend.objects.create(country=self.country)
+        self.snapshots = TwitterCountryTrend.objects.filter(country=self.country)
+        self.release = threading.Event()
+        self.calls = []
+
+    def slow_load(self, name):
+        self.calls.append(name)
+        self.release.wait(5)
+
+    def age(self, seconds):
+        self.snapshots.update(insertion_datetime=timezone.now() - timedelta(seconds=seconds))
+
+    @override_settings(TREND_FRESHNESS=FRESHNESS)
+    def test_correct_stale_snapshot_served_without_waiting(self):
+
+        self.age(4000)
+
+        for _ in range(5):
+            self.assertEqual(refreshed_snapshot(self.snapshots, 'twitter', None, self.slow_load, 'Spain'), self.snapshot)
+
+        self.release.set()
+        wait_for_refreshes()
+        self.assertEqual(self.calls, ['Spain'])
+
+    @override_settings(TREND_FRESHNESS=FRESHNESS)
+    def test_correct_one_refresh_per_key(self):
+
+        first = schedule_refresh(self.slow_load, 'Spain')
+        second = schedule_refresh(self.slow_load, 'Spain')
+        other = schedule_refresh(self.slow_load, 'France')
+
+        self.assertIs(first, second)
+        self.assertIsNot(first, other)
+
+        self.release.set()
+        wait_for_refreshes()
+        self.assertEqual(sorted(self.calls), ['France', 'Spain'])
+
+        # Once finished, a new refresh can be scheduled for the key
+        schedule_refresh(self.slow_load, 'Spain')
+        wait_for_refreshes()
+        self.assertEqual(len(self.calls), 3)
+
+    @override_settings(TREND_FRESHNESS=FRESHNESS)
+    def test_correct_expired_snapshot_blocks(self):
+
+        self.age(6000)
+        self.release.set()
+
+        def load(name):
+            self.calls.append(name)
+            self.snapshots.update(insertion_datetime=timezone.now())
+
+        snapshot = refreshed_snapshot(self.snapshots, 'twitter', None, load, 'Spain')
+
+        self.assertEqual(self.calls, ['Spain'])
+        self.assertTrue(is_fresh(snapshot, 'twitter'))
+
+    @override_settings(TREND_FRESHNESS=FRESHNESS, TREND_BACKGROUND_REFRESH=False)
+    def test_correct_background_refresh_disabled(self):
+
+        self.age(4000)
+        self.release.set()
+        refreshed_snapshot(self.snapshots, 'twitter', None, self.slow_load, 'Spain')
+
+        self.assertEqual(self.calls, ['Spain'])
+
+    def test_correct_failed_refresh_is_released(self):
+
+        def failing_load(name):
+            raise ValueError('upstream error')
+
+        with self.assertLogs('utils.refresh', level='ERROR'):
+            schedule_refresh(failing_load, 'Spain')
+            wait_for_refreshes()
+
+        self.release.set()
+        schedule_refresh(self.slow_load, 'Spain')
+        wait_for_refreshes()
+        self.assertEqual(self.calls, ['Spain'])
@@ -0,0 +1,244 @@
+from django.test import SimpleTestCase
+from django.conf import settings
+from utils.apis.http_client import HttpClient
+from utils.apis import twitter
+from utils.apis.async_fetch import run, fetch, fetch_all, youtube_trending_videos_many
+from utils.prewarm import RateLimiter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+import asyncio
+import requests
+import threading
+import time
+
+# Tests of the shared HTTP client of the upstream APIs
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'{}')
+
+    def log_message(self, *args):
+        pass
+
+def response(status_code, headers=None):
+    return mock.Mock(status_code=status_code, headers=headers or {})
+
+class HttpClientTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.client = HttpClient(retries=3, backoff=0.5, max_backoff=4)
+        sleep = mock.patch('utils.apis.http_client.time.sleep')
+        self.sleep = sleep.start()
+        self.addCleanup(sleep.stop)
+
+    def test_correct_retry_on_server_errors(self):
+
+        with mock.patch.object(self.client.session, 'request', side_effect=[response(503), response(429), response(200)]) as request:
+            with self.assertLogs('utils.apis.http_client', level='WARNING'):
+                result = self.client.get('https://api.example.com/trends')
+
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual(request.call_count, 3)
+        self.assertEqual(self.sleep.call_count, 2)
+        self.assertEqual(self.client.metrics()['retries'], 2)
+
+    def test_correct_client_errors_not_retried(self):
+
+        with mock.patch.object(self.client.session, 'request', return_value=response(404)) as request:
+            self.assertEqual(self.client.get('https://api.example.com/trends').status_code, 404)
+
+        self.assertEqual(request.call_count, 1)
+
+    def test_correct_last_response_after_retries(self):
+
+        with mock.patch.object(self.client.session, 'request', return_value=response(429)) as request:
+            with self.assertLogs('utils.apis.http_client', level='WARNING'):
+                self.assertEqual(self.client.get('https://api.example.com/trends').status_code, 429)
+
+        self.assertEqual(request.call_count, 4)
+
+    def test_correct_retry_after(self):
+
+        self.assertEqual(self.client.backoff_delay(0, response(429, {'Retry-After': '2'})), 2)
+        self.assertEqual(self.client.backoff_delay(0, response(429, {'Retry-After': '120'})), 4)
+
+    def test_correct_backoff_with_jitter(self):
+
+        for attempt, limit in [(0, 0.5), (1, 1), (2, 2), (5, 4)]:
+            delays = [self.client.backoff_delay(attempt) for _ in range(50)]
+            self.assertTrue(all(0 <= d <= limit for d in delays))
+            self.assertGreater(len(set(delays)), 1)
+
+    def test_incorrect_connection_errors(self):
+
+        with mock.patch.object(self.client.session, 'request', side_effect=requests.ConnectionError('refused')) as request:
+            with self.assertLogs('utils.apis.http_client', level='WARNING'):
+                with self.assertRaises(requests.ConnectionError):
+                    self.client.get('https://api.example.com/trends')
+
+        self.assertEqual(request.call_count, 4)
+
+    def test_correct_default_timeout(self):
+
+        client = HttpClient(connect_timeout=2, read_timeout=7)
+
+        with mock.patch.object(client.session, 'request', return_value=response(200)) as request:
+            client.get('https://api.example.com/trends')
+            client.get('https://api.example.com/trends', timeout=1)
+
+        self.assertEqual(request.call_args_list[0][1]['timeout'], (2, 7))
+        self.assertEqual(request.call_args_list[1][1]['timeout'], 1)
+
+    def test_correct_host_concurrency(self):
+
+        client = HttpClient(host_concurrency=2)
+        active, peak = [0], [0]
+        lock = threading.Lock()
+
+        def slow_request(method, url, **kwargs):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            threading.Event().wait(0.05)
+            with lock:
+                active[0] -= 1
+            return response(200)
+
+        with mock.patch.object(client.session, 'request', side_effect=slow_request):
+            threads = [threading.Thread(target=client.get, args=('https://api.example.com/%d' % i,)) for i in range(10)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+
+        self.assertEqual(peak[0], 2)
+
+    def test_correct_connection_reuse(self):
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), KeepAliveHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        client = HttpClient()
+        for _ in range(10):
+            client.get('http://127.0.0.1:%d/' % server.server_address[1])
+
+        host = client.metrics()['hosts']['127.0.0.1']
+        self.assertEqual(host['requests'], 10)
+        self.assertEqual(host['connections'], 1)
+        self.assertAlmostEqual(host['reuse'], 0.9)
+
+    def test_correct_twitter_retries(self):
+
+        with mock.patch.object(twitter, 'api', None), mock.patch('utils.apis.twitter.config', return_value='x'):
+            api = twitter.api_setup()
+
+        self.assertIs(api.session, twitter.http_client.session)
+        self.assertEqual(api.timeout, (settings.HTTP_CONNECT_TIMEOUT, settings.HTTP_READ_TIMEOUT))
+
+        trends = mock.Mock(status_code=200, headers={}, text='[{"country": "Spain"}]')
+        with mock.patch.object(api.session, 'request', side_effect=[response(503), response(429), trends]) as request:
+            self.assertEqual(api.available_trends(), [{'country': 'Spain'}])
+
+        self.assertEqual(request.call_count, 3)
+
+class AsyncFetchTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.active, self.peak = 0, 0
+        self.lock = threading.Lock()
+
+    def slow_get(self, url, **kwargs):
+
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        threading.Event().wait(0.1)
+        with self.lock:
+            self.active -= 1
+
+        if url.endswith('error'):
+            raise requests.ConnectionError('refused')
+        return mock.Mock(status_code=200, url=url)
+
+    def test_correct_concurrent_fetch_in_order(self):
+
+        urls = ['https://api.example.com/%d' % i for i in range(10)]
+
+        with mock.patch('utils.apis.async_fetch.http_client.get', side_effect=self.slow_get):
+            start = time.perf_counter()
+            responses = run(fetch_all(urls, concurrency=10))
+            elapsed = time.perf_counter() - start
+
+        self.assertEqual([r.url for r in responses], urls)
+        self.assertLess(elapsed, 0.5)
+
+    def test_correct_calls_without_shared_limit(self):
+
+        async def separate_calls():
+            return await asyncio.gather(*[fetch('https://api.example.com/%d' % i) for i in range(5)])
+
+        with mock.patch('utils.apis.async_fetch.http_client.get', side_effect=self.slow_get):
+            responses = run(separate_calls())
+
+        self.assertEqual(len(responses), 5)
+        self.assertEqual(self.peak, 5)
+
+    def test_correct_concurrency_limit(self):
+
+        with mock.patch('utils.apis.async_fetch.http_client.get', side_effect=self.slow_get):
+            run(fetch_all(['https://api.example.com/%d' % i for i in range(9)], concurrency=3))
+
+        self.assertEqual(self.peak, 3)
+
+    def test_incorrect_errors_returned_in_place(self):
+
+        with mock.patch('utils.apis.async_fetch.http_client.get', side_effect=self.slow_get):
+            responses = run(fetch_all(['https://api.example.com/1', 'https://api.example.com/error']))
+
+        self.assertEqual(responses[0].status_code, 200)
+        self.assertIsInstance(responses[1], requests.ConnectionError)
+
+    def test_correct_rate_limiter(self):
+
+        with mock.patch('utils.apis.async_fetch.http_client.get', return_value=mock.Mock(status_code=200)):
+            start = time.perf_counter()
+            run(fetch_all(['https://api.example.com/%d' % i for i in range(3)], rate_limiter=RateLimiter(2, 0.3)))
+            elapsed = time.perf_counter() - start
+
+        self.assertGreaterEqual(elapsed, 0.25)
+
+    def test_correct_run_inside_event_loop(self):
+
+        async def view():
+            return run(fetch_all(['https://api.example.com/1']))
+
+        with mock.patch('utils.apis.async_fetch.http_client.get', return_value=mock.Mock(status_code=200)):
+            responses = asyncio.run(view())
+
+        self.assertEqual(responses[0].status_code, 200)
+
+    def test_correct_youtube_pages_per_chart(self):
+
+        def get(url, **kwargs):
+            page = int(url.split('&pageToken=')[1]) if '&pageToken=' in url else 0
+            region = url.split('regionCode=')[1][:2]
+            data = {'items': [{'id': '%s%d' % (region, page * 5 + i), 'snippet': {}} for i in range(5)]}
+            if page < 3:
+                data['nextPageToken'] = str(page + 1)
+            return mock.Mock(status_code=200, json=mock.Mock(return_value=data))
+
+        urls = ['https://api.example.com/videos?regionCode=%s' % region for region in ['ES', 'PT', 'FR']]
+
+        with mock.patch('utils.apis.async_fetch.http_client.get', side_effect=get) as http_get:
+            results = run(youtube_trending_videos_many(urls, 12, 5))
+
+        self.assertEqual(http_get.call_count, 9)
+        self.assertEqual([[v[0] for v in videos] for videos in results], [['%s%d' % (region, i) for i in range(12)] for region in ['ES', 'PT', 'FR']])
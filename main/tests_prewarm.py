@@ -0,0 +1,243 @@
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from main.models import Country, PrewarmTask, YouTubeTrendType, TwitterCountryTrend, GoogleCountryTrend, YouTubeCountryTrend
+from utils.country_registry import country_registry
+from utils.prewarm import RateLimiter, sync_tasks, get_rate_limiters, run_due_tasks, run_pooled_task
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
+
+# Tests of the pre-warming of the country snapshots
+
+FRESHNESS = {
+    'default': {'ttl': 3600},
+}
+
+RATE_LIMITS = {
+    'twitter': {'calls': 1, 'period': 900},
+    'google_trends': {'calls': 10, 'period': 60},
+    'youtube': {'calls': 10, 'period': 60},
+}
+
+# Runs the tasks in the test thread, which holds the test transaction
+inline_executor = SimpleNamespace(map=map)
+
+class RateLimiterTestCase(TestCase):
+
+    def test_correct_sliding_window(self):
+
+        limiter = RateLimiter(2, 60)
+
+        self.assertEqual(limiter.acquire(1000), 0)
+        self.assertEqual(limiter.acquire(1010), 0)
+        self.assertEqual(limiter.acquire(1020), 40)
+        self.assertEqual(limiter.acquire(1061), 0)
+
+    def test_correct_seed(self):
+
+        limiter = RateLimiter(2, 60)
+        limiter.seed([990, 1000])
+
+        self.assertEqual(limiter.acquire(1020), 30)
+
+@override_settings(TREND_FRESHNESS=FRESHNESS, PREWARM_RATE_LIMITS=RATE_LIMITS, PREWARM_SPREAD=600, PREWARM_LEAD=300, PREWARM_JITTER=0)
+class PrewarmTestCase(TestCase):
+
+    def setUp(self):
+
+        country_registry.invalidate()
+        self.spain = Country.objects.create(name='Spain', native_name='España', acronym='ES', flag='https://flagcdn.com/es.svg', woeid=23424950, pn='spain', lat=40, lng=-4)
+        self.andorra = Country.objects.create(name='Andorra', native_name='Andorra', acronym='AD', flag='https://flagcdn.com/ad.svg', lat=42.5, lng=1.5)
+        self.default = YouTubeTrendType.objects.create(name='Default', category_id=0)
+        self.music = YouTubeTrendType.objects.create(name='Music', category_id=10)
+        self.calls = []
+        self.batches = []
+
+        patches = [
+            mock.patch('utils.apis.twitter.load_country_trends', side_effect=self.load('twitter', TwitterCountryTrend)),
+            mock.patch('utils.apis.google_trends.load_country_trends', side_effect=self.load('google_trends', GoogleCountryTrend)),
+            mock.patch('utils.apis.youtube.load_countries_trends', side_effect=self.load_youtube),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def load(self, source, model):
+
+        def load_country_trends(country_name):
+            self.calls.append((source, country_name))
+            model.objects.create(country=country_registry.by_name(country_name))
+
+        return load_country_trends
+
+    def load_youtube(self, charts):
+
+        self.batches.append(list(charts))
+        for country_name, trend_type in charts:
+            self.calls.append(('youtube', country_name, trend_type))
+            YouTubeCountryTrend.objects.create(country=country_registry.by_name(country_name), trend_type=YouTubeTrendType.objects.get(name=trend_type))
+
+        return [None] * len(charts)
+
+    def run_all(self, now=None):
+        return run_due_tasks(inline_executor, get_rate_limiters(), now=now or timezone.now() + timedelta(seconds=600))
+
+    def test_correct_tasks_per_source(self):
+
+        created, deleted = sync_tasks()
+
+        self.assertEqual((created, deleted), (6, 0))
+        self.assertEqual(PrewarmTask.objects.filter(source='twitter').count(), 1)
+        self.assertEqual(PrewarmTask.objects.filter(source='google_trends').count(), 1)
+        self.assertEqual(PrewarmTask.objects.filter(source='youtube').count(), 4)
+
+    def test_correct_first_round_spread(self):
+
+        now = timezone.now()
+        sync_tasks(now=now)
+
+        next_runs = sorted(PrewarmTask.objects.values_list('next_run', flat=True))
+
+        self.assertEqual(len(set(next_runs)), 6)
+        self.assertEqual(next_runs[0], now)
+        self.assertLess(next_runs[-1], now + timedelta(seconds=600))
+        self.assertEqual(run_due_tasks(inline_executor, get_rate_limiters(), now=now), {'ok': 1})
+
+    def test_correct_sync_keeps_progress(self):
+
+        sync_tasks()
+        self.run_all()
+        created, deleted = sync_tasks()
+
+        self.assertEqual((created, deleted), (0, 0))
+        self.assertFalse(PrewarmTask.objects.filter(last_status=None).exists())
+
+    def test_correct_sync_removes_obsolete_tasks(self):
+
+        sync_tasks()
+        self.spain.pn = None
+        self.spain.save()
+
+        self.assertEqual(sync_tasks(), (0, 1))
+        self.assertFalse(PrewarmTask.objects.filter(source='google_trends').exists())
+
+    def test_correct_restart_resumes(self):
+
+        sync_tasks()
+        self.assertEqual(self.run_all(), {'ok': 6})
+        self.assertEqual(len(self.calls), 6)
+
+        # A new worker finds every task done and scheduled before its snapshot goes stale
+        self.assertEqual(self.run_all(now=timezone.now()), {})
+        self.assertEqual(len(self.calls), 6)
+
+        task = PrewarmTask.objects.get(source='twitter')
+        snapshot = TwitterCountryTrend.objects.get()
+        self.assertEqual(task.next_run, snapshot.insertion_datetime + timedelta(seconds=3300))
+
+    def test_correct_fresh_snapshot_not_refreshed(self):
+
+        sync_tasks()
+        TwitterCountryTrend.objects.create(country=self.spain)
+
+        statuses = self.run_all()
+
+        self.assertEqual(statuses, {'ok': 5, 'fresh': 1})
+        self.assertNotIn(('twitter', 'Spain'), self.calls)
+
+    def test_correct_rate_limit(self):
+
+        portugal = Country.objects.create(name='Portugal', native_name='Portugal', acronym='PT', flag='https://flagcdn.com/pt.svg', woeid=23424925, lat=39.5, lng=-8)
+        country_registry.invalidate()
+        sync_tasks()
+
+        statuses = self.run_all()
+
+        self.assertEqual(statuses['throttled'], 1)
+        self.assertEqual(len([call for call in self.calls if call[0] == 'twitter']), 1)
+
+        throttled = PrewarmTask.objects.get(last_status='throttled')
+        self.assertIn(throttled.country, [self.spain, portugal])
+        self.assertGreater(throttled.next_run, timezone.now() + timedelta(seconds=800))
+
+    def test_correct_rate_limit_survives_restart(self):
+
+        PrewarmTask.objects.create(source='twitter', country=self.spain, next_run=timezone.now() + timedelta(hours=1), last_run=timezone.now(), last_status='ok')
+
+        self.assertGreater(get_rate_limiters()['twitter'].acquire(), 0)
+        self.assertEqual(get_rate_limiters()['youtube'].acquire(), 0)
+
+    def test_incorrect_failed_refresh_backs_off(self):
+
+        sync_tasks()
+
+        with mock.patch('utils.apis.twitter.load_country_trends', side_effect=Exception('Rate limit exceeded')):
+            with self.assertLogs('utils.prewarm', level='ERROR'):
+                statuses = self.run_all()
+
+        task = PrewarmTask.objects.get(source='twitter')
+
+        self.assertEqual(statuses, {'ok': 5, 'error': 1})
+        self.assertEqual(task.failures, 1)
+        self.assertEqual(task.last_error, 'Rate limit exceeded')
+        self.assertGreater(task.next_run, timezone.now() + timedelta(seconds=100))
+
+    def test_incorrect_empty_refresh_backs_off(self):
+
+        sync_tasks()
+
+        # Andorra has no YouTube charts: the loader stores nothing
+        with mock.patch('utils.apis.youtube.load_countries_trends', side_effect=lambda charts: [None] * len(charts)):
+            statuses = self.run_all()
+            task = PrewarmTask.objects.filter(source='youtube').first()
+            self.assertEqual(statuses, {'ok': 2, 'empty': 4})
+            self.assertEqual(task.failures, 1)
+            self.assertGreater(task.next_run, timezone.now() + timedelta(seconds=100))
+
+            self.run_all(now=task.next_run)
+            task.refresh_from_db()
+            self.assertEqual(task.failures, 2)
+            self.assertGreater(task.next_run, timezone.now() + timedelta(seconds=220))
+
+    def test_correct_pooled_task_closes_connection(self):
+
+        sync_tasks()
+        task = PrewarmTask.objects.get(source='twitter')
+
+        with mock.patch('utils.prewarm.run_task', return_value='ok') as run_task, mock.patch('utils.prewarm.connection') as connection:
+            self.assertEqual(run_pooled_task(task, {}), 'ok')
+
+        run_task.assert_called_once_with(task, {})
+        connection.close.assert_called_once_with()
+
+    def test_correct_youtube_charts_in_one_batch(self):
+
+        sync_tasks()
+        self.run_all()
+
+        self.assertEqual(len(self.batches), 1)
+        self.assertEqual(sorted(self.batches[0]), sorted([(country, trend_type) for country in ['Spain', 'Andorra'] for trend_type in ['Default', 'Music']]))
+
+    @override_settings(PREWARM_RATE_LIMITS=dict(RATE_LIMITS, youtube={'calls': 3, 'period': 3600}))
+    def test_correct_youtube_batch_rate_limit(self):
+
+        sync_tasks()
+        statuses = self.run_all()
+
+        self.assertEqual(len(self.batches[0]), 3)
+        self.assertEqual(statuses, {'ok': 5, 'throttled': 1})
+
+    def test_incorrect_youtube_chart_error(self):
+
+        sync_tasks()
+
+        def load_youtube(charts):
+            errors = self.load_youtube(charts[1:])
+            return [ValueError('Quota exceeded')] + errors
+
+        with mock.patch('utils.apis.youtube.load_countries_trends', side_effect=load_youtube):
+            with self.assertLogs('utils.prewarm', level='ERROR'):
+                statuses = self.run_all()
+
+        self.assertEqual(statuses, {'ok': 5, 'error': 1})
+        self.assertEqual(PrewarmTask.objects.get(last_status='error').last_error, 'Quota exceeded')
@@ -0,0 +1,157 @@
+from django.test import SimpleTestCase
+from utils.apis.pytrends_pool import PyTrendsPool
+from pytrends.exceptions import TooManyRequestsError
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+import threading
+
+# Tests of the pool of pytrends clients
+
+class StubTrendReq:
+
+    # Same shared state as TrendReq: the payload of build_payload is read by the next request
+    active = 0
+    max_active = 0
+    lock = threading.Lock()
+
+    def __init__(self, throttled=0):
+        self.kw_list = None
+        self.throttled = throttled
+
+    def build_payload(self, kw_list, **kwargs):
+        self.kw_list = kw_list
+
+    def interest_over_time(self):
+
+        cls = type(self)
+        with cls.lock:
+            cls.active += 1
+            cls.max_active = max(cls.max_active, cls.active)
+
+        # Lets the other threads run between the payload and the request
+        threading.Event().wait(0.002)
+
+        with cls.lock:
+            cls.active -= 1
+
+        if self.throttled > 0:
+            self.throttled -= 1
+            raise TooManyRequestsError('The request failed: Google returned a response with code 429', mock.Mock(headers={}))
+
+        return list(self.kw_list)
+
+def interest(word):
+
+    def fetch(client):
+        client.build_payload(kw_list=[word])
+        return client.interest_over_time()
+
+    return fetch
+
+class PyTrendsPoolTestCase(SimpleTestCase):
+
+    def setUp(self):
+        StubTrendReq.active = 0
+        StubTrendReq.max_active = 0
+
+    def test_correct_no_payload_swap(self):
+
+        pool = PyTrendsPool(size=3, factory=StubTrendReq)
+        words = ['word %d' % i for i in range(60)]
+
+        with ThreadPoolExecutor(max_workers=12) as executor:
+            results = list(executor.map(lambda word: pool.call(interest(word)), words))
+
+        self.assertEqual(results, [[word] for word in words])
+        self.assertLessEqual(StubTrendReq.max_active, 3)
+        self.assertLessEqual(pool._created, 3)
+
+    def test_correct_retry_on_429(self):
+
+        client = StubTrendReq(throttled=2)
+        pool = PyTrendsPool(size=1, retries=3, backoff=0, factory=lambda: client)
+
+        with self.assertLogs('utils.apis.pytrends_pool', 'WARNING') as logs:
+            self.assertEqual(pool.call(interest('Messi')), ['Messi'])
+
+        self.assertEqual(client.throttled, 0)
+        self.assertEqual(len(logs.output), 2)
+
+    def test_incorrect_retries_exhausted(self):
+
+        pool = PyTrendsPool(size=1, retries=2, backoff=0, factory=lambda: StubTrendReq(throttled=5))
+
+        with self.assertRaises(TooManyRequestsError), self.assertLogs('utils.apis.pytrends_pool', 'WARNING'):
+            pool.call(interest('Messi'))
+
+    def test_correct_client_reused(self):
+
+        factory = mock.Mock(side_effect=StubTrendReq)
+        pool = PyTrendsPool(size=2, factory=factory)
+
+        for word in ['a', 'b', 'c']:
+            pool.call(interest(word))
+
+        self.assertEqual(factory.call_count, 1)
+
+    def test_correct_failed_client_creation(self):
+
+        pool = PyTrendsPool(size=1, factory=mock.Mock(side_effect=[ConnectionError('No cookie'), StubTrendReq()]))
+
+        with self.assertRaises(ConnectionError):
+            pool.call(interest('Messi'))
+
+        # The slot is given back
+        self.assertEqual(pool.call(interest('Messi')), ['Messi'])
+
+    def test_correct_failed_client_creation_wakes_waiter(self):
+
+        # Both slots are creating a client that fails while a third caller waits; the waiter creates its own
+        creating = threading.Semaphore(0)
+        release = threading.Event()
+        calls = []
+
+        def factory():
+            calls.append(1)
+            if len(calls) <= 2:
+                creating.release()
+                release.wait()
+                raise ConnectionError('No cookie')
+            return StubTrendReq()
+
+        pool = PyTrendsPool(size=2, factory=factory)
+        results = []
+
+        def call(word):
+            try:
+                results.append(pool.call(interest(word)))
+            except ConnectionError as e:
+                results.append(str(e))
+
+        threads = [threading.Thread(target=call, args=('word %d' % i,), daemon=True) for i in range(3)]
+        for thread in threads[:2]:
+            thread.start()
+        creating.acquire()
+        creating.acquire()
+
+        threads[2].start()
+        threading.Event().wait(0.05)
+        release.set()
+
+        for thread in threads:
+            thread.join(timeout=2)
+
+        self.assertFalse(any(thread.is_alive() for thread in threads))
+        self.assertEqual(sorted(results, key=str), ['No cookie', 'No cookie', ['word 2']])
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(pool._created, 1)
+
+    def test_correct_backoff_delay(self):
+
+        pool = PyTrendsPool(backoff=2, max_backoff=60)
+
+        self.assertEqual(pool.backoff_delay(0, TooManyRequestsError('429', mock.Mock(headers={'Retry-After': '7'}))), 7)
+        self.assertEqual(pool.backoff_delay(0, TooManyRequestsError('429', mock.Mock(headers={'Retry-After': '600'}))), 60)
+
+        for attempt in range(8):
+            self.assertLessEqual(pool.backoff_delay(attempt, TooManyRequestsError('429', mock.Mock(headers={}))), min(60, 2 * 2 ** attempt))
@@ -0,0 +1,158 @@
+from contextlib import contextmanager
+from django.db import connection
+from django.test import TestCase
+from utils.single_flight import SingleFlight, single_flight
+from utils.apis import youtube
+from utils.country_registry import country_registry
+from main.models import Country, YouTubeCountryTrend, YouTubeTrendType
+from unittest import mock
+import threading
+import time
+
+# Tests of the single-flight execution of the loaders
+
+def run_concurrently(target, n):
+
+    barrier = threading.Barrier(n)
+    results, errors = [None] * n, [None] * n
+
+    def worker(i):
+        barrier.wait()
+        try:
+            results[i] = target()
+        except Exception as e:
+            errors[i] = e
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    return results, errors
+
+class SingleFlightTestCase(TestCase):
+
+    def setUp(self):
+        self.flights = SingleFlight()
+        self.calls = []
+
+    def slow(self, value):
+        self.calls.append(value)
+        time.sleep(0.2)
+        return value * 2
+
+    def test_correct_one_call_for_concurrent_callers(self):
+
+        results, errors = run_concurrently(lambda: self.flights.do(('slow', 21), self.slow, 21), 50)
+
+        self.assertEqual(self.calls, [21])
+        self.assertEqual(results, [42] * 50)
+        self.assertEqual(errors, [None] * 50)
+        self.assertEqual(self.flights.in_flight(), 0)
+
+    def test_correct_different_keys_run_separately(self):
+
+        results, _ = run_concurrently(lambda: self.flights.do(('slow', threading.get_ident() % 2), self.slow, 1), 10)
+
+        self.assertLessEqual(len(self.calls), 2)
+        self.assertEqual(results, [2] * 10)
+
+    def test_correct_sequential_calls_run_again(self):
+
+        self.flights.do('key', self.slow, 1)
+        self.flights.do('key', self.slow, 1)
+
+        self.assertEqual(self.calls, [1, 1])
+
+    def test_incorrect_error_is_shared_by_waiters(self):
+
+        def failing():
+            self.calls.append('failing')
+            time.sleep(0.2)
+            raise ValueError('upstream error')
+
+        results, errors = run_concurrently(lambda: self.flights.do('key', failing), 20)
+
+        self.assertEqual(self.calls, ['failing'])
+        self.assertTrue(all(isinstance(e, ValueError) for e in errors))
+        self.assertEqual(self.flights.in_flight(), 0)
+
+    def test_correct_decorator(self):
+
+        @single_flight
+        def load(country_name, trend_type):
+            self.calls.append((country_name, trend_type))
+            time.sleep(0.2)
+
+        run_concurrently(lambda: load('Spain', 'Music'), 20)
+
+        self.assertEqual(self.calls, [('Spain', 'Music')])
+        self.assertEqual(load.__name__, 'load')
+
+    def contended_lock(self, other_worker=None):
+
+        # The lock was held by another worker process, which ran other_worker and released it
+        @contextmanager
+        def advisory_lock(key):
+            if other_worker is not None:
+                other_worker()
+            yield True
+
+        return mock.patch('utils.single_flight.advisory_lock', advisory_lock)
+
+    def test_correct_contended_call_skipped_when_stored(self):
+
+        checks = []
+
+        def loaded(since):
+            checks.append(since)
+            return True
+
+        with self.contended_lock():
+            self.assertIsNone(self.flights.do('key', self.slow, 1, loaded=loaded))
+
+        self.assertEqual(self.calls, [])
+        self.assertEqual(len(checks), 1)
+
+    def test_incorrect_contended_call_run_when_not_stored(self):
+
+        # The call of the other worker failed: the data is loaded here
+        with self.contended_lock():
+            self.assertEqual(self.flights.do('key', self.slow, 1, loaded=lambda since: False), 2)
+            self.assertEqual(self.flights.do('key', self.slow, 2), 4)
+
+        self.assertEqual(self.calls, [1, 2])
+
+    def test_correct_contended_youtube_refresh(self):
+
+        spain = Country.objects.create(name='Spain', native_name='España', acronym='ES', flag='https://flagcdn.com/es.svg', lat=40, lng=-4)
+        music = YouTubeTrendType.objects.create(name='Music', category_id=10)
+        country_registry.invalidate()
+
+        with mock.patch('utils.apis.youtube.get_country_trends', return_value=[]) as get_country_trends:
+
+            # The other worker stored nothing
+            with self.contended_lock():
+                youtube.load_country_trends('Spain', 'Music')
+            self.assertEqual(get_country_trends.call_count, 1)
+
+            with self.contended_lock(lambda: YouTubeCountryTrend.objects.create(country=spain, trend_type=music)):
+                youtube.load_country_trends('Spain', 'Music')
+            self.assertEqual(get_country_trends.call_count, 1)
+
+    def test_correct_one_upstream_call_per_youtube_refresh(self):
+
+        upstream_calls = []
+
+        def get_country_trends(country_name, trend_type):
+            upstream_calls.append((country_name, trend_type))
+            time.sleep(0.2)
+            return []
+
+        with mock.patch('utils.apis.youtube.get_country_trends', side_effect=get_country_trends), mock.patch('utils.apis.youtube.load_trending_types'):
+            run_concurrently(lambda: youtube.load_country_trends('Spain', 'Music'), 50)
+
+        self.assertEqual(upstream_calls, [('Spain', 'Music')])
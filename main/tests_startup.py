@@ -0,0 +1,27 @@
+from django.test import TestCase
+from benchmarks.startup import boot, parse_importtime
+import os
+
+# Tests of the worker boot time
+
+BOOT_TIME_BUDGET = float(os.environ.get('BOOT_TIME_BUDGET', 3.0))
+
+class StartupTestCase(TestCase):
+
+    def test_correct_boot_does_not_import_heavy_modules(self):
+
+        result, _ = boot()
+        self.assertEqual(result['heavy_modules'], [])
+
+    def test_correct_boot_time_budget(self):
+
+        seconds = min(boot()[0]['seconds'] for _ in range(3))
+        self.assertLess(seconds, BOOT_TIME_BUDGET)
+
+    def test_correct_importtime_report(self):
+
+        _, stderr = boot(importtime=True)
+        modules = [name.strip() for _, _, name in parse_importtime(stderr)]
+
+        self.assertIn('django', modules)
+        self.assertNotIn('tensorflow', modules)
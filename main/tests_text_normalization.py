@@ -0,0 +1,88 @@
+from django.test import SimpleTestCase
+from utils.text_normalization import clean_text, clean_texts, emoji_list, html_to_text, trie_pattern
+from utils.apis import youtube
+from unittest import mock
+import emoji
+import random
+import re
+
+# Tests of the cleaning of tweets and comments
+
+def legacy_clean(text):
+    no_emoji_text = emoji.get_emoji_regexp().sub(u'', text)
+    no_url_text = re.sub(r"http\S+", "", no_emoji_text)
+    no_mention_text = re.sub(r"@\S+", "", no_url_text)
+    no_hashtag_text = re.sub(r"#\S+", "", no_mention_text)
+    return no_hashtag_text.replace('\n', ' ').replace('\r', '').strip()
+
+class TextNormalizationTestCase(SimpleTestCase):
+
+    def test_correct_noise_removed(self):
+
+        self.assertEqual(clean_text('Great goal 😀 by @messi https://t.co/abc #WorldCup'), 'Great goal  by')
+        self.assertEqual(clean_text('  line one\r\nline two  '), 'line one line two')
+
+    def test_correct_emoji_sequences(self):
+
+        for text in ['👨‍👩‍👧‍👦', '👍🏽', '🇪🇸', '1️⃣', '❤️']:
+            self.assertEqual(clean_text('a ' + text + ' b'), 'a  b')
+
+        self.assertEqual(clean_text('2023 goals'), '2023 goals')
+
+    def test_correct_same_output_as_legacy_cleaning(self):
+
+        texts = [
+            'Qué partido!! 😍😍 @amigo mira esto http://t.co/x #futbol\nincreíble',
+            'emoji😀inside words and #tag😀more and 👍🏽thumbs',
+            '@start and end@ # alone http',
+            'RT 🔥🔥🔥\r\n',
+            '',
+        ]
+
+        for text in texts:
+            self.assertEqual(clean_text(text), legacy_clean(text))
+
+    def test_correct_same_output_as_legacy_cleaning_randomized(self):
+
+        # Emoji glued to '#', '@', 'http', zero-width joiners and modifiers, where the order of the removals matters
+        rng = random.Random(0)
+        emojis = emoji_list()
+        fragments = ['#', '@', 'http', '://x', ' ', 'a', 'b', '\n', '\r', '\u200d', '\ufe0f', '🏽', '#️⃣', '1', '👨‍👩‍👧']
+
+        for _ in range(5000):
+            text = ''.join(rng.choice(emojis) if rng.random() < 0.3 else rng.choice(fragments) for _ in range(rng.randint(0, 12)))
+            self.assertEqual(clean_text(text), legacy_clean(text), repr(text))
+
+    def test_correct_emoji_removed_first(self):
+
+        self.assertEqual(clean_text('#😀'), '#')
+        self.assertEqual(clean_text('x@😀http://y'), 'x@')
+        self.assertEqual(clean_text('#tag😀more'), '')
+
+    def test_correct_trie_pattern(self):
+
+        pattern = re.compile(trie_pattern(['ab', 'abc', 'ad', 'x']))
+
+        self.assertEqual(pattern.sub('', 'abcd ab ad ax x'), 'd   a ')
+
+    def test_correct_html(self):
+
+        self.assertEqual(html_to_text('I&#39;m <b>so</b> happy<br>&amp; you'), "I'm  so  happy & you")
+
+    def test_correct_empty_texts_dropped(self):
+
+        self.assertEqual(clean_texts(['😀', 'hello @you', '#tag', 'bye']), ['hello', 'bye'])
+
+    def test_correct_youtube_comments_cleaned(self):
+
+        comments = [
+            {'snippet': {'topLevelComment': {'snippet': {'textDisplay': 'Best song ever &lt;3<br>😍', 'likeCount': 10}}}},
+            {'snippet': {'topLevelComment': {'snippet': {'textDisplay': '<a href="https://youtu.be/x">https://youtu.be/x</a>', 'likeCount': 5}}}},
+            {'snippet': {'topLevelComment': {'snippet': {'textDisplay': 'I don&#39;t like it', 'likeCount': 1}}}},
+        ]
+        response = mock.Mock(status_code=200, json=mock.Mock(return_value={'items': comments}))
+
+        with mock.patch.dict('os.environ', {'YOUTUBE_API_KEY': 'key'}), mock.patch('utils.apis.youtube.http_client.get', return_value=response):
+            result = youtube.get_relevant_comments('video', 10)
+
+        self.assertEqual(result, ['Best song ever <3', "I don't like it"])
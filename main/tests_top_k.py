@@ -0,0 +1,73 @@
+from django.test import SimpleTestCase, override_settings
+from utils.top_k import TopKSelector
+from utils.apis import twitter
+from unittest import mock
+import random
+
+# Tests of the streaming top-K selection
+
+class TopKSelectorTestCase(SimpleTestCase):
+
+    def test_correct_top_k(self):
+
+        scores = [random.randint(0, 50) for i in range(1000)]
+
+        selector = TopKSelector(10)
+        selector.extend((score, i) for i, score in enumerate(scores))
+
+        # Same result as a full stable sort, ties in arrival order
+        expected = sorted(range(len(scores)), key=lambda i: -scores[i])[:10]
+        self.assertEqual(selector.items(), expected)
+        self.assertEqual(len(selector), 10)
+        self.assertTrue(selector.full())
+
+    def test_correct_fewer_items_than_k(self):
+
+        selector = TopKSelector(5)
+        selector.extend([(1, 'a'), (3, 'b'), (1, 'c')])
+
+        self.assertEqual(selector.items(), ['b', 'a', 'c'])
+        self.assertFalse(selector.full())
+
+    def test_correct_ties_keep_first(self):
+
+        selector = TopKSelector(2)
+        for item in ['a', 'b', 'c', 'd']:
+            selector.push(7, item)
+
+        self.assertEqual(selector.items(), ['a', 'b'])
+
+    def test_correct_unorderable_items(self):
+
+        # Items are never compared, only the scores and the arrival order
+        selector = TopKSelector(2)
+        selector.extend([(1, {'id': 1}), (1, {'id': 2}), (2, {'id': 3})])
+
+        self.assertEqual(selector.items(), [{'id': 3}, {'id': 1}])
+
+    def test_correct_zero_k(self):
+
+        selector = TopKSelector(0)
+        selector.extend([(1, 'a'), (2, 'b')])
+
+        self.assertEqual(selector.items(), [])
+        self.assertTrue(selector.full())
+
+    @override_settings(TWITTER_RELEVANT_TWEETS=2)
+    def test_correct_most_engaging_tweets(self):
+
+        tweets = [
+            mock.Mock(text='low', lang='en', retweeted=False, favorite_count=1, retweet_count=0),
+            mock.Mock(text='high', lang='en', retweeted=False, favorite_count=10, retweet_count=5),
+            mock.Mock(text='RT @user: high', lang='en', retweeted=False, favorite_count=100, retweet_count=100),
+            mock.Mock(text='medium', lang='en', retweeted=False, favorite_count=2, retweet_count=3),
+        ]
+        api = mock.Mock()
+        api.search_tweets.return_value = tweets
+
+        with mock.patch('utils.apis.twitter.api_setup', return_value=api), \
+             mock.patch('utils.apis.twitter.translate_texts', side_effect=lambda texts, langs: texts) as translate:
+            result = twitter.get_relevant_tweets('football')
+
+        self.assertEqual(result, ['high', 'medium'])
+        translate.assert_called_once_with(['high', 'medium'], ['en', 'en'])
@@ -0,0 +1,104 @@
+from django.test import SimpleTestCase, override_settings
+from utils.apis import translation, twitter
+from utils.apis.translation import translate_texts, make_batches
+from unittest import mock
+
+# Tests of the batched translation of the tweets
+
+class StubTranslator:
+
+    def __init__(self, keep_lines=True, fail=False):
+        self.calls = []
+        self.keep_lines = keep_lines
+        self.fail = fail
+
+    def translate(self, text, dest='en'):
+        self.calls.append(text)
+        if self.fail:
+            raise ValueError('Translation service unavailable')
+        translated = text.upper() if self.keep_lines else text.upper().replace('\n', ' ')
+        return mock.Mock(text=translated)
+
+def tweet(text, lang, retweeted=False, favorite_count=0, retweet_count=0):
+    return mock.Mock(text=text, lang=lang, retweeted=retweeted, favorite_count=favorite_count, retweet_count=retweet_count)
+
+class TranslationTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.stub = StubTranslator()
+        patch = mock.patch.object(translation, 'translator', self.stub)
+        patch.start()
+        self.addCleanup(patch.stop)
+        translation.translation_cache.clear()
+
+    def test_correct_one_request_for_many_texts(self):
+
+        result = translate_texts(['hola amigos', 'que tal', 'bonjour'])
+
+        self.assertEqual(result, ['HOLA AMIGOS', 'QUE TAL', 'BONJOUR'])
+        self.assertEqual(self.stub.calls, ['hola amigos\nque tal\nbonjour'])
+
+    def test_correct_english_texts_skipped(self):
+
+        result = translate_texts(['hola amigos', 'hello friends', ''], ['es', 'en', None])
+
+        self.assertEqual(result, ['HOLA AMIGOS', 'hello friends', ''])
+        self.assertEqual(self.stub.calls, ['hola amigos'])
+
+    def test_correct_cached_by_text(self):
+
+        translate_texts(['hola amigos', 'que tal'])
+        result = translate_texts(['que tal', 'hola amigos', 'que tal'])
+
+        self.assertEqual(result, ['QUE TAL', 'HOLA AMIGOS', 'QUE TAL'])
+        self.assertEqual(len(self.stub.calls), 1)
+        self.assertEqual(translation.translation_cache.stats()['hits'], 3)
+
+    def test_correct_duplicates_translated_once(self):
+
+        self.assertEqual(translate_texts(['hola', 'hola', 'adios']), ['HOLA', 'HOLA', 'ADIOS'])
+        self.assertEqual(self.stub.calls, ['hola\nadios'])
+
+    def test_correct_line_breaks_inside_texts(self):
+
+        self.assertEqual(translate_texts(['hola\namigos', 'que tal']), ['HOLA AMIGOS', 'QUE TAL'])
+
+    def test_correct_fallback_when_lines_are_lost(self):
+
+        self.stub.keep_lines = False
+
+        self.assertEqual(translate_texts(['hola', 'adios']), ['HOLA', 'ADIOS'])
+        self.assertEqual(self.stub.calls, ['hola\nadios', 'hola', 'adios'])
+
+    def test_incorrect_failed_translation_not_cached(self):
+
+        self.stub.fail = True
+
+        with self.assertLogs('utils.apis.translation', level='WARNING'):
+            self.assertEqual(translate_texts(['hola', 'adios']), ['hola', 'adios'])
+
+        self.assertEqual(len(translation.translation_cache), 0)
+
+    @override_settings(TRANSLATION_BATCH_CHARS=12)
+    def test_correct_batches_by_size(self):
+
+        self.assertEqual(make_batches(['aaaa', 'bbbb', 'cccc', 'dddddddddddddddd'], 12), [['aaaa', 'bbbb'], ['cccc'], ['dddddddddddddddd']])
+
+        self.assertEqual(translate_texts(['aaaa', 'bbbb', 'cccc']), ['AAAA', 'BBBB', 'CCCC'])
+        self.assertEqual(sorted(self.stub.calls), ['aaaa\nbbbb', 'cccc'])
+
+    def test_correct_relevant_tweets(self):
+
+        api = mock.Mock()
+        api.search_tweets.return_value = [
+            tweet('Qué partido @amigo', 'es'),
+            tweet('What a match #football', 'en'),
+            tweet('RT @user: retweet', 'en'),
+            tweet('Old', 'en', retweeted=True),
+        ]
+
+        with mock.patch('utils.apis.twitter.api_setup', return_value=api):
+            result = twitter.get_relevant_tweets('football')
+
+        self.assertEqual(result, ['QUÉ PARTIDO', 'What a match'])
+        self.assertEqual(self.stub.calls, ['Qué partido @amigo'])
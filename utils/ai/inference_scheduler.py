@@ -0,0 +1,104 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+### Micro-batching of the emotion inference across concurrent requests ###
+
+class InferenceScheduler:
+
+    def __init__(self, predict_fn, max_batch_size=64, max_wait=0.01):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._metrics = {
+            'requests': 0,
+            'batches': 0,
+            'batched_texts': 0,
+            'max_queue_depth': 0,
+        }
+
+    def submit(self, texts):
+
+        # Blocks until the batch containing these texts has been run and returns their own results
+        if len(texts) == 0:
+            return np.empty((0, 3), dtype='float32'), np.empty((0, 6), dtype='float32')
+
+        future = Future()
+        self._ensure_worker()
+        self._queue.put((list(texts), future))
+
+        with self._lock:
+            self._metrics['requests'] += 1
+            self._metrics['max_queue_depth'] = max(self._metrics['max_queue_depth'], self._queue.qsize())
+
+        return future.result()
+
+    def metrics(self):
+
+        with self._lock:
+            metrics = dict(self._metrics)
+
+        batches = metrics['batches']
+        metrics['queue_depth'] = self._queue.qsize()
+        metrics['mean_batch_size'] = metrics['batched_texts'] / batches if batches else 0.0
+        metrics['mean_batch_fill'] = metrics['mean_batch_size'] / self.max_batch_size
+        return metrics
+
+    def _ensure_worker(self):
+
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='inference-scheduler', daemon=True)
+                self._thread.start()
+
+    def _collect(self):
+
+        # Wait for a first request, then keep adding requests until the batch is full or the window closes
+        pending = [self._queue.get()]
+        size = len(pending[0][0])
+        deadline = time.monotonic() + self.max_wait
+
+        while size < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            pending.append(item)
+            size += len(item[0])
+
+        return pending, size
+
+    def _run(self):
+
+        while True:
+            pending, size = self._collect()
+            texts = [text for item_texts, _ in pending for text in item_texts]
+
+            with self._lock:
+                self._metrics['batches'] += 1
+                self._metrics['batched_texts'] += size
+
+            try:
+                results_1, results_2 = self.predict_fn(texts)
+            except Exception as e:
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+
+            start = 0
+            for item_texts, future in pending:
+                end = start + len(item_texts)
+                future.set_result((results_1[start:end], results_2[start:end]))
+                start = end
@@ -0,0 +1,95 @@
+import os
+import resource
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from utils.ai.quantization import quantized_path
+
+### Process-wide registry of the Keras emotion models ###
+
+def _rss_bytes():
+
+    # Resident set size of the current process (Linux), falling back to the peak RSS
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def _keras_loader(path):
+
+    os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '3')
+    from tensorflow import keras
+
+    return keras.models.load_model(path)
+
+def _numpy_loader(path):
+
+    from utils.ai.numpy_runtime import load_numpy_model
+
+    return load_numpy_model(path)
+
+RUNTIMES = {
+    'keras': (settings.EMOTION_MODELS, _keras_loader),
+    'numpy': ({name: quantized_path(path, settings.EMOTION_MODEL_PRECISION) for name, path in settings.EMOTION_NUMPY_MODELS.items()}, _numpy_loader),
+}
+
+def get_runtime(runtime, precision):
+
+    # The float16/int8 variants only exist for the NumPy runtime
+    if runtime == 'keras' and precision != 'float32':
+        raise ImproperlyConfigured('EMOTION_MODEL_PRECISION=%s needs EMOTION_MODEL_RUNTIME=numpy' % precision)
+
+    return RUNTIMES[runtime]
+
+class ModelRegistry:
+
+    def __init__(self, paths, loader=None):
+        self.paths = dict(paths)
+        self.loader = loader or _keras_loader
+        self._models = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+
+        # Fast path without locking once the model is loaded
+        model = self._models.get(name)
+        if model is not None:
+            return model
+
+        with self._lock:
+            model = self._models.get(name)
+            if model is None:
+                rss_before = _rss_bytes()
+                start = time.perf_counter()
+                model = self.loader(self.paths[name])
+                self._stats[name] = {
+                    'load_seconds': time.perf_counter() - start,
+                    'rss_delta_bytes': max(_rss_bytes() - rss_before, 0),
+                }
+                self._models[name] = model
+        return model
+
+    def warm_up(self):
+        return [self.get(name) for name in self.paths]
+
+    def is_loaded(self, name):
+        return name in self._models
+
+    def stats(self):
+        with self._lock:
+            return {name: dict(values) for name, values in self._stats.items()}
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+            self._stats.clear()
+
+model_registry = ModelRegistry(*get_runtime(settings.EMOTION_MODEL_RUNTIME, settings.EMOTION_MODEL_PRECISION))
+
+def get_models():
+    return model_registry.get('sentiment'), model_registry.get('emotion')
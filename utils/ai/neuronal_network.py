@@ -1,80 +1,117 @@
 import os
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
 
-from tensorflow import keras
-from tensorflow.keras.preprocessing.text import Tokenizer
-from tensorflow.keras.preprocessing.sequence import pad_sequences
+import hashlib
+import logging
 import numpy as np
-from datasets import load_dataset
-import pickle
+from django.conf import settings
 from utils.apis.twitter import get_relevant_tweets
 from utils.apis.youtube import get_relevant_comments
+from django.db import transaction
 from main.models import TrendEmotion
+from utils.ai.model_registry import get_models, model_registry
+from utils.ai.inference_scheduler import InferenceScheduler
+from utils.ai.text_encoder import EncoderStore
+from utils.lru_cache import LRUCache
+from utils.single_flight import single_flight
 
-tokenizer_1 = None
-tokenizer_2 = None
+logger = logging.getLogger(__name__)
 
-def init_tokenizer_1():
-    global tokenizer_1
-    if tokenizer_1:
-        return tokenizer_1
+encoder_store = EncoderStore(settings.EMOTION_VOCABULARIES, {'sentiment': 35, 'emotion': 50})
 
-    dataset = load_dataset("mteb/tweet_sentiment_extraction")
-    train = dataset['train']
-    texts = [x['text'] for x in train]
+def get_encoders():
+    return encoder_store.get('sentiment'), encoder_store.get('emotion')
 
-    tokenizer_1 = Tokenizer(num_words=1000, oov_token='<UNK>')
-    tokenizer_1.fit_on_texts(texts)
+def predict_sequences(sequences_1, sequences_2, batch_size=None):
 
-    with open('tokenizer_1.pkl', 'wb') as f:
-        pickle.dump(tokenizer_1, f)
+    batch_size = batch_size or settings.EMOTION_MAX_BATCH_SIZE
+    model_1, model_2 = get_models()
 
-    return tokenizer_1
+    results_1, results_2 = [], []
 
-def init_tokenizer_2():
-    global tokenizer_2
-    if tokenizer_2:
-        return tokenizer_2
+    for start in range(0, len(sequences_1), batch_size):
+        batch_1 = sequences_1[start:start + batch_size]
+        batch_2 = sequences_2[start:start + batch_size]
+        results_1.append(model_1.predict(batch_1, batch_size=len(batch_1), verbose = 0))
+        results_2.append(model_2.predict(batch_2, batch_size=len(batch_2), verbose = 0))
 
-    dataset = load_dataset("SetFit/emotion")
-    train = dataset['train']
-    texts = [x['text'] for x in train]
+    return np.concatenate(results_1), np.concatenate(results_2)
 
-    tokenizer_2 = Tokenizer(num_words=1000, oov_token='<UNK>')
-    tokenizer_2.fit_on_texts(texts)
+def aggregate_emotions(results_1, results_2):
 
-    with open('tokenizer_2.pkl', 'wb') as f:
-        pickle.dump(tokenizer_2, f)
+    # Sum the probabilities of every text and normalise each group so that it adds up to 1
+    totals_1 = results_1.sum(axis=0, dtype=np.float64)
+    totals_2 = results_2.sum(axis=0, dtype=np.float64)
 
-    return tokenizer_2
+    totals = np.concatenate((totals_1 / totals_1.sum(), totals_2 / totals_2.sum()))
 
-def get_sequences_1(tokenizer, texts):
-    sequences = tokenizer.texts_to_sequences(texts)
-    padded = pad_sequences(sequences, truncating='post', padding='post', maxlen=35)
-    return padded
+    # negative, neutral, positive, sadness, fear, love, surprise, anger, joy
+    return tuple(float(x) for x in totals)
 
-def get_sequences_2(tokenizer, texts):
-    sequences = tokenizer.texts_to_sequences(texts)
-    padded = pad_sequences(sequences, truncating='post', padding='post', maxlen=50)
-    return padded
+def predict_texts(texts, batch_size=None):
 
-def model_predict(word, video_id):
+    encoder_1, encoder_2 = get_encoders()
+
+    return predict_sequences(encoder_1.encode(texts), encoder_2.encode(texts), batch_size)
+
+inference_scheduler = InferenceScheduler(predict_texts, settings.EMOTION_SCHEDULER_MAX_BATCH_SIZE, settings.EMOTION_SCHEDULER_MAX_WAIT_MS / 1000)
+
+prediction_cache = LRUCache(settings.EMOTION_PREDICTION_CACHE_SIZE)
+model_version = None
+
+def get_model_version():
+
+    # Digest of the model and vocabulary files, so that cached predictions never outlive the models
+    global model_version
+    if model_version is None:
+        # A missing or corrupted vocabulary raises VocabularyError (run build_vocabularies) before it is hashed
+        for name in encoder_store.paths:
+            encoder_store.get(name)
+
+        digest = hashlib.sha256()
+        for path in list(model_registry.paths.values()) + list(encoder_store.paths.values()):
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+        model_version = digest.hexdigest()
+    return model_version
+
+def prediction_key(text):
+
+    # The encoders lowercase and split on single spaces, so these variations give the same sequences
+    normalised = ' '.join(w for w in text.lower().split(' ') if w)
+    return hashlib.sha256((get_model_version() + '\0' + normalised).encode('utf-8')).hexdigest()
+
+def predict_uncached(texts, batch_size=None):
+
+    # Concurrent requests share model calls through the scheduler when micro-batching is enabled
+    if settings.EMOTION_MICRO_BATCHING:
+        return inference_scheduler.submit(texts)
+    return predict_texts(texts, batch_size)
 
-    global tokenizer_1
-    if not tokenizer_1:
-        try:
-            with open('tokenizer_1.pkl', 'rb') as f:
-                tokenizer_1 = pickle.load(f)
-        except:
-            tokenizer_1 = init_tokenizer_1()
-
-    global tokenizer_2
-    if not tokenizer_2:
-        try:
-            with open('tokenizer_2.pkl', 'rb') as f:
-                tokenizer_2 = pickle.load(f)
-        except:
-            tokenizer_2 = init_tokenizer_2()
+def predict_emotions(texts, batch_size=None):
+
+    keys = [prediction_key(text) for text in texts]
+    results = [prediction_cache.get(key) for key in keys]
+
+    # Only the texts that are not cached (once per distinct key) go to the models
+    misses = {}
+    for i, result in enumerate(results):
+        if result is None:
+            misses.setdefault(keys[i], texts[i])
+
+    if misses:
+        results_1, results_2 = predict_uncached(list(misses.values()), batch_size)
+        for key, result_1, result_2 in zip(misses, results_1, results_2):
+            prediction_cache.set(key, np.concatenate((result_1, result_2)))
+        predicted = dict(zip(misses, np.concatenate((results_1, results_2), axis=1)))
+        results = [result if result is not None else predicted[key] for key, result in zip(keys, results)]
+
+    logger.debug('Emotion predictions: %d texts, %d sent to the models, cache hit rate %.2f', len(texts), len(misses), prediction_cache.stats()['hit_rate'])
+
+    results = np.stack(results)
+    return aggregate_emotions(results[:, :3], results[:, 3:])
+
+def model_predict(word, video_id):
 
     texts = []
     if word != None and video_id == None:
@@ -84,45 +121,13 @@ def model_predict(word, video_id):
 
     if len(texts) == 0:
         return None, None, None, None, None, None, None, None, None
-    
-    model_1 = keras.models.load_model('trained_model_1.h5')
-    model_2 = keras.models.load_model('trained_model_2.h5')
-
-    negative, neutral, positive = 0, 0, 0
-    sadness, fear, love, surprise, anger, joy = 0, 0, 0, 0, 0, 0
-
-    for text in texts:
-        seq_1 = get_sequences_1(tokenizer_1,[text])
-        result_1 = model_1.predict(np.expand_dims(seq_1[0], axis=0), verbose = 0)[0]
-        seq_2 = get_sequences_2(tokenizer_2,[text])
-        result_2 = model_2.predict(np.expand_dims(seq_2[0], axis=0), verbose = 0)[0]
-
-        negative += result_1[0]
-        neutral += result_1[1]
-        positive += result_1[2]
-
-        sadness += result_2[0]
-        fear += result_2[1]
-        love += result_2[2]
-        surprise += result_2[3]
-        anger += result_2[4]
-        joy += result_2[5]
-        
-    sum_1 = negative + neutral + positive
-    total_negative = negative/sum_1
-    total_neutral = neutral/sum_1
-    total_positive = positive/sum_1
-
-    sum_2 = sadness + fear + love + surprise + anger + joy
-    total_sadness = sadness/sum_2
-    total_fear = fear/sum_2
-    total_love = love/sum_2
-    total_surprise = surprise/sum_2
-    total_anger = anger/sum_2
-    total_joy = joy/sum_2
-        
-    return total_negative, total_neutral, total_positive, total_sadness, total_fear, total_love, total_surprise, total_anger, total_joy
 
+    return predict_emotions(texts)
+
+def trend_emotions_stored(word, video_id, since):
+    return TrendEmotion.objects.filter(word=word, video_id=video_id, insertion_datetime__gte=since).exists()
+
+@single_flight(loaded=trend_emotions_stored)
 def load_trend_emotions(word, video_id):
     
     if word != None and video_id == None:
@@ -131,20 +136,20 @@ def load_trend_emotions(word, video_id):
         if not negative or not neutral or not positive or not sadness or not fear or not love or not surprise or not anger or not joy:
             return None
 
-        if TrendEmotion.objects.filter(word=word).exists():
+        with transaction.atomic():
             TrendEmotion.objects.filter(word=word).delete()
 
-        te = TrendEmotion(word=word, 
-                        negative_emotion=negative, 
-                        neutral_emotion=neutral, 
-                        positive_emotion=positive,
-                        sadness_emotion=sadness,
-                        fear_emotion=fear,
-                        love_emotion=love,
-                        surprise_emotion=surprise,
-                        anger_emotion=anger,
-                        joy_emotion=joy)
-        te.save()
+            te = TrendEmotion(word=word, 
+                            negative_emotion=negative, 
+                            neutral_emotion=neutral, 
+                            positive_emotion=positive,
+                            sadness_emotion=sadness,
+                            fear_emotion=fear,
+                            love_emotion=love,
+                            surprise_emotion=surprise,
+                            anger_emotion=anger,
+                            joy_emotion=joy)
+            te.save()
 
     elif word == None and video_id != None:
         negative, neutral, positive, sadness, fear, love, surprise, anger, joy = model_predict(None, video_id)
@@ -152,17 +157,17 @@ def load_trend_emotions(word, video_id):
         if not negative or not neutral or not positive or not sadness or not fear or not love or not surprise or not anger or not joy:
             return None
 
-        if TrendEmotion.objects.filter(video_id=video_id).exists():
+        with transaction.atomic():
             TrendEmotion.objects.filter(video_id=video_id).delete()
 
-        te = TrendEmotion(video_id=video_id, 
-                        negative_emotion=negative, 
-                        neutral_emotion=neutral, 
-                        positive_emotion=positive,
-                        sadness_emotion=sadness,
-                        fear_emotion=fear,
-                        love_emotion=love,
-                        surprise_emotion=surprise,
-                        anger_emotion=anger,
-                        joy_emotion=joy)
-        te.save()
\ No newline at end of file
+            te = TrendEmotion(video_id=video_id, 
+                            negative_emotion=negative, 
+                            neutral_emotion=neutral, 
+                            positive_emotion=positive,
+                            sadness_emotion=sadness,
+                            fear_emotion=fear,
+                            love_emotion=love,
+                            surprise_emotion=surprise,
+                            anger_emotion=anger,
+                            joy_emotion=joy)
+            te.save()
\ No newline at end of file
@@ -0,0 +1,154 @@
+import json
+
+import numpy as np
+
+### Minimal NumPy forward pass of the emotion models, so that serving does not need TensorFlow ###
+
+NUMPY_MODEL_FORMAT_VERSION = 1
+
+def sigmoid(x):
+    return 1 / (1 + np.exp(-x))
+
+def softmax(x):
+    e = np.exp(x - x.max(axis=-1, keepdims=True))
+    return e / e.sum(axis=-1, keepdims=True)
+
+ACTIVATIONS = {
+    'linear': lambda x: x,
+    'relu': lambda x: np.maximum(x, 0),
+    'sigmoid': sigmoid,
+    'tanh': np.tanh,
+    'softmax': softmax,
+}
+
+def lstm(x, kernel, recurrent_kernel, bias, return_sequences, go_backwards=False):
+
+    # Keras LSTM with tanh/sigmoid activations, gates packed as [input, forget, cell, output]
+    batch, steps, _ = x.shape
+    units = recurrent_kernel.shape[0]
+
+    if go_backwards:
+        x = x[:, ::-1]
+
+    # The input projection of every timestep is done in one matrix product
+    z_x = x @ kernel + bias
+    h = np.zeros((batch, units), dtype=x.dtype)
+    c = np.zeros((batch, units), dtype=x.dtype)
+    outputs = np.empty((batch, steps, units), dtype=x.dtype) if return_sequences else None
+
+    for t in range(steps):
+        z = z_x[:, t] + h @ recurrent_kernel
+        i = sigmoid(z[:, :units])
+        f = sigmoid(z[:, units:2 * units])
+        c = f * c + i * np.tanh(z[:, 2 * units:3 * units])
+        h = sigmoid(z[:, 3 * units:]) * np.tanh(c)
+        if return_sequences:
+            outputs[:, t] = h
+
+    return outputs if return_sequences else h
+
+class NumpyModel:
+
+    def __init__(self, layers, weights, dtype=np.float32):
+        self.layers = layers
+        self.weights = [[w.astype(dtype, copy=False) for w in layer_weights] for layer_weights in weights]
+        self.dtype = dtype
+
+    def __call__(self, x):
+
+        for layer, weights in zip(self.layers, self.weights):
+
+            if layer['type'] == 'Embedding':
+                x = weights[0][np.asarray(x, dtype=np.int64)]
+
+            elif layer['type'] == 'Bidirectional':
+                return_sequences = layer['return_sequences']
+                forward = lstm(x, *weights[:3], return_sequences)
+                backward = lstm(x, *weights[3:], return_sequences, go_backwards=True)
+                if return_sequences:
+                    backward = backward[:, ::-1]
+                x = np.concatenate((forward, backward), axis=-1)
+
+            elif layer['type'] == 'Dense':
+                x = ACTIVATIONS[layer['activation']](x @ weights[0] + weights[1])
+
+        return x.astype(np.float32, copy=False)
+
+    def predict(self, x, batch_size=None, verbose=0):
+
+        # Same call signature as keras.Model.predict
+        x = np.asarray(x)
+        batch_size = batch_size or max(len(x), 1)
+        outputs = [self(x[start:start + batch_size]) for start in range(0, len(x), batch_size)]
+        return np.concatenate(outputs) if outputs else np.empty((0, self.weights[-1][-1].shape[0]), dtype=np.float32)
+
+def _layer_config(layer):
+
+    name = layer.__class__.__name__
+    config = layer.get_config()
+
+    if name == 'InputLayer':
+        return None
+    if name == 'Embedding':
+        if config.get('mask_zero'):
+            raise ValueError('Embedding layers with mask_zero are not supported')
+        return {'type': 'Embedding'}
+    if name == 'Bidirectional':
+        inner = config['layer']
+        if inner['class_name'] != 'LSTM' or config['merge_mode'] != 'concat':
+            raise ValueError('Only Bidirectional(LSTM) layers with merge_mode concat are supported')
+        if inner['config']['activation'] != 'tanh' or inner['config']['recurrent_activation'] != 'sigmoid' or not inner['config']['use_bias']:
+            raise ValueError('Only LSTM layers with tanh/sigmoid activations and bias are supported')
+        return {'type': 'Bidirectional', 'return_sequences': inner['config']['return_sequences']}
+    if name == 'Dense':
+        if config['activation'] not in ACTIVATIONS or not config['use_bias']:
+            raise ValueError("Dense activation '%s' is not supported" % config['activation'])
+        return {'type': 'Dense', 'activation': config['activation']}
+
+    raise ValueError("Layer '%s' is not supported by the NumPy runtime" % name)
+
+def export_keras_model(model, path):
+
+    layers, arrays = [], {}
+
+    for layer in model.layers:
+        config = _layer_config(layer)
+        if config is None:
+            continue
+        for j, w in enumerate(layer.get_weights()):
+            arrays['%d/%d' % (len(layers), j)] = w
+        config['n_weights'] = len(layer.get_weights())
+        layers.append(config)
+
+    config = {'format_version': NUMPY_MODEL_FORMAT_VERSION, 'precision': 'float32', 'layers': layers}
+    write_numpy_model(config, arrays, path)
+
+def read_numpy_model(path):
+
+    with np.load(path) as data:
+        config = json.loads(str(data['config']))
+        arrays = {key: data[key] for key in data.files if key != 'config'}
+
+    if config['format_version'] != NUMPY_MODEL_FORMAT_VERSION:
+        raise ValueError("NumPy model '%s' has format version %s, expected %s" % (path, config['format_version'], NUMPY_MODEL_FORMAT_VERSION))
+
+    return config, arrays
+
+def write_numpy_model(config, arrays, path):
+    np.savez_compressed(path, config=np.array(json.dumps(config)), **arrays)
+
+def _dequantize(arrays, key):
+
+    # int8 weights are stored with a float32 scale per output channel
+    if key + '/scale' in arrays:
+        return arrays[key].astype(np.float32) * arrays[key + '/scale']
+    return arrays[key]
+
+def load_numpy_model(path, dtype=np.float32):
+
+    config, arrays = read_numpy_model(path)
+
+    layers = config['layers']
+    weights = [[_dequantize(arrays, '%d/%d' % (i, j)) for j in range(layer['n_weights'])] for i, layer in enumerate(layers)]
+
+    return NumpyModel(layers, weights, dtype)
@@ -0,0 +1,102 @@
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+
+from utils.ai.numpy_runtime import load_numpy_model, read_numpy_model, write_numpy_model
+
+### Reduced-precision (float16 / int8) variants of the NumPy emotion models ###
+
+PRECISIONS = ['float32', 'float16', 'int8']
+
+# Fixed held-out texts used to measure how far the reduced-precision models drift
+HELDOUT_TEXTS = [
+    'I love this song so much, it makes me happy',
+    'This is the worst game I have ever seen',
+    'Not sure what to think about the news today',
+    'The final was amazing, what a goal!',
+    'I am scared of what could happen next',
+    'Why would they cancel the show, I am so angry',
+    'Wow, I did not expect that ending at all',
+    'Missing my family today, feeling lonely',
+    'The new phone is fine, nothing special',
+    'Best concert of my life, thank you all',
+    'I hate waiting in line for hours for nothing',
+    'Congratulations to the whole team, well deserved',
+    'That was a terrible decision by the referee',
+    'I am nervous about the exam tomorrow',
+    'What a surprise to see them together again',
+    'The prices keep going up and nobody does anything',
+    'Such a beautiful day at the beach with friends',
+    'I cannot believe he said that on live television',
+    'The movie was boring and far too long',
+    'Sending love to everyone affected by the storm',
+]
+
+def quantized_path(path, precision):
+
+    # trained_model_1.npz -> trained_model_1.int8.npz
+    path = Path(path)
+    return path if precision == 'float32' else path.with_suffix('.%s.npz' % precision)
+
+def quantize_arrays(config, arrays, precision):
+
+    if precision not in PRECISIONS:
+        raise ValueError("Unknown precision '%s'" % precision)
+
+    result = {}
+
+    for i, layer in enumerate(config['layers']):
+        for j in range(layer['n_weights']):
+            key = '%d/%d' % (i, j)
+            w = arrays[key].astype(np.float32)
+
+            if precision == 'float16':
+                result[key] = w.astype(np.float16)
+            elif precision == 'int8' and w.ndim == 2:
+                # Symmetric quantization with one scale per embedding row or per kernel column
+                axis = 1 if layer['type'] == 'Embedding' else 0
+                scale = np.abs(w).max(axis=axis, keepdims=True) / 127
+                scale[scale == 0] = 1
+                result[key] = np.round(w / scale).astype(np.int8)
+                result[key + '/scale'] = scale.astype(np.float32)
+            else:
+                # Biases are tiny and stay in float32
+                result[key] = w
+
+    return dict(config, precision=precision), result
+
+def build_quantized_model(source, destination, precision):
+
+    config, arrays = read_numpy_model(source)
+    write_numpy_model(*quantize_arrays(config, arrays, precision), destination)
+
+def evaluate(reference_path, candidate_path, sequences, batch_size=50, repeat=5):
+
+    # Size, load time, per-batch latency and output drift of a candidate model against the float32 reference
+    start = time.perf_counter()
+    candidate = load_numpy_model(candidate_path)
+    load_seconds = time.perf_counter() - start
+
+    reference = load_numpy_model(reference_path)
+    expected = reference.predict(sequences)
+    outputs = candidate.predict(sequences)
+
+    batch = sequences[:batch_size]
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        candidate.predict(batch)
+        latencies.append(time.perf_counter() - start)
+
+    drift = np.abs(outputs - expected)
+
+    return {
+        'size_bytes': os.path.getsize(candidate_path),
+        'load_seconds': load_seconds,
+        'batch_seconds': min(latencies),
+        'max_drift': float(drift.max()),
+        'mean_drift': float(drift.mean()),
+        'mean_output_drift': float(np.abs(outputs.mean(axis=0) - expected.mean(axis=0)).max()),
+    }
@@ -0,0 +1,72 @@
+import threading
+
+import numpy as np
+
+from utils.ai.vocabulary import load_vocabulary
+
+### Inference-only replacement of Keras texts_to_sequences + pad_sequences ###
+
+class SequenceEncoder:
+
+    def __init__(self, vocabulary, maxlen):
+        self.maxlen = maxlen
+        self.lower = vocabulary['lower']
+        self.split = vocabulary['split']
+        self.translate_map = str.maketrans({c: self.split for c in vocabulary['filters']})
+
+        # Words at or beyond num_words are mapped to the OOV index up front, as Keras does per lookup
+        num_words = vocabulary['num_words']
+        word_index = vocabulary['word_index']
+        self.oov_index = word_index.get(vocabulary['oov_token']) if vocabulary['oov_token'] is not None else None
+        self.word_index = {w: (i if not num_words or i < num_words else self.oov_index) for w, i in word_index.items()}
+        self.word_index = {w: i for w, i in self.word_index.items() if i is not None}
+
+    def words(self, text):
+
+        if self.lower:
+            text = text.lower()
+
+        return [w for w in text.translate(self.translate_map).split(self.split) if w]
+
+    def encode(self, texts, out=None):
+
+        # Post-truncation and post-padding with zeros into an int32 array of shape (len(texts), maxlen)
+        if out is None:
+            out = np.zeros((len(texts), self.maxlen), dtype=np.int32)
+        else:
+            out[:len(texts)] = 0
+
+        get = self.word_index.get
+        oov_index = self.oov_index
+        maxlen = self.maxlen
+
+        for row, text in enumerate(texts):
+            indices = [i for i in (get(w, oov_index) for w in self.words(text)) if i is not None][:maxlen]
+            out[row, :len(indices)] = indices
+
+        return out
+
+class EncoderStore:
+
+    def __init__(self, paths, maxlens):
+        self.paths = dict(paths)
+        self.maxlens = dict(maxlens)
+        self._encoders = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+
+        encoder = self._encoders.get(name)
+        if encoder is not None:
+            return encoder
+
+        with self._lock:
+            encoder = self._encoders.get(name)
+            if encoder is None:
+                encoder = SequenceEncoder(load_vocabulary(self.paths[name]), self.maxlens[name])
+                self._encoders[name] = encoder
+        return encoder
+
+    def clear(self):
+        with self._lock:
+            self._encoders.clear()
@@ -0,0 +1,83 @@
+import hashlib
+import json
+
+### Compact, versioned vocabularies of the tokenizers used to train the emotion models ###
+
+VOCABULARY_FORMAT_VERSION = 1
+
+VOCABULARY_SOURCES = {
+    'sentiment': 'mteb/tweet_sentiment_extraction',
+    'emotion': 'SetFit/emotion',
+}
+
+class VocabularyError(Exception):
+    pass
+
+def _checksum(data):
+    payload = json.dumps(data, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def vocabulary_from_tokenizer(tokenizer, source):
+
+    # Only the words that can be emitted with num_words are kept, the rest map to the OOV token
+    word_index = {w: i for w, i in tokenizer.word_index.items() if i < tokenizer.num_words}
+
+    return {
+        'format_version': VOCABULARY_FORMAT_VERSION,
+        'source': source,
+        'num_words': tokenizer.num_words,
+        'oov_token': tokenizer.oov_token,
+        'filters': tokenizer.filters,
+        'lower': tokenizer.lower,
+        'split': tokenizer.split,
+        'word_index': word_index,
+    }
+
+def build_vocabulary(source, num_words=1000, oov_token='<UNK>'):
+
+    # Build step only: downloads the training dataset and fits a Keras tokenizer on it
+    from datasets import load_dataset
+    from tensorflow.keras.preprocessing.text import Tokenizer
+
+    dataset = load_dataset(source)
+    texts = [x['text'] for x in dataset['train']]
+
+    tokenizer = Tokenizer(num_words=num_words, oov_token=oov_token)
+    tokenizer.fit_on_texts(texts)
+
+    return vocabulary_from_tokenizer(tokenizer, source)
+
+def save_vocabulary(vocabulary, path):
+
+    data = dict(vocabulary)
+    data['checksum'] = _checksum(vocabulary)
+
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+
+def load_vocabulary(path):
+
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        raise VocabularyError("Vocabulary '%s' not found, run 'python manage.py build_vocabularies'" % path)
+
+    checksum = data.pop('checksum', None)
+
+    if data.get('format_version') != VOCABULARY_FORMAT_VERSION:
+        raise VocabularyError("Vocabulary '%s' has format version %s, expected %s" % (path, data.get('format_version'), VOCABULARY_FORMAT_VERSION))
+    if checksum != _checksum(data):
+        raise VocabularyError("Vocabulary '%s' is corrupted (checksum mismatch)" % path)
+
+    return data
+
+def tokenizer_from_vocabulary(vocabulary):
+
+    from tensorflow.keras.preprocessing.text import Tokenizer
+
+    tokenizer = Tokenizer(num_words=vocabulary['num_words'], filters=vocabulary['filters'], lower=vocabulary['lower'], split=vocabulary['split'], oov_token=vocabulary['oov_token'])
+    tokenizer.word_index = dict(vocabulary['word_index'])
+    tokenizer.index_word = {i: w for w, i in tokenizer.word_index.items()}
+
+    return tokenizer
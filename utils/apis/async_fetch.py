@@ -0,0 +1,82 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from utils.apis.http_client import http_client
+
+### Asyncio layer over the shared HTTP client, to fetch many countries and categories at once ###
+
+# The blocking client runs in these threads, so its pools, retries and per-host limits still apply
+executor = ThreadPoolExecutor(max_workers=settings.ASYNC_FETCH_CONCURRENCY, thread_name_prefix='async-fetch')
+
+async def fetch(url, limit=None, rate_limiter=None, **kwargs):
+
+    # limit is a semaphore shared by the calls of one batch, none for a call on its own
+    if limit is None:
+        return await send(url, rate_limiter, **kwargs)
+
+    async with limit:
+        return await send(url, rate_limiter, **kwargs)
+
+async def send(url, rate_limiter=None, **kwargs):
+
+    # rate_limiter is a utils.prewarm.RateLimiter shared by the calls to the same upstream quota
+    if rate_limiter is not None:
+        wait = rate_limiter.acquire()
+        while wait > 0:
+            await asyncio.sleep(wait)
+            wait = rate_limiter.acquire()
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, lambda: http_client.get(url, **kwargs))
+
+async def fetch_json(url, limit=None, rate_limiter=None, **kwargs):
+
+    response = await fetch(url, limit, rate_limiter, **kwargs)
+    return response.json() if response.status_code == 200 else None
+
+async def fetch_all(urls, concurrency=None, rate_limiter=None):
+
+    # Responses in the order of the urls, exceptions are returned in place of the failed ones
+    limit = asyncio.Semaphore(concurrency or settings.ASYNC_FETCH_CONCURRENCY)
+    return await asyncio.gather(*[fetch(url, limit, rate_limiter) for url in urls], return_exceptions=True)
+
+async def youtube_trending_videos(url, max_videos, max_pages, limit=None, rate_limiter=None):
+
+    # Pages of one chart follow each other (page tokens), different charts run concurrently
+    from utils.apis.youtube import parse_videos
+
+    res = []
+    page_token = None
+
+    for _ in range(max_pages):
+
+        data = await fetch_json(url + ("&pageToken=" + page_token if page_token else ""), limit, rate_limiter)
+
+        if data is None:
+            break
+
+        res += parse_videos(data)
+        page_token = data.get('nextPageToken')
+
+        if page_token is None or len(res) >= max_videos:
+            break
+
+    return res[:max_videos]
+
+async def youtube_trending_videos_many(urls, max_videos, max_pages, concurrency=None, rate_limiter=None):
+
+    limit = asyncio.Semaphore(concurrency or settings.ASYNC_FETCH_CONCURRENCY)
+    return await asyncio.gather(*[youtube_trending_videos(url, max_videos, max_pages, limit, rate_limiter) for url in urls], return_exceptions=True)
+
+def run(coroutine):
+
+    # Sync wrapper for the Django loaders; inside a running event loop (async views) it gets its own thread
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+
+    with ThreadPoolExecutor(max_workers=1) as loop_thread:
+        return loop_thread.submit(asyncio.run, coroutine).result()
@@ -1,28 +1,33 @@
-import requests
+from utils.apis.http_client import http_client
 
-def all_countries():
+COUNTRIES_URL = "https://restcountries.com/v2/all"
 
-    url = "https://restcountries.com/v2/all"
+def all_countries():
 
-    response = requests.get(url)
+    response = http_client.get(COUNTRIES_URL)
     countries = []
 
     if response.status_code == 200:
+        countries = parse_countries(response.json())
+
+    return countries
+
+def parse_countries(data):
+
+    countries = []
+
+    for country in data:
+        name = country['name']
+        native_name = country['nativeName']
+        alpha2_code = country['alpha2Code']
+        flag = country['flag']
+        
+        lat, lng = None, None
         
-        data = response.json()
-
-        for country in data:
-            name = country['name']
-            native_name = country['nativeName']
-            alpha2_code = country['alpha2Code']
-            flag = country['flag']
-            
-            lat, lng = None, None
-            
-            if 'latlng' in country:
-                lat, lng = country['latlng']
-
-            aux = (name, native_name, alpha2_code, flag, lat, lng)
-            countries.append(aux)
-
-    return countries
\ No newline at end of file
+        if 'latlng' in country:
+            lat, lng = country['latlng']
+
+        aux = (name, native_name, alpha2_code, flag, lat, lng)
+        countries.append(aux)
+
+    return countries
@@ -1,8 +1,11 @@
 import re
-from pytrends.request import TrendReq
 from pytz import timezone
 
-from main.models import Country, GoogleTrend, GoogleCountryTrend, GoogleWordTrend, GoogleWordTrendPeriod, GoogleTopic, GoogleRelatedTopic
+from main.models import GoogleTrend, GoogleCountryTrend, GoogleWordTrend, GoogleWordTrendPeriod, GoogleTopic, GoogleRelatedTopic
+from utils.apis.pytrends_pool import pytrends_pool
+from utils.country_registry import country_registry
+from utils.single_flight import single_flight
+from utils.snapshots import new_snapshot, stored_since
 
 # Convert snake_case to Title Case
 
@@ -11,14 +14,12 @@ def snake_to_title(string):
     title_case = ' '.join([word.capitalize() for word in words])
     return title_case
 
-pytrends = TrendReq(hl='en-US', tz=360)
-
 def google_trends_countries():
 
-    req_json = pytrends._get_data(
+    req_json = pytrends_pool.call(lambda client: client._get_data(
         url='https://trends.google.com/trends/hottrends/visualize/internal/data',
         method='get'
-    )
+    ))
 
     countries = {}
 
@@ -31,10 +32,10 @@ def get_country_trends(country_name):
 
     try:
 
-        country = Country.objects.get(name=country_name)
+        country = country_registry.by_name(country_name)
         pn = country.pn
 
-        country_trends = pytrends.trending_searches(pn=pn)
+        country_trends = pytrends_pool.call(lambda client: client.trending_searches(pn=pn))
         country_trends_list = country_trends.values.tolist()
 
         res = []
@@ -45,23 +46,21 @@ def get_country_trends(country_name):
     except:
         return []
 
+def country_trends_stored(country_name, since):
+    return stored_since(GoogleCountryTrend, since, country__name=country_name)
+
+@single_flight(loaded=country_trends_stored)
 def load_country_trends(country_name):
 
     trends = get_country_trends(country_name)
 
     if len(trends) > 0:
 
-        country = Country.objects.get(name=country_name)
-
-        if GoogleCountryTrend.objects.filter(country=country).exists():
-            GoogleCountryTrend.objects.filter(country=country).delete()
-
-        gct = GoogleCountryTrend(country=country)
-        gct.save()
+        country = country_registry.by_name(country_name)
 
-        for t in trends:
-            t = GoogleTrend(name=t, country_trend=gct)
-            t.save()
+        # Readers keep the previous version until the new one is complete
+        with new_snapshot(GoogleCountryTrend(country=country), country=country) as gct:
+            GoogleTrend.objects.bulk_create([GoogleTrend(name=t, country_trend=gct) for t in trends])
 
 def get_period(period_type):
 
@@ -76,6 +75,10 @@ def get_period(period_type):
 
     return period
 
+def word_trend_stored(word, country_name, period_type, since):
+    return stored_since(GoogleWordTrend, since, word=word, country__name=country_name, period_type=period_type)
+
+@single_flight(loaded=word_trend_stored)
 def load_google_word_trend(word, country_name, period_type):
 
     period = get_period(period_type)
@@ -83,23 +86,26 @@ def load_google_word_trend(word, country_name, period_type):
     if period is None:
         return
 
-    country = Country.objects.get(name=country_name)
-
-    if GoogleWordTrend.objects.filter(word=word, country=country, period_type=period_type).exists():
-        GoogleWordTrend.objects.filter(word=word, country=country, period_type=period_type).delete()
+    country = country_registry.by_name(country_name)
 
-    gwt = GoogleWordTrend(word=word, country=country, period_type=period_type)
-    gwt.save()
+    # The payload and the request that reads it on the same client
+    def fetch(client):
+        client.build_payload(kw_list=[word], cat=0, timeframe=period, geo=country.acronym, gprop='')
+        return client.interest_over_time()
 
-    pytrends.build_payload(kw_list=[word], cat=0, timeframe=period, geo=country.acronym, gprop='')
+    interest_over_time = pytrends_pool.call(fetch)
 
-    interest_over_time = pytrends.interest_over_time()
+    # Fetched before the new version is written
+    with new_snapshot(GoogleWordTrend(word=word, country=country, period_type=period_type), word=word, country=country, period_type=period_type) as gwt:
+        GoogleWordTrendPeriod.objects.bulk_create([
+            GoogleWordTrendPeriod(trend_datetime=timezone("UTC").localize(index.to_pydatetime()), value=row[word], word_trend=gwt)
+            for index, row in interest_over_time.iterrows()
+        ])
 
-    for index, row in interest_over_time.iterrows():
-        aux_index = timezone("UTC").localize(index.to_pydatetime())
-        gwt_period = GoogleWordTrendPeriod(trend_datetime=aux_index, value=row[word], word_trend=gwt)
-        gwt_period.save()
+def related_topics_stored(word, country_name, period_type, since):
+    return stored_since(GoogleRelatedTopic, since, word=word, country__name=country_name, period_type=period_type)
 
+@single_flight(loaded=related_topics_stored)
 def load_related_topics(word, country_name, period_type):
 
     period = get_period(period_type)
@@ -107,18 +113,17 @@ def load_related_topics(word, country_name, period_type):
     if period is None:
         return
 
-    country = Country.objects.get(name=country_name)
-
-    if GoogleRelatedTopic.objects.filter(word=word, country=country, period_type=period_type).exists():
-        GoogleRelatedTopic.objects.filter(word=word, country=country, period_type=period_type).delete()
+    country = country_registry.by_name(country_name)
 
-    grt = GoogleRelatedTopic(word=word, country=country, period_type=period_type)
-    grt.save()
+    def fetch(client):
+        client.build_payload(kw_list=[word], cat=0, timeframe=period, geo=country.acronym, gprop='')
+        return client.related_topics()
 
-    pytrends.build_payload(kw_list=[word], cat=0, timeframe=period, geo=country.acronym, gprop='')
-    trends_topics = pytrends.related_topics()
+    trends_topics = pytrends_pool.call(fetch)
     top_topics = trends_topics.get(word).get("top")
 
-    for index, row in top_topics.iterrows():
-        gt = GoogleTopic(topic_title=row['topic_title'], topic_type=row['topic_type'], value=row['value'], main_topic=grt)
-        gt.save()
\ No newline at end of file
+    with new_snapshot(GoogleRelatedTopic(word=word, country=country, period_type=period_type), word=word, country=country, period_type=period_type) as grt:
+        GoogleTopic.objects.bulk_create([
+            GoogleTopic(topic_title=row['topic_title'], topic_type=row['topic_type'], value=row['value'], main_topic=grt)
+            for index, row in top_topics.iterrows()
+        ])
\ No newline at end of file
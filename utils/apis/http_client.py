@@ -0,0 +1,105 @@
+import logging
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+### Shared HTTP client of the upstream APIs: pooled keep-alive connections, timeouts, retries and per-host limits ###
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+class HttpClient:
+
+    def __init__(self, pool_size=10, connect_timeout=3.05, read_timeout=10, retries=3, backoff=0.5, max_backoff=10, host_concurrency=8):
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.host_concurrency = host_concurrency
+
+        # urllib3 keeps one pool of up to pool_size keep-alive connections per host
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self._semaphores = {}
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._retries = 0
+
+    def _semaphore(self, host):
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(self.host_concurrency)
+            return self._semaphores[host]
+
+    def backoff_delay(self, attempt, response=None):
+
+        # Retry-After when the server sends it, exponential backoff with full jitter otherwise
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after is not None and retry_after.isdigit():
+            return min(int(retry_after), self.max_backoff)
+
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def request(self, method, url, **kwargs):
+
+        kwargs.setdefault('timeout', self.timeout)
+        host = urlparse(url).netloc
+
+        with self._semaphore(host):
+            for attempt in range(self.retries + 1):
+
+                with self._lock:
+                    self._requests += 1
+                    if attempt > 0:
+                        self._retries += 1
+
+                try:
+                    response = self.session.request(method, url, **kwargs)
+                except (requests.ConnectionError, requests.Timeout):
+                    if attempt == self.retries:
+                        raise
+                    response = None
+                else:
+                    if response.status_code not in RETRY_STATUS or attempt == self.retries:
+                        return response
+
+                delay = self.backoff_delay(attempt, response)
+                logger.warning('%s %s failed (%s), retrying in %.2f s', method, host, response.status_code if response is not None else 'connection error', delay)
+                time.sleep(delay)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def metrics(self):
+
+        # New connections opened vs requests sent through the pools; reuse is the share served by a kept-alive connection
+        hosts = {}
+        for adapter in set(self.session.adapters.values()):
+            for key in adapter.poolmanager.pools.keys():
+                pool = adapter.poolmanager.pools[key]
+                hosts[key.key_host] = {
+                    'requests': pool.num_requests,
+                    'connections': pool.num_connections,
+                    'reuse': 1 - pool.num_connections / pool.num_requests if pool.num_requests else 0,
+                }
+
+        return {'requests': self._requests, 'retries': self._retries, 'hosts': hosts}
+
+http_client = HttpClient(
+    pool_size=settings.HTTP_POOL_SIZE,
+    connect_timeout=settings.HTTP_CONNECT_TIMEOUT,
+    read_timeout=settings.HTTP_READ_TIMEOUT,
+    retries=settings.HTTP_RETRIES,
+    backoff=settings.HTTP_BACKOFF,
+    max_backoff=settings.HTTP_MAX_BACKOFF,
+    host_concurrency=settings.HTTP_HOST_CONCURRENCY,
+)
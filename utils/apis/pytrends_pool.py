@@ -0,0 +1,95 @@
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from pytrends.exceptions import TooManyRequestsError
+
+logger = logging.getLogger(__name__)
+
+### Pool of pytrends clients: build_payload keeps the request on the client, so a client serves one call at a time ###
+
+def new_client():
+
+    # Imported here, pytrends.request loads pandas; the constructor fetches the Google cookie
+    from pytrends.request import TrendReq
+    return TrendReq(hl='en-US', tz=360, timeout=(settings.HTTP_CONNECT_TIMEOUT, settings.HTTP_READ_TIMEOUT))
+
+class PyTrendsPool:
+
+    # At most size clients, created on first use; a call waits for a free one, which also limits the
+    # requests sent to Google at once
+    def __init__(self, size=2, retries=3, backoff=2, max_backoff=60, factory=new_client):
+        self.size = size
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.factory = factory
+
+        self._idle = []
+        self._created = 0
+        self._available = threading.Condition()
+
+    @contextmanager
+    def client(self):
+
+        # Waits for an idle client or a free slot; the waiter that gets a slot creates the client itself
+        with self._available:
+            while not self._idle and self._created >= self.size:
+                self._available.wait()
+
+            if self._idle:
+                client = self._idle.pop()
+            else:
+                client = None
+                self._created += 1
+
+        if client is None:
+            try:
+                client = self.factory()
+            except Exception:
+                # The slot goes to a waiter, which tries to create the client again
+                with self._available:
+                    self._created -= 1
+                    self._available.notify()
+                raise
+
+        try:
+            yield client
+        finally:
+            with self._available:
+                self._idle.append(client)
+                self._available.notify()
+
+    def backoff_delay(self, attempt, error):
+
+        # Retry-After when Google sends it, exponential backoff with full jitter otherwise
+        retry_after = error.response.headers.get('Retry-After') if error.response is not None else None
+        if retry_after is not None and retry_after.isdigit():
+            return min(int(retry_after), self.max_backoff)
+
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def call(self, fn):
+
+        # fn(client) runs build_payload and the requests that use it on the same client. The client is kept
+        # while waiting to retry, so that a throttled worker does not let other calls through
+        with self.client() as client:
+            for attempt in range(self.retries + 1):
+                try:
+                    return fn(client)
+                except TooManyRequestsError as e:
+                    if attempt == self.retries:
+                        raise
+                    delay = self.backoff_delay(attempt, e)
+                    logger.warning('Google Trends throttled the request, retrying in %.2f s', delay)
+                    time.sleep(delay)
+
+pytrends_pool = PyTrendsPool(
+    size=settings.GOOGLE_TRENDS_CONCURRENCY,
+    retries=settings.GOOGLE_TRENDS_RETRIES,
+    backoff=settings.GOOGLE_TRENDS_BACKOFF,
+    max_backoff=settings.GOOGLE_TRENDS_MAX_BACKOFF,
+)
@@ -0,0 +1,110 @@
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from utils.lru_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+### Batched translation to English with one shared googletrans client and a cache by text hash ###
+
+SEPARATOR = '\n'
+
+translator = None
+translator_lock = threading.Lock()
+
+translation_cache = LRUCache(settings.TRANSLATION_CACHE_SIZE)
+executor = ThreadPoolExecutor(max_workers=settings.TRANSLATION_WORKERS, thread_name_prefix='translation')
+
+def get_translator():
+
+    # Created on first use; its HTTP/2 connection is kept for the next calls
+    global translator
+    with translator_lock:
+        if translator is None:
+            from googletrans import Translator
+            translator = Translator()
+        return translator
+
+def translation_key(text, dest):
+    return hashlib.sha256((dest + '\0' + text).encode('utf-8')).hexdigest()
+
+def make_batches(texts, max_chars):
+
+    # Several texts per request, one per line, below the size limit of the endpoint
+    batches, batch, size = [], [], 0
+
+    for text in texts:
+        if batch and size + len(text) + len(SEPARATOR) > max_chars:
+            batches.append(batch)
+            batch, size = [], 0
+        batch.append(text)
+        size += len(text) + len(SEPARATOR)
+
+    if batch:
+        batches.append(batch)
+
+    return batches
+
+def translate_one(text, dest):
+
+    try:
+        return get_translator().translate(text, dest=dest).text
+    except Exception:
+        logger.warning('Translation failed', exc_info=True)
+        return None
+
+def translate_batch(texts, dest):
+
+    # None for the texts that could not be translated
+    if len(texts) == 1:
+        return [translate_one(texts[0], dest)]
+
+    translated = translate_one(SEPARATOR.join(texts), dest)
+
+    # The lines did not survive the translation, so each text is translated on its own
+    if translated is None or len(translated.split(SEPARATOR)) != len(texts):
+        return [translate_one(text, dest) for text in texts]
+
+    return [t.strip() for t in translated.split(SEPARATOR)]
+
+def translate_texts(texts, langs=None, dest='en'):
+
+    # langs are the languages already detected by the source (tweet.lang), those texts are not translated.
+    # Texts that cannot be translated are returned as they are, and not cached
+    langs = langs or [None] * len(texts)
+    texts = [text.replace('\r', ' ').replace('\n', ' ') for text in texts]
+
+    results = [None] * len(texts)
+    keys = [None] * len(texts)
+    pending = {}
+
+    for i, (text, lang) in enumerate(zip(texts, langs)):
+        if lang == dest or not text.strip():
+            results[i] = text
+            continue
+
+        keys[i] = translation_key(text, dest)
+        cached = translation_cache.get(keys[i])
+
+        if cached is not None:
+            results[i] = cached
+        else:
+            pending.setdefault(keys[i], text)
+
+    if pending:
+        batches = make_batches(list(pending.values()), settings.TRANSLATION_BATCH_CHARS)
+        translated = dict(zip(pending.keys(), [t for batch in executor.map(lambda batch: translate_batch(batch, dest), batches) for t in batch]))
+
+        for key, text in translated.items():
+            if text is not None:
+                translation_cache.set(key, text)
+
+        for i, result in enumerate(results):
+            if result is None:
+                results[i] = translated[keys[i]] if translated[keys[i]] is not None else texts[i]
+
+    return results
@@ -1,20 +1,43 @@
+import threading
 import tweepy
 from decouple import config
+from django.conf import settings
 import json
-from main.models import Country, TwitterTrend, TwitterCountryTrend
-import re
-from googletrans import Translator
-import emoji
+from main.models import TwitterTrend, TwitterCountryTrend
+from utils.apis.http_client import RETRY_STATUS, http_client
+from utils.apis.translation import translate_texts
+from utils.country_registry import country_registry
+from utils.single_flight import single_flight
+from utils.snapshots import new_snapshot, stored_since
+from utils.text_normalization import clean_texts
+from utils.top_k import TopKSelector
+
+# The API object is created once and shares the pooled session of the HTTP client. tweepy sends its requests
+# through the session itself, so it retries with its own loop (fixed delay) and has no per-host limit
+
+api = None
+api_lock = threading.Lock()
 
 def api_setup():
-    
-    # Authenticate to Twitter
-    auth = tweepy.OAuthHandler(config('TWITTER_API_KEY'), config('TWITTER_SECRET_API_KEY'))
-    auth.set_access_token(config('TWITTER_ACCESS_TOKEN'), config('TWITTER_SECRET_ACCESS_TOKEN'))
 
-    # Create API object
-    api = tweepy.API(auth)
-    return api
+    global api
+
+    with api_lock:
+        if api is None:
+            # Authenticate to Twitter
+            auth = tweepy.OAuthHandler(config('TWITTER_API_KEY'), config('TWITTER_SECRET_API_KEY'))
+            auth.set_access_token(config('TWITTER_ACCESS_TOKEN'), config('TWITTER_SECRET_ACCESS_TOKEN'))
+
+            # Create API object
+            api = tweepy.API(
+                auth,
+                timeout=(settings.HTTP_CONNECT_TIMEOUT, settings.HTTP_READ_TIMEOUT),
+                retry_count=settings.HTTP_RETRIES,
+                retry_delay=settings.TWITTER_RETRY_DELAY,
+                retry_errors=RETRY_STATUS,
+            )
+            api.session = http_client.session
+        return api
 
 def trend_countries():
     
@@ -41,7 +64,7 @@ def trend_countries():
 def get_country_trends(country_name):
 
     try:
-        country = Country.objects.get(name=country_name)
+        country = country_registry.by_name(country_name)
         woeid = country.woeid
 
         api = api_setup()
@@ -59,29 +82,21 @@ def get_country_trends(country_name):
     except:
         return []
 
+def country_trends_stored(country_name, since):
+    return stored_since(TwitterCountryTrend, since, country__name=country_name)
+
+@single_flight(loaded=country_trends_stored)
 def load_country_trends(country_name):
 
     trends = get_country_trends(country_name)
 
     if len(trends) > 0:
 
-        country = Country.objects.get(name=country_name)
-
-        if TwitterCountryTrend.objects.filter(country=country).exists():
-            TwitterCountryTrend.objects.filter(country=country).delete()
-
-        tct = TwitterCountryTrend(country=country)
-        tct.save()
-
-        for t in trends:
-            t = TwitterTrend.objects.create(name=t[0], url=t[1], tweet_volume=t[2], country_trend=tct)
-            t.save()
-
-def translate_to_english(text):
-    translator = Translator()
-    text_en = translator.translate(text, dest='en').text
+        country = country_registry.by_name(country_name)
 
-    return text_en
+        # Readers keep the previous version until the new one is complete
+        with new_snapshot(TwitterCountryTrend(country=country), country=country) as tct:
+            TwitterTrend.objects.bulk_create([TwitterTrend(name=t[0], url=t[1], tweet_volume=t[2], country_trend=tct) for t in trends])
 
 def get_relevant_tweets(trend):
 
@@ -89,17 +104,12 @@ def get_relevant_tweets(trend):
 
     tweets = api.search_tweets(q=trend, count=20, result_type='popular')
 
-    res = []
+    # The most engaging tweets only, so that the others are not translated
+    selector = TopKSelector(settings.TWITTER_RELEVANT_TWEETS)
+    selector.extend((tweet.favorite_count + tweet.retweet_count, tweet) for tweet in tweets if not tweet.retweeted and 'RT @' not in tweet.text)
+    tweets = selector.items()
 
-    for tweet in tweets:
-        if not tweet.retweeted and 'RT @' not in tweet.text:
-            tweet = translate_to_english(tweet.text)            
-            no_emoji_text = emoji.get_emoji_regexp().sub(u'', tweet)
-            no_url_text = re.sub(r"http\S+", "", no_emoji_text)
-            no_mention_text = re.sub(r"@\S+", "", no_url_text)
-            no_hashtag_text = re.sub(r"#\S+", "", no_mention_text)
-            clean_tweet = no_hashtag_text.replace('\n', ' ').replace('\r', '').strip()
-            if clean_tweet != '':
-                res.append(clean_tweet)
+    # All the tweets in one go, the ones Twitter already detected as English are kept as they are
+    translated = translate_texts([tweet.text for tweet in tweets], [getattr(tweet, 'lang', None) for tweet in tweets])
 
-    return res
\ No newline at end of file
+    return clean_texts(translated)
\ No newline at end of file
@@ -1,63 +1,84 @@
-import requests
 from decouple import config
+from django.conf import settings
 from datetime import datetime
 from pytz import timezone
 
-from main.models import Country, YouTubeTrend, YouTubeTrendType, YouTubeCountryTrend
+from main.models import YouTubeTrend, YouTubeTrendType, YouTubeCountryTrend
+from utils.apis.http_client import http_client
+from utils.country_registry import country_registry
+from utils.single_flight import flight_key, flights, single_flight
+from utils.snapshots import new_snapshot, stored_since
+from utils.text_normalization import clean_texts, html_to_text
+from utils.top_k import TopKSelector
 
-def get_country_trends(country_name, trend_type):
+def get_trending_url(country_name, trend_type):
 
     youtube_api_key = config('YOUTUBE_API_KEY')
 
+    country = country_registry.by_name(country_name)
+
+    if country is None or not YouTubeTrendType.objects.filter(name=trend_type).exists():
+        return None
+
+    acronym = country.acronym
+
+    # Snippet and statistics of every video come in the chart call itself
+    url = (settings.YOUTUBE_API_URL + "/videos" +
+            "?part=snippet,statistics&chart=mostPopular&regionCode=" + acronym +
+            "&maxResults=" + str(min(settings.YOUTUBE_TRENDS_LIMIT, 50)) + "&key=" + youtube_api_key)
+
+    if trend_type != 'Default':
+        category_id = YouTubeTrendType.objects.get(name=trend_type).category_id
+        url += "&videoCategoryId=" + str(category_id)
+
+    return url
+
+def get_country_trends(country_name, trend_type):
+
     try:
-        country = Country.objects.get(name=country_name)
-        acronym = country.acronym
+        url = get_trending_url(country_name, trend_type)
 
-        if YouTubeTrendType.objects.filter(name=trend_type).exists():
-            if trend_type != 'Default':
-                category_id = YouTubeTrendType.objects.get(name=trend_type).category_id
-                url = ("https://www.googleapis.com/youtube/v3/videos" + 
-                        "?part=snippet&chart=mostPopular&regionCode=" + acronym + 
-                        "&videoCategoryId=" + str(category_id) + "&key=" + youtube_api_key)
-            else:
-                url = ("https://www.googleapis.com/youtube/v3/videos" + 
-                        "?part=snippet&chart=mostPopular&regionCode=" + acronym + 
-                        "&key=" + youtube_api_key)
-
-            response = requests.get(url)
-            return get_country_trends_aux(response, url, [], 0)
+        if url is not None:
+            return get_trending_videos(url, settings.YOUTUBE_TRENDS_LIMIT, settings.YOUTUBE_TRENDS_MAX_PAGES)
         return []
     except:
         return []
 
-def get_country_trends_aux(response, url, res, trends_number):
+def get_trending_videos(url, limit, max_pages):
+
+    res = []
+    page_token = None
+
+    for _ in range(max_pages):
 
-    res_aux = res.copy()
+        response = http_client.get(url + ("&pageToken=" + page_token if page_token else ""))
+
+        if response.status_code != 200:
+            break
 
-    if response.status_code == 200 and trends_number < 10:
         data = response.json()
-        videos = data['items']
-
-        for video in videos:
-            video_id = video['id']
-            title = video['snippet']['title'] if 'title' in video['snippet'].keys() else ''
-            published_at = video['snippet']['publishedAt'] if 'publishedAt' in video['snippet'].keys() else ''
-            thumbnail = get_thumbnail_url(video) if 'thumbnails' in video['snippet'].keys() else ''
-            channel_title = video['snippet']['channelTitle'] if 'channelTitle' in video['snippet'].keys() else ''
-            statistics = get_video_statistics(video_id) if 'id' in video.keys() else (None, None, None)
-            aux = [video_id, title, published_at, thumbnail, channel_title, statistics]
-            res_aux.append(aux)
-
-        if 'nextPageToken' in data.keys():
-            page_token = data['nextPageToken']
-            url = url.split("&pageToken=")[0] + "&pageToken=" + page_token
-            response = requests.get(url)
-            
-            return get_country_trends_aux(response, url, res_aux, trends_number + 5)
-        else:
-            return res
-    else:
-        return res
+        res += parse_videos(data)
+        page_token = data.get('nextPageToken')
+
+        if page_token is None or len(res) >= limit:
+            break
+
+    return res[:limit]
+
+def parse_videos(data):
+
+    res = []
+
+    for video in data['items']:
+        video_id = video['id']
+        title = video['snippet']['title'] if 'title' in video['snippet'].keys() else ''
+        published_at = video['snippet']['publishedAt'] if 'publishedAt' in video['snippet'].keys() else ''
+        thumbnail = get_thumbnail_url(video) if 'thumbnails' in video['snippet'].keys() else ''
+        channel_title = video['snippet']['channelTitle'] if 'channelTitle' in video['snippet'].keys() else ''
+        statistics = get_video_statistics(video.get('statistics', {}))
+        res.append([video_id, title, published_at, thumbnail, channel_title, statistics])
+
+    return res
 
 def get_thumbnail_url(video):
 
@@ -77,31 +98,22 @@ def get_thumbnail_url(video):
     else:
         return ""
 
-def get_video_statistics(video_id):
+def get_video_statistics(statistics):
 
-    youtube_api_key = config('YOUTUBE_API_KEY')
+    views = statistics['viewCount'] if 'viewCount' in statistics.keys() else None
+    likes = statistics['likeCount'] if 'likeCount' in statistics.keys() else None
+    comments = statistics['commentCount'] if 'commentCount' in statistics.keys() else None
 
-    url = "https://www.googleapis.com/youtube/v3/videos?part=statistics&id=" + video_id + "&key=" + youtube_api_key
-    response = requests.get(url)
+    if views != None:
+        views = int(views)
+    if likes != None:
+        likes = int(likes)
+    if comments != None:
+        comments = int(comments)
 
-    if response.status_code == 200:
-        data = response.json()
-        views = data['items'][0]['statistics']['viewCount'] if 'viewCount' in data['items'][0]['statistics'].keys() else None
-        likes = data['items'][0]['statistics']['likeCount'] if 'likeCount' in data['items'][0]['statistics'].keys() else None
-        comments = data['items'][0]['statistics']['commentCount'] if 'commentCount' in data['items'][0]['statistics'].keys() else None
-        
-        if views != None:
-            views = int(views)
-        if likes != None:
-            likes = int(likes)
-        if comments != None:
-            comments = int(comments)
-
-        return views, likes, comments
-
-    else:
-        return None, None, None
+    return views, likes, comments
 
+@single_flight
 def load_trending_types():
     
     if YouTubeTrendType.objects.count() == 0:
@@ -117,57 +129,110 @@ def load_trending_types():
             "Science & Technology": 28
         }
 
-        for t in trending_types:
-            yt = YouTubeTrendType(name=t, category_id=trending_types[t])
-            yt.save()
+        YouTubeTrendType.objects.bulk_create([YouTubeTrendType(name=t, category_id=trending_types[t]) for t in trending_types])
+
+def country_trends_stored(country_name, trend_type, since):
+    return stored_since(YouTubeCountryTrend, since, country__name=country_name, trend_type__name=trend_type)
 
+@single_flight(loaded=country_trends_stored)
 def load_country_trends(country_name, trend_type):
 
     load_trending_types()
-    trends = get_country_trends(country_name, trend_type)
+    save_country_trends(country_name, trend_type, get_country_trends(country_name, trend_type))
+
+def load_countries_trends(charts):
+
+    # Every (country, category) chart at once through the async fetch layer, then one snapshot per chart.
+    # Returns the error of each chart, None when it was loaded (or has no trends)
+    from utils.apis.async_fetch import run, youtube_trending_videos_many
+
+    load_trending_types()
+
+    urls = [get_trending_url(country_name, trend_type) for country_name, trend_type in charts]
+    fetched = [(chart, url) for chart, url in zip(charts, urls) if url is not None]
+
+    results = run(youtube_trending_videos_many([url for _, url in fetched], settings.YOUTUBE_TRENDS_LIMIT, settings.YOUTUBE_TRENDS_MAX_PAGES))
+
+    errors = {}
+    for (chart, _), trends in zip(fetched, results):
+        if isinstance(trends, Exception):
+            errors[chart] = trends
+            continue
+
+        # Same key as load_country_trends: a chart already being loaded by a visitor is not written twice
+        try:
+            flights.do(flight_key(load_country_trends, *chart), save_country_trends, *chart, trends, loaded=lambda since: country_trends_stored(*chart, since))
+        except Exception as e:
+            errors[chart] = e
+
+    return [errors.get(chart) for chart in charts]
+
+def save_country_trends(country_name, trend_type, trends):
 
     if len(trends) > 0:
 
-        country = Country.objects.get(name=country_name)
+        country = country_registry.by_name(country_name)
 
         if YouTubeTrendType.objects.filter(name=trend_type).exists():
             yt = YouTubeTrendType.objects.get(name=trend_type)
 
-            if YouTubeCountryTrend.objects.filter(country=country, trend_type=yt).exists():
-                YouTubeCountryTrend.objects.filter(country=country, trend_type=yt).delete()
+            # Readers keep the previous version until the new one is complete
+            with new_snapshot(YouTubeCountryTrend(country=country, trend_type=yt), country=country, trend_type=yt) as yct:
+                YouTubeTrend.objects.bulk_create([
+                    YouTubeTrend(video_id=t[0], title=t[1], published_at=timezone("UTC").localize(datetime.strptime(t[2], "%Y-%m-%dT%H:%M:%SZ")), thumbnail=t[3], channel_title=t[4], view_count=t[5][0], like_count=t[5][1], comment_count=t[5][2], country_trend=yct)
+                    for t in trends
+                ])
+
+class CommentFetch:
+
+    # State of one comment fetch: the N most liked comments seen so far and the page cursor
+    def __init__(self, video_id, number_of_comments, max_pages):
+        self.video_id = video_id
+        self.max_pages = max_pages
+        self.selector = TopKSelector(number_of_comments)
+        self.pages = 0
+        self.page_token = None
+
+    def add_page(self, data):
+
+        self.pages += 1
+        self.page_token = data.get('nextPageToken')
+
+        for comment in data.get('items', []):
+            if 'snippet' in comment.keys():
+                comment_text = comment['snippet']['topLevelComment']['snippet']['textDisplay']
+                comment_likes = comment['snippet']['topLevelComment']['snippet']['likeCount']
 
-            yct = YouTubeCountryTrend(country=country, trend_type=yt)
-            yct.save()
+                # On equal likes the earlier (more relevant) comment is kept
+                self.selector.push(comment_likes, comment_text)
 
-            for t in trends:
-                yt = YouTubeTrend(video_id=t[0], title=t[1], published_at=timezone("UTC").localize(datetime.strptime(t[2], "%Y-%m-%dT%H:%M:%SZ")), thumbnail=t[3], channel_title=t[4], view_count=t[5][0], like_count=t[5][1], comment_count=t[5][2], country_trend=yct)
-                yt.save()
+    def done(self):
+        return self.page_token is None or self.pages >= self.max_pages or self.selector.full()
 
-def get_relevant_comments(video_id, number_of_comments, comments_ls=[], next_page_token=None):
+    def comments(self):
+        return self.selector.items()
+
+def get_relevant_comments(video_id, number_of_comments):
 
     youtube_api_key = config('YOUTUBE_API_KEY')
 
-    url = "https://www.googleapis.com/youtube/v3/commentThreads?part=snippet&videoId=" + video_id + "&key=" + youtube_api_key
-    if next_page_token != None:
-        url += "&pageToken=" + next_page_token
-    
-    response = requests.get(url)
+    # Pages of 100 in relevance order, so that the first page usually holds enough comments
+    url = (settings.YOUTUBE_API_URL + "/commentThreads?part=snippet&order=relevance&maxResults=100" +
+            "&videoId=" + video_id + "&key=" + youtube_api_key)
 
-    if response.status_code == 200:
-        if len(comments_ls) >= 500 or (len(comments_ls) > 0 and next_page_token == None):
-            return [c for c, l in comments_ls[:number_of_comments]]
-        else:
-            data = response.json()
-            comments = data['items']
+    fetch = CommentFetch(video_id, number_of_comments, settings.YOUTUBE_COMMENTS_MAX_PAGES)
 
-            for comment in comments:
-                if 'snippet' in comment.keys():
-                    comment_text = comment['snippet']['topLevelComment']['snippet']['textDisplay']
-                    comment_likes = comment['snippet']['topLevelComment']['snippet']['likeCount']
-                    comments_ls.append((comment_text, comment_likes))
+    # Each page needs the token of the previous one, so they are fetched one after another with the sync client.
+    # The emotions are loaded one video at a time, so the comments of several videos are never fetched together
+    while True:
+        response = http_client.get(url + ("&pageToken=" + fetch.page_token if fetch.page_token else ""))
 
-            comments_ls.sort(key=lambda x: x[1], reverse=True)
+        if response.status_code != 200:
+            break
 
-            return get_relevant_comments(video_id, number_of_comments, comments_ls, data['nextPageToken'] if 'nextPageToken' in data.keys() else None)
-    else:
-        return comments_ls
\ No newline at end of file
+        fetch.add_page(response.json())
+
+        if fetch.done():
+            break
+
+    return clean_texts([html_to_text(c) for c in fetch.comments()])
\ No newline at end of file
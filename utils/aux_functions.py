@@ -1,21 +1,27 @@
-from utils.apis.twitter import trend_countries
-from utils.apis.google_trends import google_trends_countries
-from utils.apis.countries import all_countries
-
 from main.models import Country
-
-from datetime import datetime, timedelta
-
-DATE_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+from utils.country_registry import country_registry
+from utils.single_flight import single_flight
 
 ### Auxiliar functions to use in schema.py ###
 
 def load_countries():
 
+    # Every reload of the country registry goes through here; only an empty table takes the single flight
+    # (and its database lock), so a reload costs the same queries on every database
+    if Country.objects.count() == 0:
+        fill_countries()
+
+@single_flight
+def fill_countries():
+
     n_countries = Country.objects.count()
 
     if n_countries == 0:
 
+        from utils.apis.twitter import trend_countries
+        from utils.apis.google_trends import google_trends_countries
+        from utils.apis.countries import all_countries
+
         countries = all_countries()
 
         # Load countries from Twitter trends
@@ -24,6 +30,8 @@ def load_countries():
         # Load countries from Google Trends
         gt_countries = google_trends_countries()
 
+        new_countries = []
+
         for country in countries:
 
             woeid, country_pn = None, None
@@ -37,38 +45,26 @@ def load_countries():
             elif country[1] in gt_countries:
                 country_pn = gt_countries[country[1]]
             
-            c = Country(name=country[0], native_name=country[1], acronym=country[2], flag=country[3], lat=country[4], lng=country[5], woeid=woeid, pn=country_pn)
-            c.save()
+            new_countries.append(Country(name=country[0], native_name=country[1], acronym=country[2], flag=country[3], lat=country[4], lng=country[5], woeid=woeid, pn=country_pn))
 
-def setup_countries(kwargs):
+        # bulk_create does not send post_save, so the registry is invalidated here
+        Country.objects.bulk_create(new_countries)
+        country_registry.invalidate()
 
-    load_countries()
+def setup_countries(kwargs):
 
     name = kwargs.get('country') 
     trends_number = kwargs.get('trends_number') if kwargs.get('trends_number') else 5
 
-    filtered_country = Country.objects.filter(name=name)
+    country = country_registry.by_name(name)
 
-    return name, trends_number, filtered_country
+    return name, trends_number, country
 
 def setup_words(kwargs):
 
-    load_countries()
-
     word = kwargs.get('word')
     period_type = kwargs.get('period_type')
     country_name = kwargs.get('country')
-    filtered_country = Country.objects.filter(name=country_name)
+    country = country_registry.by_name(country_name)
     
-    return word, period_type, country_name, filtered_country
-
-def remove_cache(obj):
-
-    d1 = obj.insertion_datetime + timedelta(hours=1)
-    d1 = datetime.strptime(str(d1).split("+")[0], DATE_FORMAT)
-    
-    d2 = datetime.strptime(str(datetime.now()), DATE_FORMAT)
-
-    if d1 < d2 - timedelta(hours=1):
-        return True
-    return False
\ No newline at end of file
+    return word, period_type, country_name, country
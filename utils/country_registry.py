@@ -0,0 +1,61 @@
+import threading
+import time
+
+from django.conf import settings
+
+from main.models import Country
+
+### In-process registry of the countries, invalidated when a Country is saved or deleted ###
+
+class CountryRegistry:
+
+    def __init__(self, ttl=None):
+        self.ttl = ttl
+        self._countries = None
+        self._loaded_at = 0
+        self._lock = threading.RLock()
+
+    def _index(self):
+
+        index = self._countries
+        if index is not None and (self.ttl is None or time.monotonic() - self._loaded_at < self.ttl):
+            return index
+
+        with self._lock:
+            if self._countries is None or (self.ttl is not None and time.monotonic() - self._loaded_at >= self.ttl):
+
+                # Fills the table from the APIs the first time, as every resolver used to do
+                from utils.aux_functions import load_countries
+                load_countries()
+
+                countries = list(Country.objects.all())
+                self._countries = {
+                    'all': countries,
+                    'name': {c.name: c for c in countries},
+                    'acronym': {c.acronym: c for c in reversed(countries)},
+                    'woeid': {c.woeid: c for c in reversed(countries) if c.woeid is not None},
+                    'pn': {c.pn: c for c in reversed(countries) if c.pn is not None},
+                }
+                self._loaded_at = time.monotonic()
+            return self._countries
+
+    def all(self):
+        return list(self._index()['all'])
+
+    def by_name(self, name):
+        return self._index()['name'].get(name)
+
+    def by_acronym(self, acronym):
+        return self._index()['acronym'].get(acronym)
+
+    def by_woeid(self, woeid):
+        return self._index()['woeid'].get(woeid)
+
+    def by_pn(self, pn):
+        return self._index()['pn'].get(pn)
+
+    def invalidate(self):
+        with self._lock:
+            self._countries = None
+
+country_registry = CountryRegistry(settings.COUNTRY_REGISTRY_TTL)
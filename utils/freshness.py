@@ -0,0 +1,46 @@
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+
+### Freshness of the stored snapshots, with a TTL and a stale-while-revalidate window per data source ###
+
+FRESH = 'fresh'
+STALE = 'stale'
+EXPIRED = 'expired'
+
+class FreshnessPolicy:
+
+    def __init__(self, ttl, stale=0):
+        self.ttl = timedelta(seconds=ttl)
+        self.stale = timedelta(seconds=stale)
+
+    def state(self, inserted_at, now=None):
+
+        # FRESH within the TTL, STALE (servable while it is refreshed) within the window after it, EXPIRED later
+        now = now or timezone.now()
+        if timezone.is_naive(inserted_at):
+            inserted_at = timezone.make_aware(inserted_at, dt_timezone.utc)
+
+        age = now - inserted_at
+
+        if age < self.ttl:
+            return FRESH
+        if age < self.ttl + self.stale:
+            return STALE
+        return EXPIRED
+
+def get_policy(source, variant=None):
+
+    # 'youtube.Music' falls back to 'youtube', then to 'default'
+    policies = settings.TREND_FRESHNESS
+    keys = ([source + '.' + str(variant)] if variant is not None else []) + [source, 'default']
+    config = next(policies[key] for key in keys if key in policies)
+
+    return FreshnessPolicy(config['ttl'], config.get('stale', 0))
+
+def freshness(snapshot, source, variant=None, now=None):
+    return get_policy(source, variant).state(snapshot.insertion_datetime, now)
+
+def is_fresh(snapshot, source, variant=None, now=None):
+    return snapshot is not None and freshness(snapshot, source, variant, now) == FRESH
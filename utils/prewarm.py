@@ -0,0 +1,290 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from main.models import PrewarmTask, YouTubeTrendType, TwitterCountryTrend, GoogleCountryTrend, YouTubeCountryTrend
+from utils.country_registry import country_registry
+from utils.freshness import get_policy
+from utils.snapshots import collect_all_snapshots
+
+logger = logging.getLogger(__name__)
+
+### Pre-warming of the country snapshots, so that the first visitor of a country does not wait for the APIs ###
+
+class RateLimiter:
+
+    # Sliding window of the last calls; acquire() returns the seconds to wait, 0 when the call can go ahead
+    def __init__(self, calls, period):
+        self.calls = calls
+        self.period = period
+        self._times = []
+        self._lock = threading.Lock()
+
+    def seed(self, times):
+        with self._lock:
+            self._times = sorted(times)[-self.calls:]
+
+    def acquire(self, now=None):
+
+        now = time.time() if now is None else now
+
+        with self._lock:
+            self._times = [t for t in self._times if t > now - self.period]
+            if len(self._times) >= self.calls:
+                return self._times[0] + self.period - now
+            self._times.append(now)
+            return 0
+
+def get_loader(source):
+
+    # Imported here so that the command does not load every API client up front
+    if source == 'twitter':
+        from utils.apis import twitter
+        return lambda task: twitter.load_country_trends(task.country.name)
+    if source == 'google_trends':
+        from utils.apis import google_trends
+        return lambda task: google_trends.load_country_trends(task.country.name)
+    if source == 'youtube':
+        from utils.apis import youtube
+        return lambda task: youtube.load_country_trends(task.country.name, task.trend_type.name)
+    raise ValueError('Unknown prewarm source: ' + source)
+
+def latest_snapshot(task):
+
+    if task.source == 'twitter':
+        return TwitterCountryTrend.objects.filter(country=task.country, is_current=True).first()
+    if task.source == 'google_trends':
+        return GoogleCountryTrend.objects.filter(country=task.country, is_current=True).first()
+    return YouTubeCountryTrend.objects.filter(country=task.country, trend_type=task.trend_type, is_current=True).first()
+
+def get_variant(task):
+    return task.trend_type.name if task.trend_type else None
+
+def prewarm_targets():
+
+    # Twitter for the countries with a woeid, Google daily trends for the ones with a pn, YouTube for every category
+    from utils.apis.youtube import load_trending_types
+    load_trending_types()
+
+    trend_types = list(YouTubeTrendType.objects.all())
+    targets = []
+
+    for country in country_registry.all():
+        if country.woeid is not None:
+            targets.append(('twitter', country, None))
+        if country.pn is not None:
+            targets.append(('google_trends', country, None))
+        for trend_type in trend_types:
+            targets.append(('youtube', country, trend_type))
+
+    return targets
+
+def sync_tasks(now=None, spread=None):
+
+    # Creates the missing tasks, staggered over the spread window, and keeps the progress of the existing ones
+    now = now or timezone.now()
+    spread = settings.PREWARM_SPREAD if spread is None else spread
+
+    targets = prewarm_targets()
+    existing = {(t.source, t.country_id, t.trend_type_id): t.id for t in PrewarmTask.objects.all()}
+    wanted = {(source, country.id, trend_type.id if trend_type else None) for source, country, trend_type in targets}
+
+    new = [target for target in targets if (target[0], target[1].id, target[2].id if target[2] else None) not in existing]
+    step = spread / len(new) if new else 0
+
+    PrewarmTask.objects.bulk_create([
+        PrewarmTask(source=source, country=country, trend_type=trend_type, next_run=now + timedelta(seconds=i * step))
+        for i, (source, country, trend_type) in enumerate(new)
+    ])
+
+    obsolete = [task_id for key, task_id in existing.items() if key not in wanted]
+    if obsolete:
+        PrewarmTask.objects.filter(id__in=obsolete).delete()
+
+    return len(new), len(obsolete)
+
+def get_rate_limiters(now=None):
+
+    # The calls made before a restart still count against the limits
+    now = now or timezone.now()
+    limiters = {}
+
+    for source, limit in settings.PREWARM_RATE_LIMITS.items():
+        limiter = RateLimiter(limit['calls'], limit['period'])
+        since = now - timedelta(seconds=limit['period'])
+        runs = PrewarmTask.objects.filter(source=source, last_run__gt=since, last_status__in=['ok', 'empty', 'error']).values_list('last_run', flat=True)
+        limiter.seed([run.timestamp() for run in runs])
+        limiters[source] = limiter
+
+    return limiters
+
+def next_refresh(snapshot, source, variant, now):
+
+    # Shortly before the snapshot stops being fresh, with some jitter so that the tasks do not line up
+    policy = get_policy(source, variant)
+    inserted_at = snapshot.insertion_datetime if snapshot is not None else now
+    if timezone.is_naive(inserted_at):
+        inserted_at = timezone.make_aware(inserted_at, dt_timezone.utc)
+
+    lead = timedelta(seconds=min(settings.PREWARM_LEAD, policy.ttl.total_seconds() / 2))
+    jitter = timedelta(seconds=random.uniform(0, settings.PREWARM_JITTER))
+
+    return inserted_at + policy.ttl - lead - jitter
+
+def written_since(snapshot, since):
+
+    inserted_at = snapshot.insertion_datetime if snapshot is not None else None
+    if inserted_at is not None and timezone.is_naive(inserted_at):
+        inserted_at = timezone.make_aware(inserted_at, dt_timezone.utc)
+
+    return inserted_at is not None and inserted_at >= since
+
+def back_off(task, status, error=None):
+
+    # Errors and refreshes that stored nothing (e.g. a country without YouTube charts) wait longer every time
+    task.last_status = status
+    task.last_error = error
+    task.failures += 1
+    backoff = min(60 * 2 ** task.failures, settings.PREWARM_MAX_BACKOFF)
+    task.next_run = timezone.now() + timedelta(seconds=backoff)
+
+def claim(task, limiters, now):
+
+    # None when the task is to be refreshed now, its status ('fresh', 'throttled') and next run otherwise
+    snapshot = latest_snapshot(task)
+    refresh_at = next_refresh(snapshot, task.source, get_variant(task), now) if snapshot is not None else now
+
+    # Already refreshed by a visitor
+    if refresh_at > now:
+        task.last_status = 'fresh'
+        task.next_run = refresh_at
+        return task.last_status
+
+    limiter = limiters.get(task.source)
+    wait = limiter.acquire(now.timestamp()) if limiter else 0
+    if wait > 0:
+        task.last_status = 'throttled'
+        task.next_run = now + timedelta(seconds=wait)
+        return task.last_status
+
+    task.last_run = now
+    return None
+
+def finish(task, now, error=None):
+
+    if error is not None:
+        logger.error('Prewarm of %s failed', task, exc_info=error)
+        back_off(task, 'error', str(error)[:200])
+        return
+
+    snapshot = latest_snapshot(task)
+    if not written_since(snapshot, now):
+        back_off(task, 'empty')
+        return
+
+    task.last_status = 'ok'
+    task.last_error = None
+    task.failures = 0
+    finished = timezone.now()
+    task.next_run = max(next_refresh(snapshot, task.source, get_variant(task), finished), finished + timedelta(seconds=60))
+
+def save_task(task):
+    task.save(update_fields=['next_run', 'last_run', 'last_status', 'last_error', 'failures'])
+
+def run_task(task, limiters):
+
+    now = timezone.now()
+
+    try:
+        if claim(task, limiters, now) is None:
+            get_loader(task.source)(task)
+            finish(task, now)
+    except Exception as e:
+        finish(task, now, e)
+    finally:
+        save_task(task)
+
+    return task.last_status
+
+def run_youtube_tasks(tasks, limiters):
+
+    # The due charts are fetched together through the async layer (utils.apis.youtube.load_countries_trends);
+    # the rate limiter decides which charts join the batch, the others are rescheduled
+    from utils.apis.youtube import load_countries_trends
+
+    now = timezone.now()
+    due = []
+
+    for task in tasks:
+        try:
+            if claim(task, limiters, now) is None:
+                due.append(task)
+        except Exception as e:
+            finish(task, now, e)
+
+    if due:
+        try:
+            errors = load_countries_trends([(task.country.name, task.trend_type.name) for task in due])
+        except Exception as e:
+            errors = [e] * len(due)
+
+        for task, error in zip(due, errors):
+            try:
+                finish(task, now, error)
+            except Exception as e:
+                finish(task, now, e)
+
+    for task in tasks:
+        save_task(task)
+
+    return [task.last_status for task in tasks]
+
+def run_pooled_task(task, limiters):
+
+    # In a thread of the prewarm pool, which must not keep its own database connection open
+    try:
+        return run_task(task, limiters)
+    finally:
+        connection.close()
+
+def run_due_tasks(executor, limiters, now=None, limit=None, runner=run_task):
+
+    now = now or timezone.now()
+    tasks = PrewarmTask.objects.filter(next_run__lte=now).select_related('country', 'trend_type')
+    tasks = list(tasks[:limit] if limit else tasks)
+
+    youtube = [task for task in tasks if task.source == 'youtube']
+    others = [task for task in tasks if task.source != 'youtube']
+
+    # The pool starts on the other sources while the YouTube batch runs here
+    pending = executor.map(lambda task: runner(task, limiters), others)
+    statuses = run_youtube_tasks(youtube, limiters) + list(pending)
+
+    return {status: statuses.count(status) for status in set(statuses)}
+
+def prewarm(workers=None, once=False, poll=10, stop=None):
+
+    # Runs the due tasks in rounds of a few per worker; with once=True it runs the ones due now and returns
+    workers = workers or settings.PREWARM_WORKERS
+    sync_tasks()
+    limiters = get_rate_limiters()
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='prewarm') as executor:
+        while True:
+            statuses = run_due_tasks(executor, limiters, limit=None if once else workers * 4, runner=run_pooled_task)
+            if statuses:
+                logger.info('Prewarm round: %s', statuses)
+                # Versions left behind within their grace period by the refreshes of the previous rounds
+                collect_all_snapshots()
+
+            if once or (stop is not None and stop.is_set()):
+                return statuses
+            if not statuses:
+                time.sleep(poll)
@@ -0,0 +1,65 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection
+
+from utils.freshness import FRESH, STALE, EXPIRED, freshness
+
+logger = logging.getLogger(__name__)
+
+### Stale-while-revalidate: stale snapshots are served at once and refreshed in the background ###
+
+executor = ThreadPoolExecutor(max_workers=settings.TREND_REFRESH_WORKERS, thread_name_prefix='trend-refresh')
+
+pending = {}
+pending_lock = threading.Lock()
+
+def schedule_refresh(load, *args):
+
+    # Only one background refresh per key at a time, later requests keep serving the stale snapshot
+    key = (load,) + args
+
+    with pending_lock:
+        if key in pending:
+            return pending[key]
+        future = executor.submit(run_refresh, key, load, args)
+        pending[key] = future
+        return future
+
+def run_refresh(key, load, args):
+
+    try:
+        load(*args)
+    except Exception:
+        logger.exception('Background refresh of %s failed', key)
+    finally:
+        with pending_lock:
+            pending.pop(key, None)
+        # Worker threads must not keep their own database connection open
+        connection.close()
+
+def wait_for_refreshes():
+
+    with pending_lock:
+        futures = list(pending.values())
+    for future in futures:
+        future.result()
+
+def refreshed_snapshot(snapshots, source, variant, load, *args):
+
+    # Returns the snapshot to serve: fresh ones as they are, stale ones while a refresh runs in the background,
+    # and missing or expired ones (past the stale window) after a blocking refresh
+    snapshot = snapshots.first()
+    state = freshness(snapshot, source, variant) if snapshot is not None else EXPIRED
+
+    if state == FRESH:
+        return snapshot
+
+    if state == STALE and settings.TREND_BACKGROUND_REFRESH:
+        schedule_refresh(load, *args)
+        return snapshot
+
+    load(*args)
+    return snapshots.first()
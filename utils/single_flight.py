@@ -0,0 +1,105 @@
+import functools
+import hashlib
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+### Single-flight execution of the upstream loaders: concurrent calls with the same arguments share one call ###
+
+class _Call:
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, *args, loaded=None, **kwargs):
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+
+        # Waiters in this process get the result (or the error) of the call already in flight
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        started = timezone.now()
+
+        try:
+            with advisory_lock(key) as contended:
+                # Another worker process has just run the same call. It is only skipped when loaded(since) shows
+                # that the other call stored its data; a failed call (or no way to tell) is run again here
+                if not contended or loaded is None or not loaded(started):
+                    call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        return call.result
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+@contextmanager
+def advisory_lock(key):
+
+    # Cross-process lock on MySQL (GET_LOCK), yields True when it had to wait for another holder
+    if not settings.SINGLE_FLIGHT_DB_LOCK or connection.vendor != 'mysql':
+        yield False
+        return
+
+    name = 'toptrends:' + hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT GET_LOCK(%s, 0)', [name])
+        contended = cursor.fetchone()[0] != 1
+        if contended:
+            cursor.execute('SELECT GET_LOCK(%s, %s)', [name, settings.SINGLE_FLIGHT_DB_LOCK_TIMEOUT])
+            acquired = cursor.fetchone()[0] == 1
+        else:
+            acquired = True
+
+    try:
+        yield contended
+    finally:
+        if acquired:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT RELEASE_LOCK(%s)', [name])
+
+flights = SingleFlight()
+
+def flight_key(fn, *args):
+    return (fn.__module__, fn.__qualname__) + args
+
+def single_flight(fn=None, *, loaded=None):
+
+    # loaded(*args, since) tells whether the data of a call was stored since a given time
+    if fn is None:
+        return functools.partial(single_flight, loaded=loaded)
+
+    @functools.wraps(fn)
+    def wrapper(*args):
+        check = (lambda since: loaded(*args, since)) if loaded is not None else None
+        return flights.do(flight_key(fn, *args), fn, *args, loaded=check)
+
+    return wrapper
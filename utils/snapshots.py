@@ -0,0 +1,67 @@
+import logging
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+### Versioned snapshots: a new version is written next to the current one, then the current flag is flipped ###
+
+@contextmanager
+def new_snapshot(snapshot, **key):
+
+    # Saves the header as a hidden version, lets the caller write its rows and makes it the current version
+    # of its key (e.g. country=...) in the same transaction. Old versions are deleted later, after commit
+    model = type(snapshot)
+
+    with transaction.atomic():
+        snapshot.is_current = False
+        snapshot.save()
+
+        yield snapshot
+
+        model.objects.filter(is_current=True, **key).update(is_current=False, replaced_at=timezone.now())
+        snapshot.is_current = True
+        snapshot.save(update_fields=['is_current'])
+
+        if settings.SNAPSHOT_GC_ASYNC:
+            transaction.on_commit(lambda: schedule_collect(model, **key))
+
+def stored_since(model, since, **key):
+
+    # A current version of the key written after since, e.g. by a load that ran in another worker
+    return model.objects.filter(is_current=True, insertion_datetime__gte=since, **key).exists()
+
+def collect_snapshots(model, now=None, **key):
+
+    # Replaced versions are kept for a grace period, so that a reader that already got the old header
+    # still finds its rows
+    now = now or timezone.now()
+    old = model.objects.filter(is_current=False, replaced_at__lt=now - timedelta(seconds=settings.SNAPSHOT_GC_GRACE), **key)
+
+    deleted, _ = old.delete()
+    return deleted
+
+def schedule_collect(model, **key):
+
+    from utils.refresh import executor
+    return executor.submit(run_collect, model, key)
+
+def run_collect(model, key):
+
+    try:
+        return collect_snapshots(model, **key)
+    except Exception:
+        logger.exception('Garbage collection of the old %s versions failed', model.__name__)
+    finally:
+        connection.close()
+
+def collect_all_snapshots(now=None):
+
+    from main.models import TwitterCountryTrend, GoogleCountryTrend, GoogleWordTrend, GoogleRelatedTopic, YouTubeCountryTrend
+
+    models = [TwitterCountryTrend, GoogleCountryTrend, GoogleWordTrend, GoogleRelatedTopic, YouTubeCountryTrend]
+    return {model.__name__: collect_snapshots(model, now) for model in models}
@@ -0,0 +1,77 @@
+import html
+import re
+
+import emoji
+
+### Cleaning of the tweets and YouTube comments before translation and emotion prediction ###
+
+def emoji_list():
+
+    # emoji < 2 exposes the unicode table per language, emoji >= 2 a single EMOJI_DATA dict
+    if hasattr(emoji, 'EMOJI_DATA'):
+        return list(emoji.EMOJI_DATA.keys())
+    return list(emoji.UNICODE_EMOJI['en'].keys())
+
+def char_class(chars):
+
+    # Consecutive code points as ranges: a long list of single astral characters is scanned one by one
+    ranges = []
+    for code in sorted(set(ord(char) for char in chars)):
+        if ranges and code == ranges[-1][1] + 1:
+            ranges[-1][1] = code
+        else:
+            ranges.append([code, code])
+
+    return '[' + ''.join(re.escape(chr(a)) if a == b else re.escape(chr(a)) + '-' + re.escape(chr(b)) for a, b in ranges) + ']'
+
+def trie_pattern(words):
+
+    # Alternation with the common prefixes factored out, so that the regex engine does not try every emoji
+    # in turn at each position (e.g. 'ab|ac' becomes 'a(?:b|c)')
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node):
+
+        end = '' in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char != '']
+
+        if not branches:
+            return ''
+
+        single_chars = all(len(b) == 1 or (len(b) == 2 and b[0] == '\\') for b in branches)
+        pattern = ('[' + ''.join(branches) + ']') if single_chars and len(branches) > 1 else branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+
+        return '(?:' + pattern + ')?' if end else pattern
+
+    # The lookahead rejects most positions before the alternation is tried
+    return '(?=' + char_class(trie.keys() - {''}) + ')' + build(trie)
+
+# Removed in this order, as the previous cleaning did: an emoji removed first can join the text around it
+# (e.g. '#😀' keeps its '#', 'x@😀http://y' loses its URL and keeps 'x@'), so the passes cannot be merged
+EMOJI = re.compile(trie_pattern(emoji_list()))
+URL = re.compile(r'http\S+')
+MENTION = re.compile(r'@\S+')
+HASHTAG = re.compile(r'#\S+')
+HTML_TAG = re.compile(r'<[^>]+>')
+LINE_BREAKS = str.maketrans({'\n': ' ', '\r': ''})
+
+def clean_text(text):
+
+    text = HASHTAG.sub('', MENTION.sub('', URL.sub('', EMOJI.sub('', text))))
+    return text.translate(LINE_BREAKS).strip()
+
+def clean_texts(texts):
+
+    # Cleaned texts, without the ones left empty
+    cleaned = (clean_text(text) for text in texts)
+    return [text for text in cleaned if text != '']
+
+def html_to_text(text):
+
+    # YouTube textDisplay is HTML: <br> line breaks, links and escaped characters (&#39;, &amp;, ...)
+    return html.unescape(HTML_TAG.sub(' ', text))
@@ -0,0 +1,36 @@
+import heapq
+import itertools
+
+### Streaming selection of the K best scored items with a bounded min-heap: O(K) memory, O(log K) per item ###
+
+class TopKSelector:
+
+    def __init__(self, k):
+        self.k = k
+        self._heap = []
+        # On equal scores the item pushed first wins
+        self._order = itertools.count(0, -1)
+
+    def push(self, score, item):
+        self.extend([(score, item)])
+
+    def extend(self, scored_items):
+
+        heap, k, order = self._heap, self.k, self._order
+
+        for score, item in scored_items:
+            if len(heap) < k:
+                heapq.heappush(heap, (score, next(order), item))
+            # A later item with the same score as the smallest kept one is not better, so the score alone decides
+            elif k and score > heap[0][0]:
+                heapq.heapreplace(heap, (score, next(order), item))
+
+    def full(self):
+        return len(self._heap) >= self.k
+
+    def __len__(self):
+        return len(self._heap)
+
+    def items(self):
+        # Best first
+        return [item for score, order, item in sorted(self._heap, reverse=True)]